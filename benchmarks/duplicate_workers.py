@@ -0,0 +1,67 @@
+"""
+Compares serial and threaded hashing of the `duplicate` filter.
+
+Creates a synthetic tree of files where every file has a twin of the same size and
+runs the duplicate filter with different numbers of workers.
+
+Usage:
+    python -m benchmarks.duplicate_workers [--files 100000] [--size 4096] [--workers 1 8]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from organize import Config
+from organize.output import SavingOutput
+
+CONFIG = """
+rules:
+  - locations: "{path}"
+    subfolders: true
+    filters:
+      - duplicate:
+          workers: {workers}
+    actions:
+      - echo: "{{duplicate.original}}"
+"""
+
+
+def create_tree(root: Path, files: int, size: int, files_per_dir: int = 1000) -> None:
+    for i in range(files):
+        folder = root / f"{i // files_per_dir:04d}"
+        folder.mkdir(exist_ok=True)
+        # pairs of equal size, only every fourth pair has equal content
+        pair = i // 2
+        content = f"{pair:016d}".encode() * (size // 16)
+        if pair % 4 and i % 2:
+            content = content[:-1] + b"x"
+        (folder / f"{i:07d}.bin").write_bytes(content)
+
+
+def run(root: Path, workers: int) -> float:
+    config = Config.from_string(CONFIG.format(path=root, workers=workers))
+    start = time.perf_counter()
+    config.execute(simulate=True, output=SavingOutput())
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=100_000)
+    parser.add_argument("--size", type=int, default=4096)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count()])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        create_tree(root, files=args.files, size=args.size)
+        for workers in args.workers:
+            duration = run(root, workers=workers)
+            print(f"workers={workers:<3} {duration:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Measures the per-file cost of the `python` filter.
+
+Usage:
+    python -m benchmarks.python_filter [--files 100000]
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+from organize.filters import Extension, Python
+from organize.output import SavingOutput
+from organize.resource import Resource
+
+CODE = """
+if extension != "txt":
+    return False
+return {"upper": path.stem.upper()}
+"""
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=100_000)
+    args = parser.parse_args()
+
+    extension = Extension()
+    python = Python(code=CODE)
+    output = SavingOutput()
+    resources = [
+        Resource(path=Path(f"/test/file{i}.txt"), basedir=Path("/test"))
+        for i in range(args.files)
+    ]
+
+    start = time.perf_counter()
+    for res in resources:
+        extension.pipeline(res, output=output)
+        python.pipeline(res, output=output)
+    duration = time.perf_counter() - start
+    per_file = duration / len(resources) * 1e6
+    print(f"{len(resources)} files: {duration:.2f}s ({per_file:.1f} µs / file)")
+
+
+if __name__ == "__main__":
+    main()
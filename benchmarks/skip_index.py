@@ -0,0 +1,94 @@
+"""
+Measures how the paths created by the actions of a rule are tracked over a long run.
+
+Runs a rule which moves every file of a location into a subfolder (in simulation
+mode) and prints the time of each quarter of the run, which stays the same if the
+cost per file does not grow with the number of matches. The first quarter includes
+reading and sorting the folder. For comparison it also
+measures the previous approach of building a new set with `union` for every match.
+
+Usage:
+    python -m benchmarks.skip_index [--matches 200000] [--union-matches 20000]
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional, Set
+
+from organize import Rule
+from organize.resource import Resource
+
+QUARTERS = 4
+
+
+class QuarterOutput:
+    """
+    Discards the messages and prints the duration of each quarter of the run.
+    """
+
+    def __init__(self, matches: int) -> None:
+        self.quarter = max(matches // QUARTERS, 1)
+        self.count = 0
+        self.last = time.perf_counter()
+
+    def start(self, simulate: bool, config_path: Optional[Path], working_dir: Path):
+        pass
+
+    def msg(self, res: Resource, msg: str, sender, level: str = "info") -> None:
+        self.count += 1
+        if self.count % self.quarter == 0:
+            now = time.perf_counter()
+            print(f"  {self.count:>8} matches: {now - self.last:.2f}s")
+            self.last = now
+
+    def confirm(self, res: Resource, msg: str, default: bool, sender) -> bool:
+        return default
+
+    def end(self, success_count: int, error_count: int) -> None:
+        pass
+
+
+def create_files(root: Path, count: int) -> None:
+    for i in range(count):
+        (root / f"file{i:07d}.txt").touch()
+
+
+def run_rule(root: Path, matches: int) -> None:
+    rule = Rule(
+        locations=[str(root)],
+        actions=[{"move": f"{root}/archive/"}],
+    )
+    start = time.perf_counter()
+    rule.execute(simulate=True, output=QuarterOutput(matches))
+    print(f"rule: {matches} matches in {time.perf_counter() - start:.2f}s")
+
+
+def run_union(matches: int) -> None:
+    skip_pathes: Set[Path] = set()
+    start = time.perf_counter()
+    for i in range(matches):
+        path = Path(f"/test/file{i:07d}.txt")
+        if path in skip_pathes:
+            continue
+        skip_pathes = skip_pathes.union({Path(f"/test/archive/file{i:07d}.txt")})
+    print(f"union: {matches} matches in {time.perf_counter() - start:.2f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--matches", type=int, default=200_000)
+    parser.add_argument("--union-matches", type=int, default=20_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        create_files(root, args.matches)
+        run_rule(root, args.matches)
+    run_union(args.union_matches)
+    run_union(args.union_matches * 2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Compares the per-entry cost of matching names against the exclude patterns of a
+location with `pattern_match` and the compiled `PatternMatcher` used by the walker.
+
+Usage:
+    python -m benchmarks.walker_patterns [--names 1000000] [--patterns 40]
+"""
+
+import argparse
+import random
+import string
+import time
+from typing import Callable, List, Set
+
+from organize.location import DEFAULT_SYSTEM_EXCLUDE_FILES
+from organize.walker import PatternMatcher, pattern_match
+
+
+def make_patterns(count: int) -> Set[str]:
+    patterns = set(DEFAULT_SYSTEM_EXCLUDE_FILES)
+    for i in range(count):
+        # a mix of suffix globs, prefix globs and literal names
+        if i % 3 == 0:
+            patterns.add(f"*.tmp{i}")
+        elif i % 3 == 1:
+            patterns.add(f"cache{i}-*")
+        else:
+            patterns.add(f"ignored{i}.txt")
+    return patterns
+
+
+def make_names(count: int) -> List[str]:
+    rnd = random.Random(0)
+    suffixes = [".txt", ".pdf", ".jpg", ".tmp3", ".docx"]
+    return [
+        "".join(rnd.choices(string.ascii_lowercase, k=12)) + rnd.choice(suffixes)
+        for _ in range(count)
+    ]
+
+
+def measure(match: Callable[[str], bool], names: List[str]) -> float:
+    start = time.perf_counter()
+    for name in names:
+        match(name)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--names", type=int, default=1_000_000)
+    parser.add_argument("--patterns", type=int, default=40)
+    args = parser.parse_args()
+
+    patterns = make_patterns(args.patterns)
+    names = make_names(args.names)
+    print(f"{len(patterns)} patterns, {len(names)} names")
+
+    for label, match in (
+        ("pattern_match", lambda name: pattern_match(name, patterns)),
+        ("PatternMatcher", PatternMatcher(patterns)),
+    ):
+        duration = measure(match, names)
+        per_entry = duration / len(names) * 1e9
+        print(f"{label:<15} {duration:.2f}s ({per_entry:.0f} ns / entry)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Compares walking a folder tree with different numbers of walker workers.
+
+Creates a synthetic tree of folders and adds an artificial delay to every folder
+listing to simulate the round trip of a network share (NFS, SMB).
+
+Usage:
+    python -m benchmarks.walker_workers [--dirs 2000] [--latency 0.002] [--workers 1 8]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from organize.walker import Walker
+
+
+def create_tree(root: Path, dirs: int, dirs_per_dir: int = 10) -> None:
+    for i in range(dirs):
+        folder = root / f"{i // dirs_per_dir:04d}" / f"{i:06d}"
+        folder.mkdir(parents=True, exist_ok=True)
+        (folder / "file.txt").touch()
+
+
+def simulate_latency(latency: float) -> None:
+    scandir = os.scandir
+
+    def slow_scandir(path):
+        time.sleep(latency)
+        return scandir(path)
+
+    os.scandir = slow_scandir  # type: ignore
+
+
+def run(root: Path, workers: int) -> float:
+    walker = Walker(workers=workers)
+    start = time.perf_counter()
+    for _ in walker.files(str(root)):
+        pass
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dirs", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.002)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 8, 32])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        create_tree(root, dirs=args.dirs)
+        simulate_latency(args.latency)
+        for workers in args.workers:
+            duration = run(root, workers=workers)
+            print(f"workers={workers:<3} {duration:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,17 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, ClassVar, NamedTuple, Protocol, runtime_checkable
+from typing import (
+    TYPE_CHECKING,
+    ClassVar,
+    NamedTuple,
+    Protocol,
+    Set,
+    runtime_checkable,
+)
 
 if TYPE_CHECKING:
+    from pathlib import Path
+
     from .output import Output
     from .resource import Resource
 
@@ -28,3 +37,18 @@ class Action(HasActionConfig, HasActionPipeline, Protocol):
     def __init__(self, *args, **kwargs) -> None:
         # allow any amount of args / kwargs for BaseModel and dataclasses.
         ...
+
+
+@runtime_checkable
+class HasLockPaths(Protocol):
+    """
+    Actions implementing this protocol can run for multiple resources at the same
+    time (`organize run --jobs`). Actions without it are never run concurrently.
+    """
+
+    def lock_paths(self, res: Resource) -> Set[Path]:
+        """
+        The paths (usually folders) the action writes to when handling `res`.
+        Resources with a common lock path are handled one after another.
+        """
+        ...  # pragma: no cover
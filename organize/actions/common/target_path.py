@@ -38,3 +38,14 @@ def prepare_target_path(
         if not simulate:
             result.parent.mkdir(parents=True, exist_ok=True)
         return result
+
+
+def target_folder(dst: str, autodetect_folder: bool) -> Path:
+    """
+    The folder `prepare_target_path` will place the target in, without touching the
+    filesystem.
+    """
+    result = Path(dst).resolve()
+    if result.is_dir() or user_wants_a_folder(path=dst, autodetect=autodetect_folder):
+        return result
+    return result.parent
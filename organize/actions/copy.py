@@ -1,5 +1,6 @@
 import shutil
-from typing import ClassVar, Literal
+from pathlib import Path
+from typing import ClassVar, Literal, Set
 
 from pydantic.config import ConfigDict
 from pydantic.dataclasses import dataclass
@@ -10,7 +11,7 @@ from organize.resource import Resource
 from organize.template import Template, render
 
 from .common.conflict import ConflictMode, resolve_conflict
-from .common.target_path import prepare_target_path
+from .common.target_path import prepare_target_path, target_folder
 
 
 @dataclass(config=ConfigDict(coerce_numbers_to_str=True, extra="forbid"))
@@ -66,6 +67,10 @@ class Copy:
         self._dest = Template.from_string(self.dest)
         self._rename_template = Template.from_string(self.rename_template)
 
+    def lock_paths(self, res: Resource) -> Set[Path]:
+        rendered = render(self._dest, res.dict())
+        return {target_folder(rendered, autodetect_folder=self.autodetect_folder)}
+
     def pipeline(self, res: Resource, output: Output, simulate: bool):
         assert res.path is not None, "Does not support standalone mode"
         rendered = render(self._dest, res.dict())
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import shutil
-from typing import TYPE_CHECKING, ClassVar
+from typing import TYPE_CHECKING, ClassVar, Set
 
 from pydantic.config import ConfigDict
 from pydantic.dataclasses import dataclass
@@ -38,6 +38,10 @@ class Delete:
         dirs=True,
     )
 
+    def lock_paths(self, res: Resource) -> Set[Path]:
+        assert res.path is not None, "Does not support standalone mode"
+        return {res.path.parent.resolve()}
+
     def pipeline(self, res: Resource, output: Output, simulate: bool):
         assert res.path is not None, "Does not support standalone mode"
         output.msg(res=res, msg=f"Deleting {res.path}", sender=self)
@@ -1,4 +1,5 @@
-from typing import ClassVar
+from pathlib import Path
+from typing import ClassVar, Set
 
 from pydantic.config import ConfigDict
 from pydantic.dataclasses import dataclass
@@ -32,6 +33,9 @@ class Echo:
     def __post_init__(self):
         self._msg_templ = Template.from_string(self.msg)
 
+    def lock_paths(self, res: Resource) -> Set[Path]:
+        return set()
+
     def pipeline(self, res: Resource, output: Output, simulate: bool):
         full_msg = render(self._msg_templ, res.dict())
         output.msg(res, full_msg, sender=self)
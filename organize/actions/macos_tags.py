@@ -1,5 +1,6 @@
 import sys
-from typing import ClassVar
+from pathlib import Path
+from typing import ClassVar, Set
 
 import simplematch as sm
 from pydantic.config import ConfigDict
@@ -43,6 +44,10 @@ class MacOSTags:
         if sys.platform != "darwin":
             raise EnvironmentError("The macos_tags action is only available on macOS")
 
+    def lock_paths(self, res: Resource) -> Set[Path]:
+        assert res.path is not None, "Does not support standalone mode"
+        return {res.path.resolve()}
+
     def pipeline(self, res: Resource, output: Output, simulate: bool):
         import macos_tags
 
@@ -1,5 +1,5 @@
 import textwrap
-from typing import ClassVar, Dict, Optional
+from typing import ClassVar
 
 from pydantic.config import ConfigDict
 from pydantic.dataclasses import dataclass
@@ -7,6 +7,7 @@ from pydantic.dataclasses import dataclass
 from organize.action import ActionConfig
 from organize.output import Output
 from organize.resource import Resource
+from organize.usercode import UserCode
 
 
 @dataclass(config=ConfigDict(coerce_numbers_to_str=True, extra="forbid"))
@@ -34,9 +35,12 @@ class Python:
 
     def __post_init__(self):
         self.code = textwrap.dedent(self.code)
-
-    def __usercode__(self, print, **kwargs) -> Optional[Dict]:
-        raise NotImplementedError()
+        self._usercode = UserCode(
+            self.code,
+            filename="<python action>",
+            # the names of this module stay available to the code
+            namespace=globals(),
+        )
 
     def pipeline(self, res: Resource, output: Output, simulate: bool):
         if simulate and not self.run_in_simulation:
@@ -55,13 +59,7 @@ class Python:
             msg = f"{sep.join(str(x) for x in values)}{end}"
             output.msg(res=res, msg=msg, sender=self)
 
-        # codegen the user function with arguments as available in the resource
-        kwargs = ", ".join(res.dict().keys())
-        func = f"def __userfunc(print, {kwargs}):\n"
-        func += textwrap.indent(self.code, "    ")
-        func += "\n\nself.__usercode__ = __userfunc"
-        exec(func, globals().copy(), locals().copy())
-        result = self.__usercode__(print=_output_msg, **res.dict())
+        result = self._usercode(print=_output_msg, variables=res.dict())
 
         # deep merge the resulting dict
         if not (result is None or isinstance(result, dict)):
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
-from typing import ClassVar
+from pathlib import Path
+from typing import ClassVar, Set
 
 from pydantic.config import ConfigDict
 from pydantic.dataclasses import dataclass
@@ -49,6 +50,10 @@ class Rename:
         self._new_name = Template.from_string(self.new_name)
         self._rename_template = Template.from_string(self.rename_template)
 
+    def lock_paths(self, res: Resource) -> Set[Path]:
+        assert res.path is not None, "Does not support standalone mode"
+        return {res.path.parent.resolve()}
+
     def pipeline(self, res: Resource, output: Output, simulate: bool):
         assert res.path is not None, "Does not support standalone mode"
         new_name = render(self._new_name, res.dict())
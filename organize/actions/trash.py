@@ -1,5 +1,5 @@
 from pathlib import Path
-from typing import ClassVar
+from typing import ClassVar, Set
 
 from pydantic.config import ConfigDict
 from pydantic.dataclasses import dataclass
@@ -26,6 +26,10 @@ class Trash:
         dirs=True,
     )
 
+    def lock_paths(self, res: Resource) -> Set[Path]:
+        assert res.path is not None, "Does not support standalone mode"
+        return {res.path.parent.resolve()}
+
     def pipeline(self, res: Resource, output: Output, simulate: bool):
         assert res.path is not None, "Does not support standalone mode"
         output.msg(res=res, msg=f'Trash "{res.path}"', sender=self)
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import TYPE_CHECKING, ClassVar, Literal
+from typing import TYPE_CHECKING, ClassVar, Literal, Set
 
 from pydantic.config import ConfigDict
 from pydantic.dataclasses import dataclass
@@ -66,6 +66,9 @@ class Write:
         self._path = Template.from_string(self.outfile)
         self._known_files = set()
 
+    def lock_paths(self, res: Resource) -> Set[Path]:
+        return {Path(render(self._path, res.dict())).resolve()}
+
     def pipeline(self, res: Resource, output: Output, simulate: bool):
         text = render(self._text, res.dict())
         path = Path(render(self._path, res.dict()))
@@ -0,0 +1,441 @@
+"""
+Persistent caches which survive between organize runs.
+
+The caches are stored in SQLite databases (by default in the user cache dir) so they
+can safely be shared by multiple organize processes at the same time.
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, List, NamedTuple, Optional, Union
+
+import platformdirs
+
+from organize.logger import logger
+from organize.utils import expandvars
+
+USER_CACHE_DIR = platformdirs.user_cache_path(appname="organize")
+DEFAULT_HASH_CACHE_PATH = USER_CACHE_DIR / "hashes.sqlite"
+DEFAULT_EXTRACTION_CACHE_PATH = USER_CACHE_DIR / "extracted.sqlite"
+
+# the maximum total size of the values in the extraction cache
+EXTRACTION_CACHE_MAX_SIZE = 256 * 1024 * 1024
+
+# the extraction cache checks its size after this many new entries
+EVICT_INTERVAL = 100
+
+# the last access of extraction cache entries is only updated after this time
+ACCESS_RESOLUTION = 60 * 60
+
+# entries of vanished or changed files are pruned at most once in this interval
+PRUNE_INTERVAL = 24 * 60 * 60
+
+CacheSetting = Union[bool, str]
+
+
+class FileKey(NamedTuple):
+    """
+    Identifies the content of a file without reading it.
+    """
+
+    dev: int
+    ino: int
+    size: int
+    mtime_ns: int
+
+    @classmethod
+    def from_stat(cls, stat: os.stat_result) -> FileKey:
+        return cls(
+            dev=stat.st_dev,
+            ino=stat.st_ino,
+            size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns,
+        )
+
+
+class SQLiteCache:
+    """
+    Base class of the caches stored in a SQLite database.
+
+    Subclasses create their tables in `_create_tables`. All entries are stored in
+    the table `table`.
+    """
+
+    table: str
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = self._connect()
+        _open_caches.add(self)
+        with self._lock:
+            # WAL allows readers and a writer from other processes at the same time
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._create_tables()
+
+    def _create_tables(self) -> None:
+        raise NotImplementedError  # pragma: no cover
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(
+            str(self.path),
+            timeout=30,
+            isolation_level=None,  # autocommit, transactions are explicit
+            check_same_thread=False,
+        )
+
+    def _reconnect_after_fork(self) -> None:
+        # A SQLite connection must not be used in a forked child. It is not closed
+        # either, as this could interfere with the locks of the parent.
+        _inherited_connections.append(self._conn)
+        self._lock = threading.Lock()
+        self._conn = self._connect()
+
+    def entries(self) -> int:
+        """
+        Returns the number of entries.
+        """
+        with self._lock:
+            row = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()
+        return row[0]
+
+    def clear(self) -> None:
+        """
+        Removes all entries and shrinks the database file.
+        """
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+            self._conn.execute("VACUUM")
+
+    def close(self) -> None:
+        _open_caches.discard(self)
+        with self._lock:
+            self._conn.close()
+
+
+class HashCache(SQLiteCache):
+    """
+    A persistent cache for file digests.
+
+    Entries are keyed by (st_dev, st_ino, st_size, st_mtime_ns, algorithm, kind) where
+    `kind` describes which part of the file was hashed (e.g. "first_chunk", "full").
+    """
+
+    table = "hashes"
+
+    def __init__(self, path: Path) -> None:
+        super().__init__(path)
+        self._prune_if_due()
+
+    def _create_tables(self) -> None:
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS hashes (
+                dev INTEGER NOT NULL,
+                ino INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                algo TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                path TEXT NOT NULL,
+                PRIMARY KEY (dev, ino, size, mtime_ns, algo, kind)
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value)"
+        )
+
+    def get(self, key: FileKey, algo: str, kind: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT digest FROM hashes WHERE dev = ? AND ino = ? AND size = ? "
+                "AND mtime_ns = ? AND algo = ? AND kind = ?",
+                (*key, algo, kind),
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: FileKey, path: Path, algo: str, kind: str, digest: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO hashes "
+                "(dev, ino, size, mtime_ns, algo, kind, digest, path) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (*key, algo, kind, digest, str(path)),
+            )
+
+    def lookup(
+        self,
+        path: Path,
+        algo: str,
+        kind: str,
+        compute: Callable[[], str],
+    ) -> str:
+        """
+        Returns the cached digest of `path` or calls `compute` and stores the result.
+        """
+        key = FileKey.from_stat(os.stat(path))
+        digest = self.get(key, algo=algo, kind=kind)
+        if digest is not None:
+            return digest
+
+        digest = compute()
+        # don't store the digest if the file was changed while we were reading it.
+        if FileKey.from_stat(os.stat(path)) == key:
+            self.set(key, path=path, algo=algo, kind=kind, digest=digest)
+        return digest
+
+    def prune(self) -> int:
+        """
+        Removes the entries of files which vanished or changed since they were hashed.
+
+        Returns the number of removed entries.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT path, dev, ino, size, mtime_ns FROM hashes"
+            ).fetchall()
+        stale = []
+        for path, *key in rows:
+            try:
+                if FileKey.from_stat(os.stat(path)) != FileKey(*key):
+                    stale.append((path, *key))
+            except OSError:
+                stale.append((path, *key))
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "DELETE FROM hashes WHERE path = ? AND dev = ? AND ino = ? "
+                    "AND size = ? AND mtime_ns = ?",
+                    stale,
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('pruned', ?)",
+                    (time.time(),),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return len(stale)
+
+    def _prune_if_due(self) -> None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM meta WHERE key = 'pruned'"
+            ).fetchone()
+        if row is None:
+            # fresh database, nothing to prune yet
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO meta (key, value) VALUES ('pruned', ?)",
+                    (time.time(),),
+                )
+            return
+        if time.time() - row[0] >= PRUNE_INTERVAL:
+            try:
+                removed = self.prune()
+                logger.info("Pruned %s entries from hash cache %s", removed, self.path)
+            except sqlite3.OperationalError as e:
+                # another process holds the lock for a long time - retry next run
+                logger.warning("Could not prune hash cache %s: %s", self.path, e)
+
+
+class ExtractionCache(SQLiteCache):
+    """
+    A persistent cache for data extracted from files, like the EXIF data or the text
+    of documents.
+
+    Entries are keyed by (st_dev, st_ino, st_size, st_mtime_ns, kind) where `kind`
+    describes the extracted data (e.g. "exif-exiftool"). The values are strings.
+
+    The total size of the values is bounded by `max_size`. If it is exceeded the least
+    recently used entries are evicted.
+    """
+
+    table = "extracted"
+
+    def __init__(self, path: Path, max_size: int = EXTRACTION_CACHE_MAX_SIZE) -> None:
+        super().__init__(path)
+        self.max_size = max_size
+        self._writes = 0
+
+    def _create_tables(self) -> None:
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS extracted (
+                dev INTEGER NOT NULL,
+                ino INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                value TEXT NOT NULL,
+                length INTEGER NOT NULL,
+                path TEXT NOT NULL,
+                accessed REAL NOT NULL,
+                PRIMARY KEY (dev, ino, size, mtime_ns, kind)
+            )
+            """
+        )
+
+    def get(self, key: FileKey, kind: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, accessed FROM extracted WHERE dev = ? AND ino = ? "
+                "AND size = ? AND mtime_ns = ? AND kind = ?",
+                (*key, kind),
+            ).fetchone()
+            # An UPDATE takes the write lock even if no row changes, so it is only
+            # issued if the last access is a while ago.
+            if row is not None and row[1] < now - ACCESS_RESOLUTION:
+                self._conn.execute(
+                    "UPDATE extracted SET accessed = ? WHERE dev = ? AND ino = ? "
+                    "AND size = ? AND mtime_ns = ? AND kind = ?",
+                    (now, *key, kind),
+                )
+        return row[0] if row else None
+
+    def set(self, key: FileKey, path: Path, kind: str, value: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO extracted "
+                "(dev, ino, size, mtime_ns, kind, value, length, path, accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                # the size of the stored UTF-8 text, not the number of characters
+                (*key, kind, value, len(value.encode()), str(path), time.time()),
+            )
+            self._writes += 1
+            evict = self._writes % EVICT_INTERVAL == 0
+        if evict:
+            self.evict()
+
+    def lookup(self, path: Path, kind: str, compute: Callable[[], str]) -> str:
+        """
+        Returns the cached value of `path` or calls `compute` and stores the result.
+        """
+        key = FileKey.from_stat(os.stat(path))
+        value = self.get(key, kind=kind)
+        if value is not None:
+            return value
+
+        value = compute()
+        self.set_if_unchanged(key, path=path, kind=kind, value=value)
+        return value
+
+    def set_if_unchanged(self, key: FileKey, path: Path, kind: str, value: str) -> None:
+        """
+        Stores the value extracted from `path` unless the file was changed since `key`
+        was taken.
+        """
+        try:
+            if FileKey.from_stat(os.stat(path)) == key:
+                self.set(key, path=path, kind=kind, value=value)
+        except OSError:
+            pass
+
+    def total_size(self) -> int:
+        """
+        Returns the total size of the stored values.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT SUM(length) FROM extracted").fetchone()
+        return row[0] or 0
+
+    def evict(self) -> int:
+        """
+        Removes the least recently used entries until the total size of the values is
+        below 90% of `max_size`.
+
+        Returns the number of removed entries.
+        """
+        excess = self.total_size() - self.max_size
+        if excess <= 0:
+            return 0
+        excess += self.max_size // 10
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT rowid, length FROM extracted ORDER BY accessed"
+                )
+                evicted = []
+                for rowid, length in rows:
+                    evicted.append((rowid,))
+                    excess -= length
+                    if excess <= 0:
+                        break
+                self._conn.executemany(
+                    "DELETE FROM extracted WHERE rowid = ?",
+                    evicted,
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        logger.info("Evicted %s entries from cache %s", len(evicted), self.path)
+        return len(evicted)
+
+
+_open_caches: "weakref.WeakSet[SQLiteCache]" = weakref.WeakSet()
+_inherited_connections: List[sqlite3.Connection] = []
+
+
+def _reconnect_caches_after_fork() -> None:
+    for cache in list(_open_caches):
+        cache._reconnect_after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    # filters may be evaluated in forked processes (rule option `filter_processes`)
+    os.register_at_fork(after_in_child=_reconnect_caches_after_fork)
+
+
+@lru_cache(maxsize=None)
+def open_hash_cache(path: Path) -> HashCache:
+    """
+    Returns the shared `HashCache` instance for the given database path.
+    """
+    return HashCache(path)
+
+
+def hash_cache_from_setting(setting: CacheSetting) -> Optional[HashCache]:
+    """
+    `false` disables the cache, `true` uses the default location in the user cache
+    dir, a string is used as path to the cache database.
+    """
+    if setting is False:
+        return None
+    if setting is True:
+        return open_hash_cache(DEFAULT_HASH_CACHE_PATH)
+    return open_hash_cache(expandvars(setting).resolve())
+
+
+@lru_cache(maxsize=None)
+def open_extraction_cache(path: Path) -> ExtractionCache:
+    """
+    Returns the shared `ExtractionCache` instance for the given database path.
+    """
+    return ExtractionCache(path)
+
+
+def extraction_cache_from_setting(setting: CacheSetting) -> Optional[ExtractionCache]:
+    """
+    `false` disables the cache, `true` uses the default location in the user cache
+    dir, a string is used as path to the cache database.
+    """
+    if setting is False:
+        return None
+    if setting is True:
+        return open_extraction_cache(DEFAULT_EXTRACTION_CACHE_PATH)
+    return open_extraction_cache(expandvars(setting).resolve())
@@ -4,12 +4,14 @@ organize - The file management automation tool.
 Usage:
   organize run    [options] [<config> | --stdin]
   organize sim    [options] [<config> | --stdin]
+  organize watch  [options] [<config> | --stdin]
   organize new    [<config>]
   organize edit   [<config>]
   organize check  [<config> | --stdin]
   organize debug  [<config> | --stdin]
   organize show   [--path|--reveal] [<config>]
   organize list
+  organize cache  [--clear] [<cache_path>...]
   organize docs
   organize --version
   organize --help
@@ -17,6 +19,7 @@ Usage:
 Commands:
   run        Organize your files.
   sim        Simulate organizing your files.
+  watch      Organize new and changed files as soon as they appear.
   new        Creates a default config.
   edit       Edit the config file with $EDITOR
   check      Check config file validity
@@ -25,6 +28,9 @@ Commands:
                Use --reveal to reveal the file in your file manager
                Use --path to show the path to the file
   list       Lists config files found in the default locations.
+  cache      Shows the caches and the state of incremental runs in the user
+             cache dir. Pass paths to show other cache files instead.
+               Use --clear to remove all entries
   docs       Open the documentation.
 
 Options:
@@ -36,13 +42,25 @@ Options:
                                   The output format [Default: default]
   -T --tags <tags>                Tags to run (eg. "initial,release")
   -S --skip-tags <tags>           Tags to skip
+  --shared-walk                   Walk the locations only once for consecutive rules
+                                  with the same locations. Conflicting actions of
+                                  these rules may resolve differently
+  -j --jobs <n>                   The number of files handled at the same time
+                                  [Default: 1]
+  --incremental                   Skip files which are unchanged since the same rule
+                                  evaluated them in a previous run
+  --backend <backend>             The watch backend (auto|inotify|watchdog|polling)
+                                  [Default: auto]
+  --debounce <seconds>            The time to wait for more changes of a file before
+                                  it is handled in watch mode [Default: 0.5]
   -h --help                       Show this help page.
 """
 import os
+import sqlite3
 import sys
 from functools import partial
 from pathlib import Path
-from typing import Annotated, Literal, Optional, Set, Union
+from typing import Annotated, List, Literal, Optional, Set, Tuple, Type, Union
 
 from docopt import docopt
 from pydantic import (
@@ -54,12 +72,19 @@ from pydantic import (
 )
 from pydantic.functional_validators import BeforeValidator
 from rich.console import Console
+from rich.filesize import decimal
 from rich.pretty import pprint
 from rich.syntax import Syntax
 from rich.table import Table
 from yaml.scanner import ScannerError
 
 from organize import Config, ConfigError
+from organize.cache import (
+    DEFAULT_EXTRACTION_CACHE_PATH,
+    DEFAULT_HASH_CACHE_PATH,
+    ExtractionCache,
+    HashCache,
+)
 from organize.find_config import (
     DOCS_RTD,
     ConfigNotFound,
@@ -69,7 +94,9 @@ from organize.find_config import (
 )
 from organize.logger import enable_logfile
 from organize.output import JSONL, Default, Output
+from organize.state import DEFAULT_STATE_PATH, StateStore
 from organize.utils import escape
+from organize.watch import DEBOUNCE, Backend
 
 from .__version__ import __version__
 
@@ -78,6 +105,15 @@ OutputFormat = Annotated[
     Literal["default", "jsonl", "errorsonly"], BeforeValidator(lambda v: v.lower())
 ]
 
+CacheType = Union[Type[HashCache], Type[ExtractionCache], Type[StateStore]]
+
+# the name, default path and class of the caches
+CACHES: Tuple[Tuple[str, Path, CacheType], ...] = (
+    ("hashes", DEFAULT_HASH_CACHE_PATH, HashCache),
+    ("extracted data", DEFAULT_EXTRACTION_CACHE_PATH, ExtractionCache),
+    ("incremental state", DEFAULT_STATE_PATH, StateStore),
+)
+
 console = Console()
 
 
@@ -131,6 +167,9 @@ def execute(
     tags: Tags,
     skip_tags: Tags,
     simulate: bool,
+    shared_walk: bool = False,
+    jobs: int = 1,
+    incremental: bool = False,
 ) -> None:
     Config.from_string(
         config=config.config,
@@ -141,6 +180,32 @@ def execute(
         tags=tags,
         skip_tags=skip_tags,
         working_dir=working_dir or Path("."),
+        shared_walk=shared_walk,
+        jobs=jobs,
+        incremental=incremental,
+    )
+
+
+def watch(
+    config: ConfigWithPath,
+    working_dir: Optional[Path],
+    format: OutputFormat,
+    tags: Tags,
+    skip_tags: Tags,
+    backend: Backend,
+    debounce: float,
+) -> None:
+    Config.from_string(
+        config=config.config,
+        config_path=config.config_path,
+    ).watch(
+        simulate=False,
+        output=_output_for_format(format),
+        tags=tags,
+        skip_tags=skip_tags,
+        working_dir=working_dir or Path("."),
+        backend=backend,
+        debounce=debounce,
     )
 
 
@@ -197,6 +262,59 @@ def list_() -> None:
     console.print(table)
 
 
+def _cache_type(path: Path) -> Optional[Tuple[str, CacheType]]:
+    """
+    Returns the name and class of the cache stored at `path` or `None`.
+    """
+    try:
+        conn = sqlite3.connect(f"{path.resolve().as_uri()}?mode=ro", uri=True)
+        try:
+            tables = {
+                row[0]
+                for row in conn.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'table'"
+                )
+            }
+        finally:
+            conn.close()
+    except sqlite3.DatabaseError:
+        return None
+    for name, _, CacheCls in CACHES:
+        if CacheCls.table in tables:
+            return name, CacheCls
+    return None
+
+
+def cache(clear: bool, paths: List[Path]) -> None:
+    caches: List[Tuple[str, Path, CacheType]] = []
+    for path in paths:
+        found = _cache_type(path) if path.is_file() else None
+        if found is None:
+            console.print(f'[red]Error: "{escape(path)}" is not an organize cache[/]')
+            sys.exit(1)
+        name, CacheCls = found
+        caches.append((name, path, CacheCls))
+
+    table = Table()
+    table.add_column("Cache")
+    table.add_column("Path", no_wrap=True, style="dim")
+    table.add_column("Entries", justify="right")
+    table.add_column("Size", justify="right")
+    for name, path, CacheCls in caches or CACHES:
+        if not path.exists():
+            table.add_row(name, str(path), "0", decimal(0))
+            continue
+        inst = CacheCls(path)
+        try:
+            if clear:
+                inst.clear()
+            entries = inst.entries()
+        finally:
+            inst.close()
+        table.add_row(name, str(path), str(entries), decimal(path.stat().st_size))
+    console.print(table)
+
+
 def docs() -> None:
     uri = DOCS_RTD
     print(f'Opening "{escape(uri)}"')
@@ -209,12 +327,14 @@ class CliArgs(BaseModel):
     # commands
     run: bool
     sim: bool
+    watch: bool
     new: bool
     edit: bool
     check: bool
     debug: bool
     show: bool
     list: bool
+    cache: bool
     docs: bool
 
     # run / sim options
@@ -223,12 +343,21 @@ class CliArgs(BaseModel):
     format: OutputFormat = Field("default", alias="--format")
     tags: Optional[str] = Field(..., alias="--tags")
     skip_tags: Optional[str] = Field(..., alias="--skip-tags")
+    shared_walk: bool = Field(False, alias="--shared-walk")
+    jobs: int = Field(1, alias="--jobs", ge=1)
+    incremental: bool = Field(False, alias="--incremental")
+    backend: Backend = Field("auto", alias="--backend")
+    debounce: float = Field(DEBOUNCE, alias="--debounce", ge=0)
     stdin: bool = Field(..., alias="--stdin")
 
     # show options
     path: bool = Field(False, alias="--path")
     reveal: bool = Field(False, alias="--reveal")
 
+    # cache options
+    clear: bool = Field(False, alias="--clear")
+    cache_paths: List[Path] = Field(..., alias="<cache_path>")
+
     # docopt options
     version: bool = Field(..., alias="--version")
     help: bool = Field(..., alias="--help")
@@ -272,11 +401,24 @@ def cli(argv: Union[list[str], str, None] = None) -> None:
                 format=args.format,
                 tags=_split_tags(args.tags),
                 skip_tags=_split_tags(args.skip_tags),
+                shared_walk=args.shared_walk,
+                jobs=args.jobs,
+                incremental=args.incremental,
             )
             if args.run:
                 _execute(simulate=False)
             elif args.sim:
                 _execute(simulate=True)
+        elif args.watch:
+            watch(
+                config=_config_with_path(),
+                working_dir=args.working_dir,
+                format=args.format,
+                tags=_split_tags(args.tags),
+                skip_tags=_split_tags(args.skip_tags),
+                backend=args.backend,
+                debounce=args.debounce,
+            )
         elif args.new:
             new(config=args.config)
         elif args.edit:
@@ -289,6 +431,8 @@ def cli(argv: Union[list[str], str, None] = None) -> None:
             show(config=args.config, path=args.path, reveal=args.reveal)
         elif args.list:
             list_()
+        elif args.cache:
+            cache(clear=args.clear, paths=args.cache_paths)
         elif args.docs:
             docs()
     except (ConfigError, ConfigNotFound) as e:
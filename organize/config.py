@@ -2,20 +2,25 @@ from __future__ import annotations
 
 import os
 import textwrap
+import threading
 from pathlib import Path
-from typing import Iterable, List, Optional, Union
+from typing import Iterable, List, Optional, Tuple, Union
 
 import yaml
 from pydantic import ConfigDict, ValidationError
 from pydantic.dataclasses import dataclass
 
 from .errors import ConfigError
+from .logger import logger
 from .output import Default, Output
-from .rule import Rule
+from .rule import Rule, execute_shared_walk
+from .state import open_state_store
 from .template import render
 from .utils import ReportSummary, normalize_unicode
+from .watch import DEBOUNCE, Backend, Watcher, open_source
 
 Tags = Iterable[str]
+RuleGroup = List[Tuple[int, Rule]]
 
 
 def default_yaml_cnst(loader, tag_suffix, node):
@@ -52,6 +57,25 @@ def should_execute(rule_tags: Tags, tags: Tags, skip_tags: Tags) -> bool:
     return should_run and not should_skip
 
 
+def shared_walk_groups(rules: RuleGroup) -> List[RuleGroup]:
+    """
+    Groups consecutive enabled rules with the same targets and locations which can
+    share a single walk. Disabled rules are dropped.
+    """
+    groups: List[RuleGroup] = []
+    prev_key = None
+    for rule_nr, rule in rules:
+        if not rule.enabled:
+            continue
+        key = (rule.targets, rule.walk_plan()) if rule.locations else None
+        if groups and key is not None and key == prev_key:
+            groups[-1].append((rule_nr, rule))
+        else:
+            groups.append([(rule_nr, rule)])
+        prev_key = key
+    return groups
+
+
 @dataclass(config=ConfigDict(extra="ignore"))
 class Config:
     rules: List[Rule]
@@ -86,9 +110,26 @@ class Config:
         tags: Tags = set(),
         skip_tags: Tags = set(),
         working_dir: Union[str, Path] = ".",
+        shared_walk: bool = False,
+        jobs: int = 1,
+        incremental: bool = False,
     ) -> None:
+        """
+        Executes the rules of this config.
+
+        With `shared_walk` consecutive rules with the same locations and targets walk
+        their locations only once (see `organize.rule.execute_shared_walk`). Rules
+        sharing a walk ignore `jobs`, `incremental` and their `filter_processes`.
+
+        `jobs` is the number of resources whose actions are run at the same time (see
+        `organize.jobs`).
+
+        With `incremental` the files which are unchanged since a rule evaluated them
+        are skipped (see `organize.state`).
+        """
         working_path = Path(render(str(working_dir)))
         os.chdir(working_path)
+        state_store = open_state_store() if incremental else None
         output.start(
             simulate=simulate,
             config_path=self._config_path,
@@ -96,17 +137,96 @@ class Config:
         )
         summary = ReportSummary()
         try:
-            for rule_nr, rule in enumerate(self.rules):
+            rules = [
+                (rule_nr, rule)
+                for rule_nr, rule in enumerate(self.rules)
                 if should_execute(
                     rule_tags=rule.tags,
                     tags=tags,
                     skip_tags=skip_tags,
-                ):
-                    rule_summary = rule.execute(
+                )
+            ]
+            groups = shared_walk_groups(rules) if shared_walk else [[x] for x in rules]
+            for group in groups:
+                if len(group) > 1:
+                    processes = any(rule.filter_processes > 1 for _, rule in group)
+                    if jobs > 1 or incremental or processes:
+                        logger.warning(
+                            "Rules %s share a walk, --jobs, --incremental and "
+                            "filter_processes are ignored",
+                            ", ".join(str(rule_nr) for rule_nr, _ in group),
+                        )
+                    summary += execute_shared_walk(
+                        group,
                         simulate=simulate,
                         output=output,
-                        rule_nr=rule_nr,
                     )
-                    summary += rule_summary
+                    continue
+                rule_nr, rule = group[0]
+                state = None
+                if state_store is not None:
+                    state = state_store.rule_state(
+                        rule, rule_nr=rule_nr, record=not simulate
+                    )
+                rule_summary = rule.execute(
+                    simulate=simulate,
+                    output=output,
+                    rule_nr=rule_nr,
+                    jobs=jobs,
+                    state=state,
+                )
+                summary += rule_summary
         finally:
+            self.close()
+            if state_store is not None:
+                state_store.close()
             output.end(summary.success, summary.errors)
+
+    def watch(
+        self,
+        simulate: bool = False,
+        output: Output = Default(),
+        tags: Tags = set(),
+        skip_tags: Tags = set(),
+        working_dir: Union[str, Path] = ".",
+        backend: Backend = "auto",
+        debounce: float = DEBOUNCE,
+        stop: Optional[threading.Event] = None,
+    ) -> None:
+        """
+        Watches the locations of the rules and handles new and changed files until
+        `stop` is set or the user interrupts (see `organize.watch`).
+
+        Files which already exist are not handled.
+        """
+        working_path = Path(render(str(working_dir)))
+        os.chdir(working_path)
+        output.start(
+            simulate=simulate,
+            config_path=self._config_path,
+            working_dir=working_path,
+        )
+        rules = [
+            (rule_nr, rule)
+            for rule_nr, rule in enumerate(self.rules)
+            if should_execute(rule_tags=rule.tags, tags=tags, skip_tags=skip_tags)
+        ]
+        watcher = Watcher(rules, simulate=simulate, output=output)
+        try:
+            source = open_source(backend)
+            try:
+                for path, recursive in watcher.roots().items():
+                    source.add(path, recursive=recursive)
+                watcher.run(source, debounce=debounce, stop=stop)
+            finally:
+                source.close()
+        finally:
+            self.close()
+            output.end(watcher.summary.success, watcher.summary.errors)
+
+    def close(self) -> None:
+        """
+        Closes the rules, e.g. stops the helper processes started by their filters.
+        """
+        for rule in self.rules:
+            rule.close()
@@ -1,18 +1,45 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, NamedTuple, Protocol, runtime_checkable
+from typing import (
+    TYPE_CHECKING,
+    NamedTuple,
+    Optional,
+    Protocol,
+    Sequence,
+    runtime_checkable,
+)
 
 from organize.logger import logger
 
 if TYPE_CHECKING:
+    from pathlib import Path
+
     from .output import Output
     from .resource import Resource
 
 
+# The cost classes of filters used to sort them with `filter_order: cost`.
+COST_CHEAP = 1  # only looks at the path
+COST_STAT = 2  # reads the file metadata
+COST_EXPENSIVE = 3  # reads the file content or runs external programs
+
+
 class FilterConfig(NamedTuple):
     name: str
     files: bool
     dirs: bool
+    cost: int = COST_EXPENSIVE
+    # whether the filter can be evaluated in a different order. Filters which keep
+    # state between files, change the resource or read the variables of other
+    # filters must not be moved.
+    reorderable: bool = True
+    # whether the filter compares the resources of a rule with each other. All of
+    # them then need to be evaluated by the same filter instance in one process.
+    stateful: bool = False
+    # whether the result only depends on the path, the metadata and the content of the
+    # resource. Otherwise (e.g. when comparing with the current time) the result can
+    # change while the file stays the same, so `--incremental` cannot skip it.
+    incremental: bool = True
 
 
 @runtime_checkable
@@ -31,6 +58,33 @@ class Filter(HasFilterPipeline, HasFilterConfig, Protocol):
         ...  # pragma: no cover
 
 
+@runtime_checkable
+class HasPrefetch(Protocol):
+    """
+    Filters implementing this protocol get the chance to gather data for the upcoming
+    resources in bulk before their `pipeline` is called for each resource.
+    """
+
+    def prefetch_size(self) -> Optional[int]:
+        """
+        The number of upcoming resources to prefetch. `None` disables prefetching,
+        `0` prefetches all resources of the walk.
+        """
+        ...  # pragma: no cover
+
+    def prefetch(self, paths: Sequence[Path]) -> None: ...  # pragma: no cover
+
+
+@runtime_checkable
+class HasClose(Protocol):
+    """
+    Filters implementing this protocol are closed at the end of a run, for example
+    to stop the helper processes they started.
+    """
+
+    def close(self) -> None: ...  # pragma: no cover
+
+
 class Not:
     def __init__(self, filter: Filter):
         self.filter = filter
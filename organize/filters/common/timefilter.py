@@ -1,12 +1,11 @@
 from datetime import datetime, tzinfo
-from pathlib import Path
 from typing import ClassVar, Literal, Union
 
 import arrow
 from pydantic.config import ConfigDict
 from pydantic.dataclasses import dataclass
 
-from organize.filter import FilterConfig
+from organize.filter import COST_STAT, FilterConfig
 from organize.output import Output
 from organize.resource import Resource
 
@@ -27,6 +26,7 @@ class TimeFilter:
         "timefilter",
         files=True,
         dirs=False,
+        cost=COST_STAT,
     )
 
     def __post_init__(self):
@@ -67,7 +67,7 @@ class TimeFilter:
     def pipeline(self, res: Resource, output: Output) -> bool:
         assert res.path is not None, "Does not support standalone mode"
         try:
-            dt = self.get_datetime(res.path)
+            dt = self.get_datetime(res)
         except Exception:
             return False
 
@@ -77,5 +77,5 @@ class TimeFilter:
         res.vars[self.filter_config.name] = dt
         return self.matches_datetime(dt)
 
-    def get_datetime(self, path: Path) -> datetime:
+    def get_datetime(self, res: Resource) -> datetime:
         raise NotImplementedError()
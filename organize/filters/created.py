@@ -1,10 +1,12 @@
+import os
 import subprocess
 import sys
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import ClassVar, Optional
 
-from organize.filter import FilterConfig
+from organize.filter import COST_STAT, FilterConfig
+from organize.resource import Resource
 
 from .common.timefilter import TimeFilter
 
@@ -24,9 +26,10 @@ def read_stat_created(path: Path) -> Optional[int]:
     return None
 
 
-def read_created(path: Path) -> datetime:
+def read_created(path: Path, stat_result: Optional[os.stat_result] = None) -> datetime:
     timestamp = None
-    stat_result = path.stat()
+    if stat_result is None:
+        stat_result = path.stat()
 
     # ctime is the creation time only in Windows.
     # On unix it's the datetime of the last metadata change.
@@ -77,7 +80,10 @@ class Created(TimeFilter):
         name="created",
         files=True,
         dirs=True,
+        cost=COST_STAT,
+        incremental=False,
     )
 
-    def get_datetime(self, path: Path) -> datetime:
-        return read_created(path)
+    def get_datetime(self, res: Resource) -> datetime:
+        assert res.path is not None
+        return read_created(res.path, stat_result=res.stat())
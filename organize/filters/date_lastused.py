@@ -4,7 +4,8 @@ from datetime import datetime
 from pathlib import Path
 from typing import ClassVar
 
-from organize.filter import FilterConfig
+from organize.filter import COST_EXPENSIVE, FilterConfig
+from organize.resource import Resource
 
 from .common.timefilter import TimeFilter
 
@@ -43,6 +44,8 @@ class DateLastUsed(TimeFilter):
         name="date_lastused",
         files=True,
         dirs=True,
+        cost=COST_EXPENSIVE,
+        incremental=False,
     )
 
     def __post_init__(self):
@@ -50,5 +53,6 @@ class DateLastUsed(TimeFilter):
             raise EnvironmentError("date_added is only available on macOS")
         return super().__post_init__()
 
-    def get_datetime(self, path: Path) -> datetime:
-        return read_date_lastused(path)
+    def get_datetime(self, res: Resource) -> datetime:
+        assert res.path is not None
+        return read_date_lastused(res.path)
@@ -8,18 +8,43 @@ Which was updated for python3 in:
     https://gist.github.com/tfeldmann/fc875e6630d11f2256e746f67a09c1ae
 """
 
+import os
+import stat
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
-from typing import Any, Callable, ClassVar, Literal, NamedTuple, Tuple
-
+from typing import (
+    Any,
+    Callable,
+    ClassVar,
+    Dict,
+    Iterable,
+    List,
+    Literal,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from pydantic import Field
 from pydantic.config import ConfigDict
 from pydantic.dataclasses import dataclass
 
-from organize.filter import FilterConfig
+from organize.cache import CacheSetting, hash_cache_from_setting
+from organize.filter import COST_EXPENSIVE, FilterConfig
 from organize.filters.created import read_created
-from organize.filters.hash import hash, hash_first_chunk
+from organize.filters.hash import (
+    DEFAULT_BLOCK_SIZE,
+    Reader,
+    hash,
+    hash_first_chunk,
+    hash_last_chunk,
+    hash_samples,
+    hasher_factory,
+)
 from organize.filters.lastmodified import read_lastmodified
-from organize.filters.size import read_file_size
 from organize.output import Output
 from organize.resource import Resource
 
@@ -36,6 +61,24 @@ DetectionMethod = Literal[
     "-lastmodified",
 ]
 
+HardlinkMode = Literal["duplicate", "ignore"]
+
+# files are identified by (st_dev, st_ino) so hard links are only handled once
+InodeKey = Tuple[int, int]
+
+# the file size followed by the digests of all stages computed so far
+GroupKey = Tuple[Any, ...]
+
+
+class HashStage(NamedTuple):
+    """
+    A step in the comparison of files with equal size. Each stage is only computed
+    for files which are still equal to another file after the previous stages.
+    """
+
+    kind: str  # describes the hashed part of the file, used as key in the cache
+    func: Callable[[Path], str]
+
 
 class OriginalDetectionResult(NamedTuple):
     original: Path
@@ -86,6 +129,57 @@ def detect_original(
     return result.reversed() if reverse else result
 
 
+def _inode_key(stat_result: os.stat_result) -> InodeKey:
+    return (stat_result.st_dev, stat_result.st_ino)
+
+
+def _group_candidates(items: Iterable[Tuple[GroupKey, InodeKey]]) -> List[InodeKey]:
+    """
+    Returns all inodes sharing their key with at least one other inode.
+    """
+    groups = defaultdict(list)
+    for key, inode in items:
+        groups[key].append(inode)
+    return [inode for group in groups.values() if len(group) > 1 for inode in group]
+
+
+def hash_stages(
+    algo: str,
+    chunk_size: int,
+    samples: int,
+    reader: Reader = "buffered",
+    block_size: int = DEFAULT_BLOCK_SIZE,
+) -> List[HashStage]:
+    stages = [
+        HashStage(
+            kind=f"first_chunk:{chunk_size}",
+            func=partial(hash_first_chunk, algo=algo, chunksize=chunk_size),
+        )
+    ]
+    if samples:
+        stages.append(
+            HashStage(
+                kind=f"last_chunk:{chunk_size}",
+                func=partial(hash_last_chunk, algo=algo, chunksize=chunk_size),
+            )
+        )
+        stages.append(
+            HashStage(
+                kind=f"samples:{samples}:{chunk_size}",
+                func=partial(
+                    hash_samples, algo=algo, samples=samples, chunksize=chunk_size
+                ),
+            )
+        )
+    stages.append(
+        HashStage(
+            kind="full",
+            func=partial(hash, algo=algo, reader=reader, block_size=block_size),
+        )
+    )
+    return stages
+
+
 @dataclass(config=ConfigDict(extra="forbid"))
 class Duplicate:
     """A fast duplicate file finder.
@@ -105,6 +199,51 @@ class Duplicate:
             - `"lastmodified"`: The first file sorted by date of last modification is
                the original.
 
+        hash_algorithm (str):
+            The hashing algorithm used to compare the file contents. All algorithms
+            of the [`hash`](#hash) filter are supported. If you installed the `xxhash`
+            package, `xxh3_128` is a lot faster. Default: `sha1`.
+
+        cache (bool | str):
+            Whether to store the calculated hashes in a persistent cache, so unchanged
+            files are not read again in the next runs. `true` uses a cache in the user
+            cache dir, a string is used as path to the cache file. Default: `false`.
+
+        workers (int):
+            The number of threads used to hash files. If greater than 1 the whole walk
+            is read first and the sizes and hashes of all candidates are computed in
+            parallel before any action runs. This speeds up duplicate detection on
+            network shares and fast SSDs. Only the files passing the filters on the
+            path and metadata (e.g. `extension`, `size`) before `duplicate` are
+            hashed in advance, more expensive filters before it do not reduce the
+            hashed files. Default: `1`.
+
+        hardlinks (str):
+            How to handle hard links to an already seen file. Hard links are never
+            hashed twice.
+
+            - `"duplicate"`: Hard links are duplicates of the first seen link.
+            - `"ignore"`: Hard links are not duplicates (deleting them frees no space).
+
+            Default: `"duplicate"`.
+
+        samples (int):
+            Files of equal size are compared by the hash of their first chunk before
+            their full content is hashed. If `samples` is greater than zero, the last
+            chunk and the given number of chunks evenly spaced over the file are
+            compared as well. Each stage only reads files which are still equal to
+            another file. This avoids reading large media files sharing the same
+            header completely. Default: `0`.
+
+        chunk_size (int):
+            The size of the chunks in bytes. Default: `1024`.
+
+        reader (str):
+            How files are read for the full hash. `buffered` (default) or `mmap`.
+
+        block_size (int):
+            The number of bytes hashed at once for the full hash. Default: `262144`.
+
     You can reverse the sorting method by prefixing a `-`.
 
     So with `detect_original_by: "-created"` the file with the older creation date is
@@ -113,14 +252,28 @@ class Duplicate:
 
     **Returns:**
 
-    `{duplicate.original}` - The path to the original
+    - `{duplicate.original}` - The path to the original
+    - `{duplicate.hardlink}` - Whether the duplicate is a hard link to the original
     """
 
     detect_original_by: DetectionMethod = "first_seen"
     hash_algorithm: str = "sha1"
+    cache: CacheSetting = False
+    workers: int = Field(default=1, ge=1)
+    hardlinks: HardlinkMode = "duplicate"
+    samples: int = Field(default=0, ge=0)
+    chunk_size: int = Field(default=1024, ge=1)
+    reader: Reader = "buffered"
+    block_size: int = Field(default=DEFAULT_BLOCK_SIZE, ge=1)
 
     filter_config: ClassVar[FilterConfig] = FilterConfig(
-        name="duplicate", files=True, dirs=False
+        name="duplicate",
+        files=True,
+        dirs=False,
+        cost=COST_EXPENSIVE,
+        reorderable=False,
+        stateful=True,
+        incremental=False,
     )
 
     def __post_init__(self):
@@ -131,79 +284,205 @@ class Duplicate:
             self._detect_original_by = self.detect_original_by[1:]
             self._detect_original_reverse = True
 
-        self._files_for_size = defaultdict(list)
-        self._files_for_chunk = defaultdict(list)
-        self._file_for_hash = dict()
+        self._cache = hash_cache_from_setting(self.cache)
+
+        # raises for unknown algorithms or missing packages
+        hasher_factory(self.hash_algorithm)
+        self._stages = hash_stages(
+            algo=self.hash_algorithm,
+            chunk_size=self.chunk_size,
+            samples=self.samples,
+            reader=self.reader,
+            block_size=self.block_size,
+        )
+
+        # The groups contain inodes. The path used to read an inode is the path of the
+        # current original within its hard links.
+        self._path_for_inode: Dict[InodeKey, Path] = dict()
+        self._inodes_for_key: Dict[GroupKey, List[InodeKey]] = defaultdict(list)
+        # the current original of each group of identical files
+        self._original_for_key: Dict[GroupKey, InodeKey] = dict()
+        # inodes which were found to be duplicates of another file
+        self._original_for_duplicate: Dict[InodeKey, Path] = dict()
 
-        # we keep track of the files we already computed the hashes for so we only do
-        # that once.
+        # we keep track of the files we already handled so we only do that once.
         self._seen_files = set()
-        self._first_chunk_known = set()
-        self._hash_known = set()
 
-    def pipeline(self, res: Resource, output: Output) -> bool:
-        assert res.path is not None, "Does not support standalone mode"
-        # skip symlinks
-        if res.path.is_symlink():
+        # results computed in advance by `prefetch`
+        self._prefetched_stat: Dict[Path, os.stat_result] = dict()
+        self._prefetched_digest: Dict[Tuple[InodeKey, str], str] = dict()
+
+    def prefetch_size(self) -> Optional[int]:
+        # we need to know the sizes of all files in the walk to find the candidates.
+        # `prefetch_pipeline` only passes the files reaching this filter.
+        return 0 if self.workers > 1 else None
+
+    def prefetch(self, paths: Sequence[Path]) -> None:
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            stats = self._parallel(pool, os.lstat, paths)
+            self._prefetched_stat.update(stats)
+
+            # the first path of each inode is used to read it
+            inode_paths: Dict[InodeKey, Path] = dict()
+            sizes: Dict[InodeKey, int] = dict()
+            for path, stat_result in stats.items():
+                if stat.S_ISLNK(stat_result.st_mode):
+                    continue
+                inode = _inode_key(stat_result)
+                inode_paths.setdefault(inode, path)
+                sizes[inode] = stat_result.st_size
+
+            # compute the stages for all inodes which are still equal to another one
+            keys: Dict[InodeKey, GroupKey] = {x: (size,) for x, size in sizes.items()}
+            for stage in self._stages:
+                candidates = _group_candidates((k, x) for x, k in keys.items())
+                digests = self._parallel(
+                    pool,
+                    partial(self._stage_digest, stage, inode_paths),
+                    candidates,
+                )
+                for inode, digest in digests.items():
+                    self._prefetched_digest[(inode, stage.kind)] = digest
+                keys = {x: keys[x] + (digest,) for x, digest in digests.items()}
+
+    def _stage_digest(
+        self,
+        stage: HashStage,
+        inode_paths: Dict[InodeKey, Path],
+        inode: InodeKey,
+    ) -> str:
+        return self._hash(inode_paths[inode], stage=stage)
+
+    @staticmethod
+    def _parallel(
+        pool: ThreadPoolExecutor,
+        func: Callable[[Any], Any],
+        items: Iterable[Any],
+    ) -> Dict[Any, Any]:
+        """
+        Applies `func` to all items in the thread pool. Items raising an exception
+        are left out, so the error is raised in the pipeline of the resource.
+        """
+        futures = {item: pool.submit(func, item) for item in items}
+        result = dict()
+        for item, future in futures.items():
+            try:
+                result[item] = future.result()
+            except Exception:
+                pass
+        return result
+
+    def _lstat(self, res: Resource) -> os.stat_result:
+        assert res.path is not None
+        prefetched = self._prefetched_stat.pop(res.path, None)
+        if prefetched is None:
+            return res.lstat()
+        return prefetched
+
+    def _hash(self, path: Path, stage: HashStage) -> str:
+        if self._cache is None:
+            return stage.func(path)
+        return self._cache.lookup(
+            path,
+            algo=self.hash_algorithm,
+            kind=stage.kind,
+            compute=lambda: stage.func(path),
+        )
+
+    def _digest(self, inode: InodeKey, stage: HashStage) -> str:
+        prefetched = self._prefetched_digest.pop((inode, stage.kind), None)
+        if prefetched is not None:
+            return prefetched
+        return self._hash(self._path_for_inode[inode], stage=stage)
+
+    def _detect_original(self, known: Path, new: Path) -> Tuple[Path, Path]:
+        return detect_original(
+            known=known,
+            new=new,
+            method=self._detect_original_by,
+            reverse=self._detect_original_reverse,
+        )
+
+    def _handle_hardlink(self, res: Resource, inode: InodeKey) -> bool:
+        assert res.path is not None
+        # another link to this inode is already a duplicate of a different file, so
+        # this link is a duplicate of the same original.
+        original = self._original_for_duplicate.get(inode)
+        if original is not None:
+            res.vars[self.filter_config.name] = {
+                "original": original,
+                "hardlink": False,
+            }
+            return True
+
+        if self.hardlinks == "ignore":
             return False
 
+        known = self._path_for_inode[inode]
+        original, duplicate = self._detect_original(known=known, new=res.path)
+        # from now on the inode is read by the path of the original.
+        self._path_for_inode[inode] = original
+
+        res.path = duplicate
+        res.vars[self.filter_config.name] = {"original": original, "hardlink": True}
+        return True
+
+    def pipeline(self, res: Resource, output: Output) -> bool:
+        assert res.path is not None, "Does not support standalone mode"
         # the exact same path has already been handled. This happens if multiple
         # locations emit this file in a single rule or if we follow symlinks.
         # We skip these.
         if res.path in self._seen_files:
             return False
 
-        self._seen_files.add(res.path)
-
-        # check for files with equal size
-        file_size = read_file_size(path=res.path)
-        same_size = self._files_for_size[file_size]
-        same_size.append(res.path)
-        if len(same_size) == 1:
-            # the file is unique in size and cannot be a duplicate
-            return False
-
-        # for all other files with the same file size:
-        # make sure we know their hash of their first 1024 byte chunk
-        for f in same_size[:-1]:
-            if f not in self._first_chunk_known:
-                chunk_hash = hash_first_chunk(f, algo=self.hash_algorithm)
-                self._first_chunk_known.add(f)
-                self._files_for_chunk[chunk_hash].append(f)
-
-        # check first chunk hash collisions with the current file
-        chunk_hash = hash_first_chunk(res.path, algo=self.hash_algorithm)
-        same_first_chunk = self._files_for_chunk[chunk_hash]
-        same_first_chunk.append(res.path)
-        self._first_chunk_known.add(res.path)
-        if len(same_first_chunk) == 1:
-            # the file has a unique small hash and cannot be a duplicate
+        # skip symlinks
+        stat_result = self._lstat(res)
+        if stat.S_ISLNK(stat_result.st_mode):
             return False
 
-        # Ensure we know the full hashes of all files with the same first chunk as
-        # the investigated file
-        for f in same_first_chunk[:-1]:
-            if f not in self._hash_known:
-                hash_ = hash(f, algo=self.hash_algorithm)
-                self._hash_known.add(f)
-                self._file_for_hash[hash_] = f
-
-        # check full hash collisions with the current file
-        hash_ = hash(res.path, algo=self.hash_algorithm)
-        self._hash_known.add(res.path)
-        known = self._file_for_hash.get(hash_)
-        if known:
-            original, duplicate = detect_original(
-                known=known,
-                new=res.path,
-                method=self._detect_original_by,
-                reverse=self._detect_original_reverse,
-            )
-            if known != original:
-                self._file_for_hash[hash_] = original
+        self._seen_files.add(res.path)
 
-            res.path = duplicate
-            res.vars[self.filter_config.name] = {"original": original}
-            return True
+        # hard links to an inode we already know have the same content
+        inode = _inode_key(stat_result)
+        if inode in self._path_for_inode:
+            return self._handle_hardlink(res=res, inode=inode)
+        self._path_for_inode[inode] = res.path
+
+        # Check for files with equal size. Then compare the files stage by stage
+        # as long as they are still equal to another file.
+        key: GroupKey = (stat_result.st_size,)
+        group = self._inodes_for_key[key]
+        group.append(inode)
+        for stage in self._stages:
+            if len(group) == 1:
+                # the file is unique and cannot be a duplicate
+                return False
+
+            # The first file in this group was not needed to be hashed until now.
+            # All other files had their digest computed when they were added.
+            if len(group) == 2:
+                first = group[0]
+                self._inodes_for_key[key + (self._digest(first, stage),)].append(first)
+
+            key = key + (self._digest(inode, stage),)
+            group = self._inodes_for_key[key]
+            group.append(inode)
+
+        if len(group) == 1:
+            return False
 
-        return False
+        # the file is identical to all other files in the group
+        known = self._original_for_key.setdefault(key, group[0])
+        original, duplicate = self._detect_original(
+            known=self._path_for_inode[known],
+            new=res.path,
+        )
+        if duplicate == res.path:
+            self._original_for_duplicate[inode] = original
+        else:
+            self._original_for_duplicate[known] = original
+            self._original_for_key[key] = inode
+
+        res.path = duplicate
+        res.vars[self.filter_config.name] = {"original": original, "hardlink": False}
+        return True
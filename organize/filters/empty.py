@@ -3,7 +3,7 @@ from typing import ClassVar
 from pydantic.config import ConfigDict
 from pydantic.dataclasses import dataclass
 
-from organize.filter import FilterConfig
+from organize.filter import COST_STAT, FilterConfig
 from organize.output import Output
 from organize.resource import Resource
 
@@ -16,6 +16,7 @@ class Empty:
         name="empty",
         files=True,
         dirs=True,
+        cost=COST_STAT,
     )
 
     def pipeline(self, res: Resource, output: Output) -> bool:
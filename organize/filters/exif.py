@@ -1,18 +1,38 @@
 import collections
 import fnmatch
+import io
 import json
 import os
 import subprocess
+import threading
 from datetime import date, datetime, timedelta
 from functools import lru_cache
 from pathlib import Path
-from typing import Any, ClassVar, DefaultDict, Dict, Optional, Union
+from typing import (
+    Any,
+    ClassVar,
+    DefaultDict,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 import exifread
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, PrivateAttr
 from rich import print
 
-from organize.filter import FilterConfig
+from organize.cache import (
+    CacheSetting,
+    ExtractionCache,
+    FileKey,
+    extraction_cache_from_setting,
+)
+from organize.filter import COST_EXPENSIVE, FilterConfig
 from organize.logger import logger
 from organize.output import Output
 from organize.resource import Resource
@@ -24,6 +44,12 @@ ExifDefaultDict = DefaultDict[str, DefaultDict[str, ExifValue]]
 
 ORGANIZE_EXIFTOOL_PATH = os.environ.get("ORGANIZE_EXIFTOOL_PATH", "")
 
+# the number of files exiftool reads with a single command
+EXIFTOOL_BATCH_SIZE = 200
+
+# the number of bytes exifread reads at once from the start of a file
+DEFAULT_HEADER_SIZE = 64 * 1024
+
 
 @lru_cache(maxsize=1)
 def exiftool_available() -> bool:
@@ -62,12 +88,6 @@ def group_keys_by_splitting(
     return dict(result)
 
 
-def lowercase_keys_recursive(data) -> Dict:
-    if isinstance(data, Dict):
-        return {k.lower(): lowercase_keys_recursive(v) for k, v in data.items()}
-    return data
-
-
 def parse_date_value(value: str) -> Union[datetime, date, str]:
     """
     Parse datetime or date values (e.g. image.datetime, exif.datetimeoriginal, ...)
@@ -109,22 +129,103 @@ def convert_value(key: str, value: str) -> ExifValue:
     return value
 
 
-def convert_recursive(data):
-    result = dict()
-    for k, v in data.items():
-        if isinstance(v, Dict):
-            result[k] = convert_recursive(v)
-        else:
-            result[k] = convert_value(k, v)
-    return result
+class ExifData(Mapping[str, Any]):
+    """
+    A read-only view of the EXIF data of a file.
+
+    The keys are lowercased (with `lowercase`) and the values converted (with
+    `convert`, see `convert_value`) when they are accessed. Images with hundreds of
+    tags then only pay for the tags a rule uses.
+    """
+
+    __slots__ = ("_data", "_lowercase", "_convert", "_keys", "_values")
+
+    def __init__(self, data: Dict[str, Any], lowercase: bool, convert: bool) -> None:
+        self._data = data
+        self._lowercase = lowercase
+        self._convert = convert
+        # the keys of `_data` by the key they are accessed with
+        self._keys: Optional[Dict[str, str]] = None
+        self._values: Dict[str, Any] = {}
+
+    def _key_map(self) -> Dict[str, str]:
+        if self._keys is None:
+            if self._lowercase:
+                self._keys = {key.lower(): key for key in self._data}
+            else:
+                self._keys = {key: key for key in self._data}
+        return self._keys
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return self._values[key]
+        except KeyError:
+            pass
+        value = self._data[self._key_map()[key] if self._lowercase else key]
+        if isinstance(value, dict):
+            value = ExifData(value, lowercase=self._lowercase, convert=self._convert)
+        elif self._convert:
+            value = convert_value(key, value)
+        self._values[key] = value
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._key_map())
+
+    def __len__(self) -> int:
+        return len(self._key_map())
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Returns the data with all keys and values converted as (nested) plain dicts.
+        """
+        return {
+            key: value.to_dict() if isinstance(value, ExifData) else value
+            for key, value in self.items()
+        }
 
+    def __repr__(self) -> str:
+        return repr(self.to_dict())
 
-def exifread_read(path: Path) -> ExifStrDict:
+
+class _Header(io.BytesIO):
+    """
+    The start of a file. Notes whether data beyond it was requested.
+    """
+
+    def __init__(self, data: bytes, complete: bool) -> None:
+        super().__init__(data)
+        self.complete = complete
+        self.exceeded = False
+
+    def read(self, size: Optional[int] = -1) -> bytes:
+        data = super().read(size)
+        if not self.complete and (size is None or size < 0 or len(data) < size):
+            self.exceeded = True
+        return data
+
+
+def exifread_read(path: Path, header_size: Optional[int] = None) -> ExifStrDict:
     """
     Uses the `exifread` library to read the EXIF data
+
+    With `header_size` the start of the file is read at once and parsed in memory.
+    If the EXIF data reaches beyond it the whole file is parsed instead.
     """
     with path.open("rb") as f:
-        data = exifread.process_file(fh=f, details=False, debug=False)
+        data = None
+        if header_size:
+            header = f.read(header_size + 1)
+            fh = _Header(header[:header_size], complete=len(header) <= header_size)
+            try:
+                data = exifread.process_file(fh=fh, details=False, debug=False)
+            except Exception:
+                if fh.complete:
+                    raise
+            if fh.exceeded:
+                data = None
+        if data is None:
+            data = exifread.process_file(fh=f, details=False, debug=False)
     # at this point data still contains exifread specific types like
     # Short / Ratio / ASCII which we now convert to a printable representation
     printable = {key: val.printable for (key, val) in data.items()}
@@ -132,6 +233,25 @@ def exifread_read(path: Path) -> ExifStrDict:
     return grouped
 
 
+def _exiftool_data(data: Dict) -> ExifStrDict:
+    # if the result only contains "File", "SourceFile" and "ExifTool" it means exiftool
+    # couldn't find any additional data about this file.
+    if set(data.keys()) == set(["SourceFile", "ExifTool", "File"]):
+        return dict()
+    return data
+
+
+def parse_exiftool_json(data_json: str) -> ExifStrDict:
+    """
+    Parses the JSON output of exiftool for a single file.
+    """
+    if not data_json.strip():
+        return dict()
+
+    # we pass a single filepath, so we are interested in the first element
+    return _exiftool_data(json.loads(data_json)[0])
+
+
 def exiftool_read(path: Path) -> ExifStrDict:
     """
     Uses the `exiftool` tool by Phil Harvey to read the EXIF data
@@ -149,21 +269,141 @@ def exiftool_read(path: Path) -> ExifStrDict:
         )
     except subprocess.CalledProcessError:
         return dict()
+    return parse_exiftool_json(data_json)
 
-    # we pass a single filepath, so we are interested in the first element
-    data: Dict = json.loads(data_json)[0]
 
-    # if the result only contains "File", "SourceFile" and "ExifTool" it means exiftool
-    # couldn't find any additional data about this file.
-    if set(data.keys()) == set(["SourceFile", "ExifTool", "File"]):
-        return dict()
+class ExifTool:
+    """
+    A long running `exiftool -stay_open True -@ -` process.
 
-    return data
+    Starting exiftool takes about 100ms, so the process is started once and reads the
+    arguments of each command from stdin. The output of a command ends with a
+    `{ready<n>}` line. A crashed process is restarted. Forked processes (see the rule
+    option `filter_processes`) start their own process.
+    """
+
+    def __init__(self, executable: str) -> None:
+        self.executable = executable
+        self._lock = threading.Lock()
+        self._process: Optional[subprocess.Popen] = None
+        self._pid = 0
+        self._counter = 0
+
+    def _start(self) -> subprocess.Popen:
+        logger.debug("Starting %s -stay_open", self.executable)
+        return subprocess.Popen(
+            (self.executable, "-stay_open", "True", "-@", "-"),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            encoding="utf-8",
+            errors="surrogateescape",
+        )
+
+    def _execute(self, args: Sequence[str]) -> str:
+        if self._process is None or self._pid != os.getpid():
+            # the process of the parent cannot be shared with a forked child
+            self._process = self._start()
+            self._pid = os.getpid()
+        process = self._process
+        assert process.stdin is not None and process.stdout is not None
+        self._counter += 1
+        ready = f"{{ready{self._counter}}}"
+        process.stdin.write("\n".join((*args, f"-execute{self._counter}", "")))
+        process.stdin.flush()
+        lines: List[str] = []
+        while True:
+            line = process.stdout.readline()
+            if not line:
+                raise EOFError(f"{self.executable} exited unexpectedly")
+            if line.rstrip() == ready:
+                return "".join(lines)
+            lines.append(line)
+
+    def execute(self, *args: str) -> str:
+        """
+        Runs exiftool with the given arguments and returns its output.
+
+        If the process crashed it is restarted and the command is retried once.
+        """
+        with self._lock:
+            try:
+                return self._execute(args)
+            except (OSError, EOFError) as e:
+                logger.warning("Restarting exiftool: %s", e)
+                self._kill()
+            try:
+                return self._execute(args)
+            except (OSError, EOFError):
+                self._kill()
+                raise
+
+    def read(self, path: Path) -> ExifStrDict:
+        """
+        Reads the EXIF data of a single file.
+        """
+        # the arguments are separated by newlines
+        if "\n" in str(path):
+            return exiftool_read(path)
+        try:
+            data_json = self.execute("-j", "-g", "--fast", str(path))
+        except (OSError, EOFError) as e:
+            logger.warning("exiftool failed to read %s: %s", path, e)
+            return dict()
+        return parse_exiftool_json(data_json)
+
+    def read_many(self, paths: Sequence[Path]) -> Dict[Path, ExifStrDict]:
+        """
+        Reads the EXIF data of multiple files with a single command.
+
+        Files exiftool reports no data for are mapped to an empty dict. Files which
+        cannot be read this way are left out.
+        """
+        args = [str(path) for path in paths if "\n" not in str(path)]
+        if not args:
+            return dict()
+        try:
+            data_json = self.execute("-j", "-g", "--fast", *args)
+        except (OSError, EOFError) as e:
+            logger.warning("exiftool failed to read a batch of files: %s", e)
+            return dict()
+        result: Dict[Path, ExifStrDict] = {Path(arg): dict() for arg in args}
+        if data_json.strip():
+            # exiftool reports the paths with forward slashes on Windows, the Path
+            # comparison takes care of that.
+            for data in json.loads(data_json):
+                result[Path(data["SourceFile"])] = _exiftool_data(data)
+        return result
+
+    def _kill(self) -> None:
+        if self._process is not None and self._pid == os.getpid():
+            self._process.kill()
+            self._process.wait()
+        self._process = None
+
+    def close(self) -> None:
+        """
+        Stops the exiftool process.
+        """
+        with self._lock:
+            process = self._process
+            if process is None or self._pid != os.getpid():
+                self._process = None
+                return
+            assert process.stdin is not None
+            try:
+                process.stdin.write("-stay_open\nFalse\n")
+                process.stdin.close()
+                process.wait(timeout=5)
+            except (OSError, subprocess.TimeoutExpired):
+                process.kill()
+                process.wait()
+            self._process = None
 
 
 def matches_tags(
     filter_tags: Dict[str, Optional[str]],
-    data: Dict[str, Dict[str, str]],
+    data: Mapping[str, Any],
 ) -> bool:
     if not data:
         return False
@@ -195,7 +435,9 @@ class Exif(BaseModel):
     ORGANIZE_EXIFTOOL_PATH="exiftool"
     ```
 
-    organize will then use `exiftool` to extract the EXIF data.
+    organize will then use `exiftool` to extract the EXIF data. A single `exiftool`
+    process is started for the whole run instead of one per file and it reads the
+    data of 200 files at once.
 
     Exif fields which contain "datetime", "date" or "offsettime" in their fieldname
     will have their value converted to 'datetime.datetime', 'datetime.date' and
@@ -206,10 +448,20 @@ class Exif(BaseModel):
 
     Attributes:
         lowercase_keys (bool): Whether to lowercase all EXIF keys (Default: true)
+        header_size (int):
+            Without exiftool the first `header_size` bytes of a file are read at once
+            to find the EXIF data. Files whose EXIF data reaches beyond it are read
+            as a whole. `0` reads the whole file right away. (Default: 65536)
+        cache (bool | str): Whether to store the EXIF data in a persistent cache.
+            Unchanged files are then not read again in the next runs. `true` uses a
+            cache in the user cache dir, a string is used as path to the cache file.
+            `false` by default.
 
     :returns:
-        ``{exif}`` -- a dict of all the collected exif inforamtion available in the
-        file. Typically it consists of the following tags (if present in the file):
+        ``{exif}`` -- a read-only mapping of all the collected exif inforamtion
+        available in the file. It is not a `dict`, use ``exif.to_dict()`` in `python`
+        filters and actions to get one (e.g. for `json.dumps`). Typically it consists
+        of the following tags (if present in the file):
 
         - ``{exif.image}`` -- information related to the main image
         - ``{exif.exif}`` -- Exif information
@@ -219,11 +471,19 @@ class Exif(BaseModel):
 
     filter_tags: Dict
     lowercase_keys: bool = True
+    header_size: int = Field(DEFAULT_HEADER_SIZE, ge=0)
+    cache: CacheSetting = False
+
+    _cache: Optional[ExtractionCache] = PrivateAttr(default=None)
+    _exiftool: Optional[ExifTool] = PrivateAttr(default=None)
+    # the data of the upcoming files read by `prefetch`
+    _prefetched: Dict[Path, ExifStrDict] = PrivateAttr(default_factory=dict)
 
     filter_config: ClassVar[FilterConfig] = FilterConfig(
         name="exif",
         files=True,
         dirs=False,
+        cost=COST_EXPENSIVE,
     )
 
     def __init__(
@@ -231,6 +491,8 @@ class Exif(BaseModel):
         *args,
         filter_tags: Optional[Dict] = None,
         lowercase_keys: bool = True,
+        header_size: int = DEFAULT_HEADER_SIZE,
+        cache: CacheSetting = False,
         **kwargs,
     ):
         # exif filter is used differently from other filters. The **kwargs are not
@@ -241,26 +503,97 @@ class Exif(BaseModel):
         # *args are tags filtered without a value, like ["gps", "image.model"].
         for arg in args:
             params[arg] = None
-        super().__init__(filter_tags=params, lowercase_keys=lowercase_keys)
+        super().__init__(
+            filter_tags=params,
+            lowercase_keys=lowercase_keys,
+            header_size=header_size,
+            cache=cache,
+        )
+
+    def model_post_init(self, context: Any, /) -> None:
+        self._cache = extraction_cache_from_setting(self.cache)
+
+    def exiftool(self) -> ExifTool:
+        if self._exiftool is None:
+            self._exiftool = ExifTool(ORGANIZE_EXIFTOOL_PATH)
+        return self._exiftool
+
+    def prefetch_size(self) -> Optional[int]:
+        # exifread reads one file after another anyway
+        return EXIFTOOL_BATCH_SIZE if exiftool_available() else None
+
+    def prefetch(self, paths: Sequence[Path]) -> None:
+        kind = self.cache_kind()
+        prefetched: Dict[Path, ExifStrDict] = dict()
+        # the paths to read with their file key taken before reading
+        missing: List[Tuple[Path, Optional[FileKey]]] = []
+        for path in paths:
+            key = None
+            if self._cache is not None:
+                try:
+                    key = FileKey.from_stat(os.stat(path))
+                except OSError:
+                    continue
+                cached = self._cache.get(key, kind=kind)
+                if cached is not None:
+                    prefetched[path] = json.loads(cached)
+                    continue
+            missing.append((path, key))
+
+        read = self.exiftool().read_many([path for path, _ in missing])
+        for path, key in missing:
+            if path not in read:
+                continue
+            prefetched[path] = read[path]
+            if self._cache is not None and key is not None:
+                self._cache.set_if_unchanged(
+                    key, path=path, kind=kind, value=json.dumps(read[path])
+                )
+        self._prefetched = prefetched
+
+    def cache_kind(self) -> str:
+        """
+        Describes how the EXIF data is read, used as key in the cache.
+        """
+        return "exif-exiftool" if exiftool_available() else "exif-exifread"
+
+    def read(self, path: Path) -> ExifStrDict:
+        if exiftool_available():
+            return self.exiftool().read(path=path)
+        return exifread_read(path=path, header_size=self.header_size)
 
     def pipeline(self, res: Resource, output: Output) -> bool:
         assert res.path is not None, "Does not support standalone mode"
+        path = res.path
 
         # gather the exif data in a dict
-        if exiftool_available():
-            data = exiftool_read(path=res.path)
-        else:
-            data = exifread_read(path=res.path)
-
-        # lowercase keys if wanted
-        if self.lowercase_keys:
-            data = lowercase_keys_recursive(data)
-
-        # convert strings to datetime objects where possible
-        parsed = convert_recursive(data)
+        data = self._prefetched.pop(path, None)
+        if data is None:
+            if self._cache is None:
+                data = self.read(path)
+            else:
+                data = json.loads(
+                    self._cache.lookup(
+                        path,
+                        kind=self.cache_kind(),
+                        compute=lambda: json.dumps(self.read(path)),
+                    )
+                )
+
+        # the keys are lowercased and the values converted to datetime objects where
+        # possible when they are accessed. The tags are matched with the raw values.
+        res.vars[self.filter_config.name] = ExifData(
+            data, lowercase=self.lowercase_keys, convert=True
+        )
+        return matches_tags(
+            self.filter_tags,
+            ExifData(data, lowercase=self.lowercase_keys, convert=False),
+        )
 
-        res.vars[self.filter_config.name] = parsed
-        return matches_tags(self.filter_tags, data)
+    def close(self) -> None:
+        if self._exiftool is not None:
+            self._exiftool.close()
+            self._exiftool = None
 
 
 if __name__ == "__main__":
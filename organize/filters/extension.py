@@ -5,7 +5,7 @@ from pydantic import Field, field_validator
 from pydantic.config import ConfigDict
 from pydantic.dataclasses import dataclass
 
-from organize.filter import FilterConfig
+from organize.filter import COST_CHEAP, FilterConfig
 from organize.output import Output
 from organize.resource import Resource
 from organize.validators import flatten
@@ -46,6 +46,7 @@ class Extension:
         name="extension",
         files=True,
         dirs=False,
+        cost=COST_CHEAP,
     )
 
     @field_validator("extensions", mode="before")
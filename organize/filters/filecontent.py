@@ -7,7 +7,8 @@ from typing import Callable, ClassVar, Dict, Union
 from pydantic.config import ConfigDict
 from pydantic.dataclasses import dataclass
 
-from organize.filter import FilterConfig
+from organize.cache import CacheSetting, extraction_cache_from_setting
+from organize.filter import COST_EXPENSIVE, FilterConfig
 from organize.logger import logger
 from organize.output import Output
 from organize.resource import Resource
@@ -98,6 +99,16 @@ def textract(path: Path) -> str:
     return extractor(path)
 
 
+def text_kind(path: Path) -> str:
+    """
+    Describes how the text of `path` is extracted, used as key in the cache.
+    """
+    suffix = path.suffix.lower()
+    if suffix == ".pdf":
+        return "text-pdftotext" if _pdftotext_available() else "text-pdfminer"
+    return f"text-{suffix[1:]}"
+
+
 @dataclass(config=ConfigDict(coerce_numbers_to_str=True, extra="forbid"))
 class FileContent:
     """Matches file content with the given regular expression.
@@ -109,6 +120,10 @@ class FileContent:
 
     Attributes:
         expr (str): The regular expression to be matched.
+        cache (bool | str): Whether to store the extracted text in a persistent
+            cache. Unchanged files are then not read again in the next runs.
+            `true` uses a cache in the user cache dir, a string is used as path to the
+            cache file. `false` by default.
 
     Any named groups (`(?P<groupname>.*)`) in your regular expression will
     be returned like this:
@@ -126,19 +141,31 @@ class FileContent:
     """
 
     expr: str = r"(?P<all>.*)"
+    cache: CacheSetting = False
 
     filter_config: ClassVar[FilterConfig] = FilterConfig(
         name="filecontent",
         files=True,
         dirs=False,
+        cost=COST_EXPENSIVE,
     )
 
     def __post_init__(self):
         self._expr = re.compile(self.expr, re.MULTILINE | re.DOTALL)
+        self._cache = extraction_cache_from_setting(self.cache)
+
+    def content(self, path: Path) -> str:
+        if self._cache is None:
+            return textract(path)
+        return self._cache.lookup(
+            path,
+            kind=text_kind(path),
+            compute=lambda: textract(path),
+        )
 
     def matches(self, path: Path) -> Union[re.Match, None]:
         try:
-            content = textract(path)
+            content = self.content(path)
             match = self._expr.search(content)
             return match
         except Exception:
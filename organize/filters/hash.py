@@ -1,25 +1,94 @@
 import hashlib
+import importlib
+import mmap
+import os
 from pathlib import Path
-from typing import ClassVar
+from typing import Any, Callable, ClassVar, Dict, List, Literal, Tuple
 
+from pydantic import Field
 from pydantic.config import ConfigDict
 from pydantic.dataclasses import dataclass
 
-from organize.filter import FilterConfig
+from organize.cache import CacheSetting, hash_cache_from_setting
+from organize.filter import COST_EXPENSIVE, FilterConfig
 from organize.output import Output
 from organize.resource import Resource
 from organize.template import Template, render
 
+Reader = Literal["buffered", "mmap"]
+
+DEFAULT_BLOCK_SIZE = 2**18
+
+# Fast non-cryptographic hash algorithms provided by optional packages:
+# algorithm name -> (package name, constructor name)
+OPTIONAL_ALGORITHMS: Dict[str, Tuple[str, str]] = {
+    "xxh32": ("xxhash", "xxh32"),
+    "xxh64": ("xxhash", "xxh64"),
+    "xxh3_64": ("xxhash", "xxh3_64"),
+    "xxh3_128": ("xxhash", "xxh3_128"),
+    "xxh128": ("xxhash", "xxh128"),
+    "blake3": ("blake3", "blake3"),
+}
+
+
+def hasher_factory(algo: str) -> Callable[[], Any]:
+    """
+    Returns a constructor for hash objects of the given algorithm.
+
+    Supports all algorithms of `hashlib` and the fast hash algorithms in
+    `OPTIONAL_ALGORITHMS` if their package is installed.
+    """
+    if algo in OPTIONAL_ALGORITHMS:
+        package, constructor = OPTIONAL_ALGORITHMS[algo]
+        try:
+            module = importlib.import_module(package)
+        except ImportError as e:
+            raise ValueError(
+                f'Hash algorithm "{algo}" requires the "{package}" package '
+                f'("pip install {package}").'
+            ) from e
+        return getattr(module, constructor)
+    # raises a ValueError for unknown algorithms
+    hashlib.new(algo)
+    return lambda: hashlib.new(algo)
+
+
+def _update_mmap(h: Any, path: Path, block_size: int) -> None:
+    with path.open("rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            # empty files cannot be mapped
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            if hasattr(m, "madvise"):
+                m.madvise(mmap.MADV_SEQUENTIAL)
+            with memoryview(m) as view:
+                for offset in range(0, size, block_size):
+                    h.update(view[offset : offset + block_size])
+
+
+def hash(
+    path: Path,
+    algo: str,
+    *,
+    reader: Reader = "buffered",
+    block_size: int = DEFAULT_BLOCK_SIZE,
+) -> str:
+    factory = hasher_factory(algo)
+
+    if reader == "mmap":
+        h = factory()
+        _update_mmap(h, path=path, block_size=block_size)
+        return h.hexdigest()
 
-def hash(path: Path, algo: str, *, _bufsize=2**18) -> str:
     # for python >= 3.11 we can use hashlib.file_digest
     if hasattr(hashlib, "file_digest"):
         with path.open("rb") as f:
-            return hashlib.file_digest(f, algo, _bufsize=_bufsize).hexdigest()
+            return hashlib.file_digest(f, factory, _bufsize=block_size).hexdigest()
 
     # otherwise we have to use our own backported implementation:
-    h = hashlib.new(algo)
-    buf = bytearray(_bufsize)
+    h = factory()
+    buf = bytearray(block_size)
     view = memoryview(buf)
     with path.open("rb", buffering=0) as f:
         while size := f.readinto(buf):
@@ -28,20 +97,62 @@ def hash(path: Path, algo: str, *, _bufsize=2**18) -> str:
 
 
 def hash_first_chunk(path: Path, algo: str, *, chunksize=1024) -> str:
-    h = hashlib.new(algo)
+    h = hasher_factory(algo)()
     with path.open("rb") as f:
         chunk = f.read(chunksize)
         h.update(chunk)
     return h.hexdigest()
 
 
+def hash_last_chunk(path: Path, algo: str, *, chunksize=1024) -> str:
+    h = hasher_factory(algo)()
+    with path.open("rb") as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - chunksize))
+        h.update(f.read(chunksize))
+    return h.hexdigest()
+
+
+def sample_offsets(size: int, samples: int, chunksize: int) -> List[int]:
+    """
+    Returns the offsets of `samples` chunks evenly spaced between the first and the
+    last chunk of a file with the given size.
+
+    >>> sample_offsets(size=10000, samples=3, chunksize=1000)
+    [2750, 4500, 6250]
+    """
+    space = size - 2 * chunksize
+    if space <= 0 or samples <= 0:
+        return []
+    step = (space - chunksize) / (samples + 1) if space > chunksize else 0
+    return sorted({chunksize + round(step * (i + 1)) for i in range(samples)})
+
+
+def hash_samples(path: Path, algo: str, *, samples: int, chunksize=1024) -> str:
+    h = hasher_factory(algo)()
+    with path.open("rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        for offset in sample_offsets(size=size, samples=samples, chunksize=chunksize):
+            f.seek(offset)
+            h.update(f.read(chunksize))
+    return h.hexdigest()
+
+
 @dataclass(config=ConfigDict(extra="forbid"))
 class Hash:
     """Calculates the hash of a file.
 
     Attributes:
-        algorithm (str): Any hashing algorithm available to python's `hashlib`.
-            `md5` by default.
+        algorithm (str): Any hashing algorithm available to python's `hashlib` or
+            one of the fast hash algorithms listed below. `md5` by default.
+        cache (bool | str): Whether to store the calculated hashes in a persistent
+            cache. Unchanged files are then not read again in the next runs.
+            `true` uses a cache in the user cache dir, a string is used as path to the
+            cache file. `false` by default.
+        reader (str): How the file is read. `buffered` (the default) reads the file in
+            blocks, `mmap` maps the file into memory which can be faster for large
+            files on fast storage.
+        block_size (int): The number of bytes hashed at once. `262144` by default.
 
     Algorithms guaranteed to be available are
     `shake_256`, `sha3_256`, `sha1`, `sha3_224`, `sha384`, `sha512`, `blake2b`,
@@ -62,25 +173,42 @@ class Hash:
     'sha512'}
     ```
 
+    If cryptographic strength is not needed (e.g. to compare files) you can install
+    the `xxhash` package to use the much faster `xxh32`, `xxh64`, `xxh3_64`,
+    `xxh3_128` and `xxh128` algorithms or the `blake3` package for `blake3`.
+
     **Returns:**
 
     - `{hash}`:  The hash of the file.
     """
 
     algorithm: str = "md5"
+    cache: CacheSetting = False
+    reader: Reader = "buffered"
+    block_size: int = Field(default=DEFAULT_BLOCK_SIZE, ge=1)
 
     filter_config: ClassVar[FilterConfig] = FilterConfig(
         name="hash",
         files=True,
         dirs=False,
+        cost=COST_EXPENSIVE,
     )
 
     def __post_init__(self):
         self._algorithm = Template.from_string(self.algorithm)
+        self._cache = hash_cache_from_setting(self.cache)
 
     def pipeline(self, res: Resource, output: Output) -> bool:
         assert res.path is not None
         algo = render(self._algorithm, res.dict()).lower()
-        result = hash(path=res.path, algo=algo)
+        path = res.path
+
+        def compute() -> str:
+            return hash(path, algo=algo, reader=self.reader, block_size=self.block_size)
+
+        if self._cache is not None:
+            result = self._cache.lookup(path, algo=algo, kind="full", compute=compute)
+        else:
+            result = compute()
         res.vars[self.filter_config.name] = result
         return True
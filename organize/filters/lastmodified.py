@@ -1,14 +1,20 @@
+import os
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import ClassVar
+from typing import ClassVar, Optional
 
-from organize.filter import FilterConfig
+from organize.filter import COST_STAT, FilterConfig
+from organize.resource import Resource
 
 from .common.timefilter import TimeFilter
 
 
-def read_lastmodified(path: Path) -> datetime:
-    return datetime.fromtimestamp(path.stat().st_mtime, tz=timezone.utc)
+def read_lastmodified(
+    path: Path, stat_result: Optional[os.stat_result] = None
+) -> datetime:
+    if stat_result is None:
+        stat_result = path.stat()
+    return datetime.fromtimestamp(stat_result.st_mtime, tz=timezone.utc)
 
 
 class LastModified(TimeFilter):
@@ -35,7 +41,10 @@ class LastModified(TimeFilter):
         name="lastmodified",
         files=True,
         dirs=True,
+        cost=COST_STAT,
+        incremental=False,
     )
 
-    def get_datetime(self, path: Path) -> datetime:
-        return read_lastmodified(path)
+    def get_datetime(self, res: Resource) -> datetime:
+        assert res.path is not None
+        return read_lastmodified(res.path, stat_result=res.stat())
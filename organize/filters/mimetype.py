@@ -5,7 +5,7 @@ from pydantic import Field
 from pydantic.config import ConfigDict
 from pydantic.dataclasses import dataclass
 
-from organize.filter import FilterConfig
+from organize.filter import COST_CHEAP, FilterConfig
 from organize.output import Output
 from organize.resource import Resource
 from organize.validators import FlatList
@@ -44,6 +44,7 @@ class MimeType:
         name="mimetype",
         files=True,
         dirs=False,
+        cost=COST_CHEAP,
     )
 
     def matches(self, mimetype) -> bool:
@@ -1,13 +1,14 @@
 import textwrap
-from typing import ClassVar, Dict, Optional
+from typing import ClassVar
 
 from pydantic import field_validator
 from pydantic.config import ConfigDict
 from pydantic.dataclasses import dataclass
 
-from organize.filter import FilterConfig
+from organize.filter import COST_EXPENSIVE, FilterConfig
 from organize.output import Output
 from organize.resource import Resource
+from organize.usercode import UserCode
 
 
 @dataclass(config=ConfigDict(coerce_numbers_to_str=True, extra="forbid"))
@@ -36,6 +37,9 @@ class Python:
         name="python",
         files=True,
         dirs=True,
+        cost=COST_EXPENSIVE,
+        reorderable=False,
+        incremental=False,
     )
 
     @field_validator("code", mode="after")
@@ -47,9 +51,12 @@ class Python:
 
     def __post_init__(self):
         self.code = textwrap.dedent(self.code)
-
-    def __usercode__(self, print, **kwargs) -> Optional[Dict]:
-        raise NotImplementedError()
+        self._usercode = UserCode(
+            self.code,
+            filename="<python filter>",
+            # the names of this module stay available to the code
+            namespace=globals(),
+        )
 
     def pipeline(self, res: Resource, output: Output) -> bool:
         def _output_msg(*values, sep: str = " ", end: str = ""):
@@ -62,14 +69,7 @@ class Python:
                 sender="python",
             )
 
-        # codegen the user function with arguments as available in the resource
-        kwargs = ", ".join(res.dict().keys())
-        func = f"def __userfunc(print, {kwargs}):\n"
-        func += textwrap.indent(self.code, "    ")
-        func += "\n\nself.__usercode__ = __userfunc"
-
-        exec(func, globals().copy(), locals().copy())
-        result = self.__usercode__(print=_output_msg, **res.dict())
+        result = self._usercode(print=_output_msg, variables=res.dict())
 
         if isinstance(result, dict):
             res.deep_merge(key=self.filter_config.name, data=result)
@@ -4,7 +4,7 @@ from typing import ClassVar
 from pydantic.config import ConfigDict
 from pydantic.dataclasses import dataclass
 
-from organize.filter import FilterConfig
+from organize.filter import COST_CHEAP, FilterConfig
 from organize.output import Output
 from organize.resource import Resource
 from organize.utils import normalize_unicode
@@ -32,6 +32,7 @@ class Regex:
         name="regex",
         files=True,
         dirs=True,
+        cost=COST_CHEAP,
     )
 
     def __post_init__(self):
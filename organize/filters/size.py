@@ -7,7 +7,7 @@ from pydantic import Field
 from pydantic.config import ConfigDict
 from pydantic.dataclasses import dataclass
 
-from organize.filter import FilterConfig
+from organize.filter import COST_STAT, FilterConfig
 from organize.output import Output
 from organize.resource import Resource
 from organize.validators import FlatList
@@ -38,7 +38,7 @@ def read_dir_size(path: Path) -> int:
 def read_resource_size(res: Resource) -> int:
     assert res.path is not None
     if res.is_file():
-        return read_file_size(res.path)
+        return res.stat().st_size
     if res.is_dir():
         return read_dir_size(res.path)
     raise ValueError("Unknown file type")
@@ -139,7 +139,10 @@ class Size:
     conditions: FlatList[str] = Field(default_factory=list)
 
     filter_config: ClassVar[FilterConfig] = FilterConfig(
-        name="size", files=True, dirs=True
+        name="size",
+        files=True,
+        dirs=True,
+        cost=COST_STAT,
     )
 
     def __post_init__(self):
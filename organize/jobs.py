@@ -0,0 +1,238 @@
+"""
+Concurrent execution of the action pipelines of a rule (`organize run --jobs N`).
+
+The filters are evaluated in the walk order in the main thread (or in worker
+processes, see `organize.processes`). The actions of the
+matching resources then run on a thread pool. Resources whose actions write to a
+common path (see `HasLockPaths`) are handled one after another in the walk order,
+all others run at the same time. The output of each resource is buffered and passed
+on in the walk order.
+
+The actions may create paths the rest of the walk skips. Before a resource is
+checked against them, the running actions writing to one of its folders (and those
+with unknown lock paths) are waited for.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from functools import partial
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
+
+from organize.action import Action, HasLockPaths
+from organize.actions.confirm import Confirm
+from organize.logger import logger
+from organize.output import BufferedOutput, Output
+from organize.resource import Resource
+from organize.state import RuleState
+from organize.utils import ReportSummary
+from organize.walker import SkipIndex
+
+if TYPE_CHECKING:
+    from organize.rule import Rule
+
+# The number of handled resources per job whose output is not yet passed on. Only
+# resources within this window can run at the same time.
+QUEUE_FACTOR = 32
+
+
+def supports_jobs(actions: Sequence[Action]) -> bool:
+    """
+    Interactive actions cannot run at the same time.
+    """
+    return not any(isinstance(action, Confirm) for action in actions)
+
+
+def lock_paths(actions: Sequence[Action], res: Resource) -> Optional[Set[Path]]:
+    """
+    Returns the paths the actions write to when handling `res` or `None` if they
+    cannot be determined. In that case the resource is handled on its own.
+    """
+    result: Set[Path] = set()
+    writers = 0
+    for action in actions:
+        if not isinstance(action, HasLockPaths):
+            return None
+        try:
+            paths = action.lock_paths(res)
+        except Exception as e:
+            logger.debug("Cannot determine lock paths of %s: %s", action, e)
+            return None
+        if paths:
+            writers += 1
+            result.update(Path(os.path.normcase(path)) for path in paths)
+    # The lock paths are determined before the actions run. The destination of a
+    # second writing action might depend on the changes of the first one.
+    if writers > 1:
+        return None
+    return result
+
+
+def _submit_after(
+    pool: ThreadPoolExecutor,
+    after: List[Future],
+    fn: Callable[[], ReportSummary],
+) -> Future:
+    """
+    Submits `fn` to the pool as soon as all futures in `after` are done.
+
+    Waiting in the callbacks instead of the pool keeps the workers free for the
+    resources which can run right away.
+    """
+    result: Future = Future()
+    lock = threading.Lock()
+    remaining = len(after) + 1
+
+    def transfer(inner: Future) -> None:
+        exc = inner.exception()
+        if exc is not None:
+            result.set_exception(exc)
+        else:
+            result.set_result(inner.result())
+
+    def ready(_: Optional[Future] = None) -> None:
+        nonlocal remaining
+        with lock:
+            remaining -= 1
+            if remaining:
+                return
+        pool.submit(fn).add_done_callback(transfer)
+
+    for future in after:
+        future.add_done_callback(ready)
+    ready()
+    return result
+
+
+class _WaitingSkipIndex(SkipIndex):
+    """
+    Checks the paths against `index` once the pending actions which might create
+    them are done. Only `skips` is used by the filter stage.
+    """
+
+    __slots__ = ("_index", "_writers")
+
+    def __init__(
+        self,
+        index: SkipIndex,
+        writers: Callable[[Path], List[Future]],
+    ) -> None:
+        super().__init__()
+        self._index = index
+        self._writers = writers
+
+    def skips(self, path: Union[str, Path, None]) -> bool:
+        if path is not None:
+            wait(self._writers(Path(path)))
+        return self._index.skips(path)
+
+
+def _done(summary: ReportSummary) -> Future:
+    future: Future = Future()
+    future.set_result(summary)
+    return future
+
+
+def execute_concurrently(
+    rule: Rule,
+    resources: Iterable[Resource],
+    *,
+    skip_pathes: SkipIndex,
+    simulate: bool,
+    output: Output,
+    jobs: int,
+    state: Optional[RuleState] = None,
+) -> ReportSummary:
+    summary = ReportSummary()
+    # (result, output, walked path) of the handled resources in the walk order
+    queue: Deque[Tuple[Future, BufferedOutput, Optional[Path]]] = deque()
+    last_for_path: Dict[Path, Future] = dict()
+    last_exclusive: Optional[Future] = None
+
+    def pending_writers(path: Path) -> List[Future]:
+        """
+        The running actions which write to a folder of `path`.
+        """
+        result = [
+            last_for_path[folder]
+            for folder in map(Path, map(os.path.normcase, path.parents))
+            if folder in last_for_path
+        ]
+        if last_exclusive is not None:
+            result.append(last_exclusive)
+        return [future for future in result if not future.done()]
+
+    def pass_on_oldest() -> None:
+        nonlocal summary
+        future, buffered, path = queue.popleft()
+        result = future.result()
+        summary += result
+        buffered.flush()
+        if state is not None:
+            state.record(path, result)
+
+    with ThreadPoolExecutor(
+        max_workers=jobs,
+        thread_name_prefix="organize-jobs",
+    ) as pool:
+        for res, matches, buffered in rule.filter_resources(
+            resources,
+            output=output,
+            skip_pathes=_WaitingSkipIndex(skip_pathes, writers=pending_writers),
+        ):
+            # the actions may change the path of the resource
+            path = res.path
+            if not matches:
+                queue.append((_done(ReportSummary()), buffered, path))
+            else:
+                # shared by all resources so paths created by running actions are
+                # skipped as soon as they exist
+                res.walker_skip_pathes = skip_pathes
+                paths = lock_paths(rule.actions, res)
+                if paths is None:
+                    # runs after all previous resources, all later ones wait for it
+                    after = [future for future, _, _ in queue]
+                else:
+                    after = [last_for_path[p] for p in paths if p in last_for_path]
+                    if last_exclusive is not None:
+                        after.append(last_exclusive)
+                future = _submit_after(
+                    pool,
+                    after=after,
+                    fn=partial(
+                        rule.run_actions,
+                        res,
+                        simulate=simulate,
+                        output=buffered,
+                    ),
+                )
+                if paths is None:
+                    last_exclusive = future
+                    last_for_path.clear()
+                else:
+                    for lock_path in paths:
+                        last_for_path[lock_path] = future
+                queue.append((future, buffered, path))
+
+            while queue and (queue[0][0].done() or len(queue) > jobs * QUEUE_FACTOR):
+                pass_on_oldest()
+
+        while queue:
+            pass_on_oldest()
+    return summary
@@ -25,6 +25,8 @@ class Location:
     min_depth: int = 0
     max_depth: Union[Literal["inherit"], int, None] = "inherit"
     search: Literal["depth", "breadth"] = "breadth"
+    sort: Literal["natural", "name", "none"] = "natural"
+    workers: int = Field(default=1, ge=1)
     exclude_files: FlatSet[str] = Field(default_factory=set)
     exclude_dirs: FlatSet[str] = Field(default_factory=set)
     system_exclude_files: FlatSet[str] = Field(
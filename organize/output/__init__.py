@@ -1,9 +1,11 @@
+from .buffered import BufferedOutput
 from .default import Default
 from .jsonl import JSONL
 from .output import Output
 from .saving import SavingOutput
 
 __all__ = (
+    "BufferedOutput",
     "JSONL",
     "Output",
     "SavingOutput",
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import copy
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+from .output import Level, Output
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from organize.resource import Resource
+
+    from ._sender import SenderType
+
+
+class BufferedOutput:
+    """
+    Collects the messages of a resource to pass them to `output` later on.
+
+    This keeps the messages of resources which are handled at the same time grouped
+    together and in order.
+    """
+
+    def __init__(self, output: Output) -> None:
+        self.output = output
+        self.messages: List[Tuple[Resource, str, SenderType, Level]] = []
+
+    def start(
+        self,
+        simulate: bool,
+        config_path: Optional[Path],
+        working_dir: Path,
+    ) -> None:
+        self.output.start(
+            simulate=simulate,
+            config_path=config_path,
+            working_dir=working_dir,
+        )
+
+    def msg(
+        self,
+        res: Resource,
+        msg: str,
+        sender: SenderType,
+        level: Level = "info",
+    ) -> None:
+        # the actions change the resource, so we keep its current state.
+        self.messages.append((copy.copy(res), msg, sender, level))
+
+    def confirm(
+        self,
+        res: Resource,
+        msg: str,
+        default: bool,
+        sender: SenderType,
+    ) -> bool:
+        self.flush()
+        return self.output.confirm(res=res, msg=msg, default=default, sender=sender)
+
+    def end(self, success_count: int, error_count: int) -> None:
+        self.flush()
+        self.output.end(success_count=success_count, error_count=error_count)
+
+    def flush(self) -> None:
+        for res, msg, sender, level in self.messages:
+            self.output.msg(res=res, msg=msg, sender=sender, level=level)
+        self.messages.clear()
@@ -0,0 +1,205 @@
+"""
+Evaluation of the filters of a rule in a pool of processes (rule option
+`filter_processes`).
+
+The walk and the actions stay in the main process. The walked resources are sent to
+the worker processes in batches. The workers evaluate the filter pipeline and send
+back whether the resource matched, its variables and the messages of the filters.
+The results are passed on in the walk order. Filters supporting prefetching prefetch
+the data of a batch in the worker.
+
+The workers are forked from the main process, so the rule and its filters do not
+need to be picklable. Forking is only safe on Linux (macOS system libraries break
+in forked children), other platforms evaluate the filters in the main process.
+All workers are forked before the walk starts its read-ahead threads, so no thread
+holds a lock while the process is forked.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import sys
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+from organize.logger import logger
+from organize.output import BufferedOutput, Output
+from organize.output._sender import SenderType, sender_name
+from organize.output.output import Level
+from organize.resource import Resource
+from organize.walker import SkipIndex
+
+if TYPE_CHECKING:
+    from organize.rule import Rule
+
+# The number of resources sent to a worker at once.
+BATCH_SIZE = 16
+
+# The number of batches per process which are evaluated ahead of the actions.
+READ_AHEAD_FACTOR = 2
+
+# (path, basedir, rule_nr)
+Task = Tuple[Optional[Path], Optional[Path], int]
+# (name of the sender, message, level)
+Message = Tuple[str, str, Level]
+# (matches, vars, path, messages)
+Result = Tuple[bool, Dict[str, Any], Optional[Path], List[Message]]
+
+FilterResult = Tuple[Resource, bool, BufferedOutput]
+
+_worker_rule: Optional[Rule] = None
+
+
+class _MessageCollector:
+    """
+    Collects the filter messages in a worker process. Only the name of the sender
+    is kept, the filter itself is not sent back.
+    """
+
+    def __init__(self) -> None:
+        self.messages: List[Message] = []
+
+    def start(
+        self,
+        simulate: bool,
+        config_path: Optional[Path],
+        working_dir: Path,
+    ) -> None:
+        pass
+
+    def msg(
+        self,
+        res: Resource,
+        msg: str,
+        sender: SenderType,
+        level: Level = "info",
+    ) -> None:
+        self.messages.append((sender_name(sender), msg, level))
+
+    def confirm(
+        self,
+        res: Resource,
+        msg: str,
+        default: bool,
+        sender: SenderType,
+    ) -> bool:
+        raise RuntimeError("Filters cannot ask for confirmation in a worker process")
+
+    def end(self, success_count: int, error_count: int) -> None:
+        pass
+
+
+def supports_processes() -> bool:
+    return sys.platform.startswith("linux")
+
+
+def _started() -> None:
+    pass
+
+
+def _init_worker(rule: Rule) -> None:
+    global _worker_rule
+    _worker_rule = rule
+
+
+def _evaluate(tasks: List[Task]) -> List[Result]:
+    rule = _worker_rule
+    assert rule is not None, "worker is not initialized"
+    from organize.rule import prefetch_pipeline
+
+    batch = [
+        Resource(path=path, basedir=basedir, rule=rule, rule_nr=rule_nr)
+        for path, basedir, rule_nr in tasks
+    ]
+    result: List[Result] = []
+    for res in prefetch_pipeline(batch, [rule], output=_MessageCollector()):
+        collector = _MessageCollector()
+        matches = rule.matches(res, output=collector)
+        result.append((matches, res.vars, res.path, collector.messages))
+    return result
+
+
+def _apply(res: Resource, result: Result, buffered: BufferedOutput) -> bool:
+    matches, vars, path, messages = result
+    if path != res.path:
+        res.path = path
+    res.vars.update(vars)
+    for sender, msg, level in messages:
+        buffered.msg(res=res, msg=msg, sender=sender, level=level)
+    return matches
+
+
+def filter_in_processes(
+    rule: Rule,
+    resources: Iterable[Resource],
+    *,
+    output: Output,
+    skip_pathes: SkipIndex,
+    processes: int,
+) -> Iterator[FilterResult]:
+    """
+    Evaluates the filters of `rule` for the given resources in `processes` worker
+    processes.
+
+    Yields the resources with the match result and the buffered filter messages in
+    the walk order. Resources skipped by `skip_pathes` when it is their turn are
+    left out.
+
+    If a batch cannot be evaluated in a worker (for example because the variables of
+    a filter cannot be pickled) it is evaluated in the main process instead.
+    """
+    it = iter(resources)
+    pending: Deque[Tuple[List[Resource], Future]] = deque()
+    with ProcessPoolExecutor(
+        max_workers=processes,
+        mp_context=multiprocessing.get_context("fork"),
+        initializer=_init_worker,
+        initargs=(rule,),
+    ) as pool:
+        # With "fork" the pool starts all workers on the first submit. This has to
+        # happen before the walk starts any threads.
+        pool.submit(_started).result()
+
+        def submit_next() -> bool:
+            batch = list(islice(it, BATCH_SIZE))
+            if not batch:
+                return False
+            tasks = [(res.path, res.basedir, res.rule_nr) for res in batch]
+            pending.append((batch, pool.submit(_evaluate, tasks)))
+            return True
+
+        for _ in range(processes * READ_AHEAD_FACTOR):
+            if not submit_next():
+                break
+
+        while pending:
+            batch, future = pending.popleft()
+            submit_next()
+            results: Optional[List[Result]]
+            try:
+                results = future.result()
+            except Exception as e:
+                logger.warning("Evaluating filters in the main process: %s", e)
+                results = None
+            for i, res in enumerate(batch):
+                if skip_pathes.skips(res.path):
+                    continue
+                buffered = BufferedOutput(output)
+                if results is None:
+                    matches = rule.matches(res, output=buffered)
+                else:
+                    matches = _apply(res, results[i], buffered)
+                yield res, matches, buffered
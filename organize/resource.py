@@ -1,14 +1,28 @@
 from __future__ import annotations
 
+import os
+import stat
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import TYPE_CHECKING, Any, Dict, Optional, Set
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    Mapping,
+    MutableSet,
+    Optional,
+)
 
 from organize.utils import deep_merge
 
 if TYPE_CHECKING:
     from .rule import Rule
 
+# marks cached values which are not yet computed
+_NOT_COMPUTED: Any = object()
+
 
 @dataclass
 class Resource:
@@ -30,6 +44,12 @@ class Resource:
     :param walker_skip_files:
         Filters and actions may add pathes to this set which are then ignored for the
         rest of the rule.
+    :param entry:
+        The `os.DirEntry` of `path` if the resource was found by the walker. Its
+        cached file type and stat information saves syscalls.
+
+    The results of `stat()`, `lstat()` and `relative_path()` are cached until `path`
+    is changed.
     """
 
     path: Optional[Path]
@@ -37,9 +57,38 @@ class Resource:
     rule: Optional[Rule] = None  # TODO: not optional?
     rule_nr: int = 0
     vars: Dict[str, Any] = field(default_factory=dict)
-    walker_skip_pathes: Set[Path] = field(default_factory=set)
+    walker_skip_pathes: MutableSet[Path] = field(default_factory=set)
+    entry: Optional[os.DirEntry] = field(default=None, repr=False, compare=False)
+    _stat: Optional[os.stat_result] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    _lstat: Optional[os.stat_result] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    _relative_path: Optional[Path] = field(
+        default=_NOT_COMPUTED, init=False, repr=False, compare=False
+    )
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name == "path":
+            # the cached file information belongs to the previous path
+            object.__setattr__(self, "entry", None)
+            object.__setattr__(self, "_stat", None)
+            object.__setattr__(self, "_lstat", None)
+        if name in ("path", "basedir"):
+            object.__setattr__(self, "_relative_path", _NOT_COMPUTED)
+        object.__setattr__(self, name, value)
+
+    @classmethod
+    def from_direntry(cls, entry: os.DirEntry, **kwargs) -> Resource:
+        return cls(path=Path(entry.path), entry=entry, **kwargs)
 
     def relative_path(self) -> Optional[Path]:
+        if self._relative_path is _NOT_COMPUTED:
+            self._relative_path = self._compute_relative_path()
+        return self._relative_path
+
+    def _compute_relative_path(self) -> Optional[Path]:
         if self.basedir is None:
             return self.path
         if self.path is None:
@@ -50,16 +99,11 @@ class Resource:
             # path is not relative to basedir
             return None
 
-    def dict(self):
-        return dict(
-            path=self.path,
-            basedir=self.basedir,
-            location=self.basedir,
-            relative_path=self.relative_path(),
-            rule=self.rule.name if self.rule else None,
-            rule_nr=self.rule_nr,
-            **self.vars,
-        )
+    def dict(self) -> ResourceVars:
+        """
+        The variables available in templates and python code.
+        """
+        return ResourceVars(self)
 
     def deep_merge(self, key: str, data: Dict) -> None:
         """
@@ -68,23 +112,97 @@ class Resource:
         prev = self.vars.get(key, dict())
         self.vars[key] = deep_merge(prev, data)
 
-    # TODO: Caching for `is_file` and `is_dir`
-    # TODO: provide a `from_direntry` constructor to speed things up
+    def stat(self) -> os.stat_result:
+        """
+        The (cached) stat result of the resource, following symlinks.
+        """
+        if self._stat is None:
+            if self.path is None:
+                raise ValueError("No path given")
+            if self.entry is not None:
+                self._stat = self.entry.stat()
+            elif self._lstat is not None and not stat.S_ISLNK(self._lstat.st_mode):
+                self._stat = self._lstat
+            else:
+                self._stat = self.path.stat()
+        return self._stat
+
+    def lstat(self) -> os.stat_result:
+        """
+        The (cached) stat result of the resource, not following symlinks.
+        """
+        if self._lstat is None:
+            if self.path is None:
+                raise ValueError("No path given")
+            if self.entry is not None and not self.entry.is_symlink():
+                # the walker knows the file type, so stat and lstat are the same
+                self._lstat = self.stat()
+            else:
+                self._lstat = self.path.lstat()
+        return self._lstat
+
     def is_file(self) -> bool:
-        if self.path is None:
-            raise ValueError("No path given")
-        return self.path.is_file()
+        if self.entry is not None:
+            return self.entry.is_file()
+        try:
+            return stat.S_ISREG(self.stat().st_mode)
+        except OSError:
+            return False
 
     def is_dir(self) -> bool:
-        if self.path is None:
-            raise ValueError("No path given")
-        return self.path.is_dir()
+        if self.entry is not None:
+            return self.entry.is_dir()
+        try:
+            return stat.S_ISDIR(self.stat().st_mode)
+        except OSError:
+            return False
 
     def is_empty(self) -> bool:
         if self.path is None:
             raise ValueError("No path given")
         if self.is_file():
-            return self.path.stat().st_size == 0
+            return self.stat().st_size == 0
         elif self.is_dir():
             return not any(self.path.iterdir())
         raise ValueError("Unknown file type")
+
+
+class ResourceVars(Mapping[str, Any]):
+    """
+    A read-only view of the variables of a resource.
+
+    The values are looked up on access, so the view always reflects the current state
+    of the resource and values which are not used are not computed.
+    """
+
+    __slots__ = ("res",)
+
+    BASIC: Dict[str, Callable[[Resource], Any]] = {
+        "path": lambda res: res.path,
+        "basedir": lambda res: res.basedir,
+        "location": lambda res: res.basedir,
+        "relative_path": lambda res: res.relative_path(),
+        "rule": lambda res: res.rule.name if res.rule else None,
+        "rule_nr": lambda res: res.rule_nr,
+    }
+
+    def __init__(self, res: Resource) -> None:
+        self.res = res
+
+    def __getitem__(self, key: str) -> Any:
+        getter = self.BASIC.get(key)
+        if getter is not None:
+            return getter(self.res)
+        return self.res.vars[key]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.BASIC or key in self.res.vars
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self.BASIC
+        for key in self.res.vars:
+            if key not in self.BASIC:
+                yield key
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
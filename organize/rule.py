@@ -1,22 +1,63 @@
+import json
+import os
+from functools import cached_property
+from itertools import islice
 from pathlib import Path
-from typing import Dict, Iterable, List, Literal, Optional, Set
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
 
-from pydantic import BaseModel, ConfigDict, Field, field_validator, model_validator
+from pydantic import (
+    BaseModel,
+    ConfigDict,
+    Field,
+    PrivateAttr,
+    field_validator,
+    model_validator,
+)
 
 from organize.logger import logger
 
 from .action import Action
-from .filter import All, Any, Filter, HasFilterPipeline, Not
+from .filter import (
+    COST_STAT,
+    All,
+    Any,
+    Filter,
+    HasClose,
+    HasFilterPipeline,
+    HasPrefetch,
+    Not,
+)
+from .jobs import execute_concurrently, supports_jobs
 from .location import Location
-from .output import Output
+from .output import BufferedOutput, Output
+from .processes import FilterResult, filter_in_processes, supports_processes
 from .registry import action_by_name, filter_by_name
 from .resource import Resource
+from .state import RuleState
 from .template import render
 from .utils import ReportSummary
 from .validators import FlatList, flatten
-from .walker import Walker
+from .walker import SkipIndex, Walker
 
 FilterMode = Literal["all", "any", "none"]
+FilterOrder = Literal["config", "cost"]
+
+
+def _json_default(value):
+    # sets have no stable order between runs
+    if isinstance(value, (set, frozenset)):
+        return sorted(str(x) for x in value)
+    return repr(value)
 
 
 def action_from_dict(d: Dict) -> Action:
@@ -91,6 +132,103 @@ def filter_pipeline(
     return collection.pipeline(res, output=output)
 
 
+def sort_filters_by_cost(filters: Iterable[Filter]) -> List[Filter]:
+    """
+    Sorts the filters so the cheap ones are evaluated first.
+
+    Filters which are not reorderable stay at their position and no other filter is
+    moved across them. The sort is stable, so filters of the same cost keep their
+    order.
+
+    This cannot change the result of the pipeline: only `hash` and `python` read the
+    variables of other filters. `python` is not reorderable and `hash` has the
+    highest cost, so it is never moved before a filter which came before it.
+    """
+    result: List[Filter] = []
+    segment: List[Filter] = []
+    for filter in filters:
+        if filter.filter_config.reorderable:
+            segment.append(filter)
+        else:
+            result.extend(sorted(segment, key=lambda f: f.filter_config.cost))
+            result.append(filter)
+            segment = []
+    result.extend(sorted(segment, key=lambda f: f.filter_config.cost))
+    return result
+
+
+def _may_reach(
+    res: Resource,
+    filters: Sequence[Filter],
+    filter_mode: FilterMode,
+    output: Output,
+) -> bool:
+    """
+    Returns whether the pipeline evaluates the filter after `filters` for `res`.
+    """
+    if filter_mode == "any":
+        return True
+    # in "none" mode a matching filter ends the pipeline
+    expected = filter_mode == "all"
+    for filter in filters:
+        try:
+            if filter.pipeline(res, output=output) != expected:
+                return False
+        except Exception:
+            # the error is reported when the resource is evaluated
+            return False
+    return True
+
+
+def prefetch_pipeline(
+    resources: Iterable[Resource],
+    rules: Iterable["Rule"],
+    output: Output,
+) -> Iterator[Resource]:
+    """
+    Passes through the given resources and lets the filters of the rules supporting
+    it prefetch data for the upcoming resources in batches.
+
+    Only the resources passing the cheap filters (see `COST_STAT`) before the
+    prefetching filter are prefetched. Their messages are discarded, they are
+    evaluated again when it is the resource's turn.
+    """
+    # the prefetching filters with the cheap filters before them and the filter mode
+    prefetchers: List[Tuple[HasPrefetch, List[Filter], FilterMode]] = []
+    sizes: List[int] = []
+    for rule in rules:
+        before: List[Filter] = []
+        for filter in rule.pipeline_filters:
+            inner = filter.filter if isinstance(filter, Not) else filter
+            if isinstance(inner, HasPrefetch):
+                size = inner.prefetch_size()
+                if size is not None:
+                    prefetchers.append((inner, list(before), rule.filter_mode))
+                    sizes.append(size)
+            if filter.filter_config.cost <= COST_STAT:
+                before.append(filter)
+
+    if not prefetchers:
+        yield from resources
+        return
+
+    # a size of zero means the whole walk is prefetched
+    batch_size = None if 0 in sizes else min(sizes)
+    it = iter(resources)
+    while batch := list(islice(it, batch_size)):
+        for prefetcher, before, filter_mode in prefetchers:
+            discarded = BufferedOutput(output)
+            prefetcher.prefetch(
+                [
+                    res.path
+                    for res in batch
+                    if res.path is not None
+                    and _may_reach(res, before, filter_mode, output=discarded)
+                ]
+            )
+        yield from batch
+
+
 def action_pipeline(
     actions: Iterable[Action],
     res: Resource,
@@ -114,13 +252,33 @@ class Rule(BaseModel):
     tags: Set[str] = Field(default_factory=set)
     filters: List[Filter] = Field(default_factory=list)
     filter_mode: FilterMode = "all"
+    filter_order: FilterOrder = "config"
+    filter_processes: int = Field(default=1, ge=1)
     actions: List[Action] = Field(..., min_length=1)
 
+    _definition: Optional[str] = PrivateAttr(default=None)
+
     model_config = ConfigDict(
         extra="forbid",
         arbitrary_types_allowed=True,
     )
 
+    @model_validator(mode="wrap")
+    @classmethod
+    def remember_definition(cls, data, handler) -> "Rule":
+        rule = handler(data)
+        if isinstance(data, dict):
+            rule._definition = json.dumps(data, sort_keys=True, default=_json_default)
+        return rule
+
+    @property
+    def definition(self) -> Optional[str]:
+        """
+        The rule definition from the config as JSON string (`None` if the rule was
+        not created from a dict).
+        """
+        return self._definition
+
     @field_validator("locations", mode="before")
     def validate_locations(cls, locations):
         if locations is None:
@@ -210,7 +368,34 @@ class Rule(BaseModel):
 
         return self
 
-    def walk(self, rule_nr: int = 0):
+    @model_validator(mode="after")
+    def validate_filter_processes(self) -> "Rule":
+        if self.filter_processes > 1:
+            for filter in self.filters:
+                inner = filter.filter if isinstance(filter, Not) else filter
+                if inner.filter_config.stateful:
+                    raise ValueError(
+                        f'Filter "{inner.filter_config.name}" compares the files '
+                        "with each other and cannot be used with filter_processes"
+                    )
+        return self
+
+    @cached_property
+    def pipeline_filters(self) -> List[Filter]:
+        """
+        The filters in the order they are evaluated.
+        """
+        # In "any" mode all filters are evaluated to collect their variables, so
+        # the order does not matter.
+        if self.filter_order == "cost" and self.filter_mode in ("all", "none"):
+            return sort_filters_by_cost(self.filters)
+        return self.filters
+
+    def walk_plan(self) -> List[Tuple[Walker, List[str]]]:
+        """
+        Returns the walker and the rendered paths of each location.
+        """
+        result = []
         for location in self.locations:
             # instantiate the filesystem walker
             exclude_files = location.system_exclude_files | location.exclude_files
@@ -225,29 +410,143 @@ class Rule(BaseModel):
                 max_depth=max_depth,
                 filter_dirs=location.filter_dirs,
                 filter_files=location.filter,
-                method="breadth",
+                method=location.search,
+                sort=location.sort,
+                workers=location.workers,
                 exclude_dirs=exclude_dirs,
                 exclude_files=exclude_files,
             )
+            result.append((walker, [render(loc_path) for loc_path in location.path]))
+        return result
+
+    def walk(self, rule_nr: int = 0, skip_pathes: Optional[SkipIndex] = None):
+        """
+        Yields a resource for each file (or folder) in the locations.
 
-            # whether to walk dirs or files
-            _walk_funcs = {
-                "files": walker.files,
-                "dirs": walker.dirs,
-            }
-            for loc_path in location.path:
-                expanded_path = render(loc_path)
-                for path in _walk_funcs[self.targets](expanded_path):
+        The walker does not walk into folders skipped by `skip_pathes`.
+        """
+        skip = skip_pathes.skips if skip_pathes is not None else None
+        for walker, expanded_paths in self.walk_plan():
+            for expanded_path in expanded_paths:
+                basedir = Path(expanded_path)
+                # if path is a single file we emit just the path itself
+                if self.targets == "files" and basedir.is_file():
                     yield Resource(
-                        path=Path(path),
-                        basedir=Path(expanded_path),
+                        path=basedir,
+                        basedir=basedir,
                         rule=self,
                         rule_nr=rule_nr,
                     )
+                    continue
+                # otherwise we walk the given folder. The resources keep the
+                # DirEntry so its cached file information can be used.
+                for entry in walker.walk(
+                    expanded_path,
+                    files=self.targets == "files",
+                    dirs=self.targets == "dirs",
+                    skip=skip,
+                ):
+                    yield Resource.from_direntry(
+                        entry,
+                        basedir=basedir,
+                        rule=self,
+                        rule_nr=rule_nr,
+                    )
+
+    def handle(self, res: Resource, *, simulate: bool, output: Output) -> ReportSummary:
+        """
+        Runs the filters and - if they match - the actions for a single resource.
+        """
+        if not self.matches(res, output=output):
+            return ReportSummary()
+        return self.run_actions(res, simulate=simulate, output=output)
+
+    def matches(self, res: Resource, *, output: Output) -> bool:
+        return filter_pipeline(
+            filters=self.pipeline_filters,
+            filter_mode=self.filter_mode,
+            res=res,
+            output=output,
+        )
+
+    def filter_resources(
+        self,
+        resources: Iterable[Resource],
+        *,
+        output: Output,
+        skip_pathes: SkipIndex,
+    ) -> Iterator[FilterResult]:
+        """
+        Evaluates the filters for the given resources in the walk order.
+
+        Yields each resource with the match result and the buffered messages of the
+        filters. Resources skipped by `skip_pathes` when it is their turn are left
+        out.
+        """
+        if self.filter_processes > 1:
+            if supports_processes():
+                yield from filter_in_processes(
+                    self,
+                    resources,
+                    output=output,
+                    skip_pathes=skip_pathes,
+                    processes=self.filter_processes,
+                )
+                return
+            logger.warning("filter_processes is not supported on this platform")
+
+        for res in prefetch_pipeline(resources, [self], output=output):
+            if skip_pathes.skips(res.path):
+                continue
+            buffered = BufferedOutput(output)
+            yield res, self.matches(res, output=buffered), buffered
+
+    def run_actions(
+        self, res: Resource, *, simulate: bool, output: Output
+    ) -> ReportSummary:
+        try:
+            for action in action_pipeline(
+                actions=self.actions,
+                res=res,
+                simulate=simulate,
+                output=output,
+            ):
+                pass
+            return ReportSummary(success=1)
+        except Exception as e:
+            output.msg(
+                res=res,
+                msg=str(e),
+                level="error",
+                sender=action,
+            )
+            logger.exception(e)
+            return ReportSummary(errors=1)
+
+    def close(self) -> None:
+        """
+        Closes the filters holding resources like helper processes.
+        """
+        for filter in self.filters:
+            inner = filter.filter if isinstance(filter, Not) else filter
+            if isinstance(inner, HasClose):
+                inner.close()
 
     def execute(
-        self, *, simulate: bool, output: Output, rule_nr: int = 0
+        self,
+        *,
+        simulate: bool,
+        output: Output,
+        rule_nr: int = 0,
+        jobs: int = 1,
+        state: Optional[RuleState] = None,
     ) -> ReportSummary:
+        """
+        Executes the rule.
+
+        With a `state` the resources which are unchanged since the rule evaluated
+        them are skipped (see `organize.state`).
+        """
         if not self.enabled:
             return ReportSummary()
 
@@ -274,35 +573,133 @@ class Rule(BaseModel):
                 return ReportSummary(errors=1)
 
         # normal mode
-        summary = ReportSummary()
-        skip_pathes: Set[Path] = set()
-        for res in self.walk(rule_nr=rule_nr):
-            if res.path in skip_pathes:
-                continue
-            result = filter_pipeline(
-                filters=self.filters,
-                filter_mode=self.filter_mode,
-                res=res,
+        # the paths created by the actions, which the rest of the walk skips
+        skip_pathes = SkipIndex()
+        resources = self.walk(rule_nr=rule_nr, skip_pathes=skip_pathes)
+        if state is not None:
+            resources = state.changed(resources)
+        if jobs > 1 and supports_jobs(self.actions):
+            summary = execute_concurrently(
+                self,
+                resources,
+                skip_pathes=skip_pathes,
+                simulate=simulate,
                 output=output,
+                jobs=jobs,
+                state=state,
             )
-            if result:
-                try:
-                    for action in action_pipeline(
-                        actions=self.actions,
-                        res=res,
-                        simulate=simulate,
-                        output=output,
-                    ):
-                        pass
-                    skip_pathes = skip_pathes.union(res.walker_skip_pathes)
-                    summary.success += 1
-                except Exception as e:
-                    output.msg(
-                        res=res,
-                        msg=str(e),
-                        level="error",
-                        sender=action,
-                    )
-                    logger.exception(e)
-                    summary.errors += 1
+        else:
+            summary = ReportSummary()
+            for res, matches, buffered in self.filter_resources(
+                resources,
+                output=output,
+                skip_pathes=skip_pathes,
+            ):
+                buffered.flush()
+                path = res.path
+                if not matches:
+                    if state is not None:
+                        state.record(path, ReportSummary())
+                    continue
+                result = self.run_actions(res, simulate=simulate, output=output)
+                if result.success:
+                    skip_pathes.update(res.walker_skip_pathes)
+                if state is not None:
+                    state.record(path, result)
+                summary += result
+        if state is not None and state.skipped:
+            logger.info("Rule %s skipped %s unchanged files", rule_nr, state.skipped)
         return summary
+
+
+def basedir_for(
+    plan: List[Tuple[Walker, List[str]]], path: Path, is_dir: bool
+) -> Optional[Path]:
+    """
+    Returns the location of the walk plan which would yield `path` or `None`.
+    """
+    for walker, expanded_paths in plan:
+        for expanded_path in expanded_paths:
+            if walker.includes(expanded_path, str(path), is_dir=is_dir):
+                return Path(expanded_path)
+    return None
+
+
+def execute_shared_walk(
+    rules: Sequence[Tuple[int, Rule]], *, simulate: bool, output: Output
+) -> ReportSummary:
+    """
+    Executes rules with the same targets and walk plan in a single walk.
+
+    Each walked resource is handed to the rules in config order:
+
+    - A resource moved or deleted by a rule is not handed to the later rules.
+    - Paths created by a rule (e.g. the destination of a move) are skipped by the
+      earlier rules. The later rules handle them when they are walked or, if the walk
+      is already past them, at the end.
+
+    The result can differ from executing the rules one after another. A later rule
+    handles a resource before an earlier rule has seen the rest of the walk, so the
+    actions of two rules on different resources can conflict differently (e.g. a
+    rename is skipped because an earlier rule has not yet moved the file at the
+    destination away).
+    """
+    first_nr, first = rules[0]
+    plan = first.walk_plan()
+    is_dir = first.targets == "dirs"
+    skip_pathes = [SkipIndex() for _ in rules]
+    # paths created by earlier rules (and their basedir) which are still to be handled
+    pending: List[Dict[Path, Path]] = [dict() for _ in rules]
+    summary = ReportSummary()
+
+    def handle(idx: int, path: Path, basedir: Optional[Path], entry) -> bool:
+        """
+        Returns whether actions were run on the resource
+        """
+        nonlocal summary
+        rule_nr, rule = rules[idx]
+        res = Resource(
+            path=path,
+            basedir=basedir,
+            entry=entry,
+            rule=rule,
+            rule_nr=rule_nr,
+        )
+        result = rule.handle(res, simulate=simulate, output=output)
+        summary += result
+        if result.success:
+            skip_pathes[idx].update(res.walker_skip_pathes)
+        if not result.success and not result.errors:
+            return False
+        for created in res.walker_skip_pathes:
+            for earlier in range(idx):
+                skip_pathes[earlier].add(created)
+            created_basedir = basedir_for(plan, created, is_dir=is_dir)
+            if created_basedir is not None:
+                for later in range(idx + 1, len(rules)):
+                    pending[later].setdefault(created, created_basedir)
+        return True
+
+    walk = first.walk(rule_nr=first_nr)
+    for walked in prefetch_pipeline(walk, [rule for _, rule in rules], output=output):
+        assert walked.path is not None
+        path, entry = walked.path, walked.entry
+        for idx in range(len(rules)):
+            pending[idx].pop(path, None)
+            if skip_pathes[idx].skips(path):
+                continue
+            if handle(idx, path=path, basedir=walked.basedir, entry=entry):
+                if not os.path.lexists(path):
+                    # moved or deleted, so the later rules won't see it
+                    break
+                # the file information may be outdated
+                entry = None
+
+    # the created paths the walk was already past
+    for idx in range(1, len(rules)):
+        for path, basedir in pending[idx].items():
+            exists = path.is_dir() if is_dir else path.is_file()
+            if not exists or path.is_symlink() or skip_pathes[idx].skips(path):
+                continue
+            handle(idx, path=path, basedir=basedir, entry=None)
+    return summary
@@ -0,0 +1,267 @@
+"""
+The state of incremental runs (`organize run --incremental`).
+
+For each rule the state store records the files the rule evaluated together with
+their (st_dev, st_ino, st_size, st_mtime_ns) and the outcome. An incremental run
+skips the files which are unchanged since the same rule evaluated them:
+
+- files the filters did not match are not evaluated again,
+- files whose actions ran without errors are not handled again.
+
+Files whose actions failed are evaluated again in the next run.
+
+The entries are keyed by a hash of the rule definition and its position in the
+config, so changing a rule evaluates all files again. Rules using filters whose
+result can change while a file stays the same (see `FilterConfig.incremental`) and
+rules targeting folders always evaluate all resources.
+
+Entries which were not updated for `STATE_MAX_AGE` are removed, so unchanged files
+are evaluated again from time to time.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from organize.cache import USER_CACHE_DIR, FileKey
+from organize.filter import Not
+from organize.logger import logger
+from organize.resource import Resource
+from organize.utils import ReportSummary
+
+if TYPE_CHECKING:
+    from organize.rule import Rule
+
+DEFAULT_STATE_PATH = USER_CACHE_DIR / "state.sqlite"
+
+# entries which were not updated for this long are removed
+STATE_MAX_AGE = 30 * 24 * 60 * 60
+
+# the number of recorded outcomes written in one transaction
+WRITE_BATCH_SIZE = 1000
+
+OUTCOME_UNMATCHED = "unmatched"
+OUTCOME_HANDLED = "handled"
+
+# (rule, path, dev, ino, size, mtime_ns, outcome, updated)
+Row = Tuple[str, str, int, int, int, int, str, float]
+
+
+def rule_key(rule: Rule, rule_nr: int) -> Optional[str]:
+    """
+    Returns the key of the rule's entries in the state store or `None` if the rule
+    cannot skip unchanged files.
+    """
+    if rule.targets != "files" or rule.definition is None:
+        return None
+    for filter in rule.filters:
+        inner = filter.filter if isinstance(filter, Not) else filter
+        if not inner.filter_config.incremental:
+            return None
+    data = f"{rule_nr}:{rule.definition}".encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+class StateStore:
+    """
+    The persistent state of incremental runs, stored in a SQLite database.
+    """
+
+    table = "state"
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(
+            str(path),
+            timeout=30,
+            isolation_level=None,  # autocommit, transactions are explicit
+        )
+        # WAL allows readers and a writer from other processes at the same time
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS state (
+                rule TEXT NOT NULL,
+                path TEXT NOT NULL,
+                dev INTEGER NOT NULL,
+                ino INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                outcome TEXT NOT NULL,
+                updated REAL NOT NULL,
+                PRIMARY KEY (rule, path)
+            ) WITHOUT ROWID
+            """
+        )
+        self._pending: List[Row] = []
+        self._forgotten: List[Tuple[str, str]] = []
+        self.prune()
+
+    def get(self, rule: str, path: Path) -> Optional[Tuple[FileKey, str]]:
+        """
+        Returns the file key and the outcome recorded for `path` or `None`.
+        """
+        row = self._conn.execute(
+            "SELECT dev, ino, size, mtime_ns, outcome FROM state "
+            "WHERE rule = ? AND path = ?",
+            (rule, str(path)),
+        ).fetchone()
+        if row is None:
+            return None
+        return FileKey(*row[:4]), row[4]
+
+    def set(self, rule: str, path: Path, key: FileKey, outcome: str) -> None:
+        self._pending.append((rule, str(path), *key, outcome, time.time()))
+        if len(self._pending) >= WRITE_BATCH_SIZE:
+            self.flush()
+
+    def forget(self, rule: str, path: Path) -> None:
+        self._forgotten.append((rule, str(path)))
+        if len(self._forgotten) >= WRITE_BATCH_SIZE:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Writes the recorded outcomes to the database.
+        """
+        if not self._pending and not self._forgotten:
+            return
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO state "
+                "(rule, path, dev, ino, size, mtime_ns, outcome, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                self._pending,
+            )
+            self._conn.executemany(
+                "DELETE FROM state WHERE rule = ? AND path = ?",
+                self._forgotten,
+            )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._pending.clear()
+        self._forgotten.clear()
+
+    def prune(self) -> int:
+        """
+        Removes the entries which were not updated for `STATE_MAX_AGE`.
+
+        Returns the number of removed entries.
+        """
+        try:
+            cursor = self._conn.execute(
+                "DELETE FROM state WHERE updated < ?",
+                (time.time() - STATE_MAX_AGE,),
+            )
+        except sqlite3.OperationalError as e:
+            # another process holds the lock for a long time - retry next run
+            logger.warning("Could not prune state store %s: %s", self.path, e)
+            return 0
+        return cursor.rowcount
+
+    def rule_state(
+        self,
+        rule: Rule,
+        rule_nr: int,
+        record: bool = True,
+    ) -> Optional[RuleState]:
+        """
+        Returns the state of the given rule or `None` if it cannot skip unchanged
+        files. With `record=False` (e.g. in a simulation) no outcomes are recorded.
+        """
+        key = rule_key(rule, rule_nr)
+        if key is None:
+            logger.info(
+                "Rule %s (%s) evaluates all files in incremental mode",
+                rule_nr,
+                rule.name,
+            )
+            return None
+        return RuleState(self, key=key, record=record)
+
+    def entries(self) -> int:
+        """
+        Returns the number of entries.
+        """
+        self.flush()
+        return self._conn.execute("SELECT COUNT(*) FROM state").fetchone()[0]
+
+    def clear(self) -> None:
+        """
+        Removes all entries and shrinks the database file.
+        """
+        self._pending.clear()
+        self._forgotten.clear()
+        self._conn.execute("DELETE FROM state")
+        self._conn.execute("VACUUM")
+
+    def close(self) -> None:
+        try:
+            self.flush()
+        finally:
+            self._conn.close()
+
+
+class RuleState:
+    """
+    The part of the state store belonging to a single rule.
+    """
+
+    def __init__(self, store: StateStore, key: str, record: bool = True) -> None:
+        self.store = store
+        self.key = key
+        self.record_outcomes = record
+        self.skipped = 0
+        # the file keys of the resources passed on, by their path during the walk
+        self._keys: Dict[Path, FileKey] = {}
+
+    def changed(self, resources: Iterable[Resource]) -> Iterator[Resource]:
+        """
+        Passes on the resources which changed since the rule evaluated them.
+        """
+        for res in resources:
+            assert res.path is not None
+            try:
+                key = FileKey.from_stat(res.stat())
+            except OSError:
+                yield res
+                continue
+            entry = self.store.get(self.key, res.path)
+            if entry is not None and entry[0] == key:
+                self.skipped += 1
+                continue
+            if self.record_outcomes:
+                self._keys[res.path] = key
+            yield res
+
+    def record(self, path: Optional[Path], result: ReportSummary) -> None:
+        """
+        Records the outcome for the resource walked at `path`. `result` is the result
+        of its actions, an empty summary if the filters did not match.
+        """
+        if path is None:
+            return
+        key = self._keys.pop(path, None)
+        if key is None:
+            return
+        if result.errors:
+            self.store.forget(self.key, path)
+        elif result.success:
+            self.store.set(self.key, path, key=key, outcome=OUTCOME_HANDLED)
+        else:
+            self.store.set(self.key, path, key=key, outcome=OUTCOME_UNMATCHED)
+
+
+def open_state_store(path: Optional[Path] = None) -> StateStore:
+    """
+    Opens the state store at `path` (by default in the user cache dir).
+    """
+    return StateStore(path or DEFAULT_STATE_PATH)
@@ -1,9 +1,14 @@
 import os
+from collections import ChainMap
 from datetime import date, datetime
-from typing import Union
+from functools import lru_cache
+from typing import Any, Mapping, MutableMapping, Optional, Type, Union
 
 import jinja2
 
+# the number of compiled templates kept by `Template.from_string`
+TEMPLATE_CACHE_SIZE = 1024
+
 # variables that should be always available in a template
 BASIC_VARS = dict(
     env=os.environ,
@@ -22,28 +27,89 @@ def finalize_placeholder(x):
     return x
 
 
-Template = jinja2.Environment(
+class CompiledTemplate(jinja2.Template):
+    # The rendered text if the template has no placeholders. It is the same for all
+    # arguments, so it does not need to be rendered.
+    constant: Optional[str] = None
+
+
+def constant_text(source: str) -> Optional[str]:
+    """
+    Returns the rendered text of `source` if it has no placeholders, blocks or
+    comments (which all start with "{"), otherwise `None`.
+    """
+    # jinja normalizes line endings
+    if "{" in source or "\r" in source:
+        return None
+    # jinja removes a single trailing newline
+    return source[:-1] if source.endswith("\n") else source
+
+
+class TemplateEnvironment(jinja2.Environment):
+    """
+    A jinja environment which caches the templates compiled by `from_string`.
+    """
+
+    template_class = CompiledTemplate
+
+    def from_string(
+        self,
+        source: Union[str, jinja2.nodes.Template],
+        globals: Optional[MutableMapping[str, Any]] = None,
+        template_class: Optional[Type[jinja2.Template]] = None,
+    ) -> jinja2.Template:
+        if isinstance(source, str) and globals is None and template_class is None:
+            return self._compile_cached(source)
+        return super().from_string(source, globals, template_class)
+
+    @lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+    def _compile_cached(self, source: str) -> jinja2.Template:
+        template = super().from_string(source)
+        if isinstance(template, CompiledTemplate):
+            template.constant = constant_text(source)
+        return template
+
+
+Template = TemplateEnvironment(
     variable_start_string="{",
     variable_end_string="}",
     autoescape=False,
     finalize=finalize_placeholder,
     undefined=jinja2.StrictUndefined,
 )
+Template.globals.update(BASIC_VARS)
 
 
-def render(template: Union[str, jinja2.Template], args=None) -> str:
+def expand(text: str) -> str:
+    """
+    Expands the user dir and the environment variables in `text`.
+    """
+    if text.startswith("~"):
+        text = os.path.expanduser(text)
+    # "%var%" is expanded on windows
+    if "$" in text or "%" in text:
+        text = os.path.expandvars(text)
+    return text
+
+
+def render(
+    template: Union[str, jinja2.Template],
+    args: Optional[Mapping[str, Any]] = None,
+) -> str:
     if args is None:
-        args = dict()
+        args = {}
+    if isinstance(template, str):
+        template = Template.from_string(template)
+    if isinstance(template, CompiledTemplate) and template.constant is not None:
+        return expand(template.constant)
     try:
-        if isinstance(template, jinja2.Template):
-            text = template.render(**args, **BASIC_VARS)
-        else:
-            text = Template.from_string(template).render(**args, **BASIC_VARS)
+        # `template.render` would copy the arguments into a new dict. A shared
+        # context looks them up on access instead, so lazy mappings like
+        # `Resource.dict()` only compute the values the template uses.
+        variables = ChainMap(args, template.globals)  # type: ignore[arg-type]
+        context = template.new_context(variables, shared=True)  # type: ignore[arg-type]
+        text = "".join(template.root_render_func(context))
     except jinja2.UndefinedError as e:
         msg = f"Missing value for template: {e}. Maybe you forgot a filter?"
         raise ValueError(msg) from e
-
-    # expand user and fill environment vars
-    text = os.path.expanduser(text)
-    text = os.path.expandvars(text)
-    return text
+    return expand(text)
@@ -0,0 +1,42 @@
+import textwrap
+import types
+from typing import Any, Callable, Dict, Mapping, Tuple
+
+
+class UserCode:
+    """
+    Python code from the config which is run as the body of a function.
+
+    The arguments of the function are `print` and the variables of the resource.
+    Which variables are available depends on the previous filters, so the function is
+    compiled once for each set of argument names and then reused for all resources.
+
+    Each call gets a fresh copy of `namespace` as its globals, so `global` statements
+    do not carry state from one resource to the next. Syntax errors are raised as
+    `ValueError` when the code is loaded.
+    """
+
+    def __init__(self, code: str, filename: str, namespace: Mapping[str, Any]) -> None:
+        self.code = code
+        self.filename = filename
+        self.namespace = dict(namespace)
+        self._functions: Dict[Tuple[str, ...], Callable[..., Any]] = {}
+        try:
+            self.function(("print",))
+        except SyntaxError as e:
+            raise ValueError(f"Invalid python code: {e}") from e
+
+    def function(self, argnames: Tuple[str, ...]) -> Callable[..., Any]:
+        func = self._functions.get(argnames)
+        if func is None:
+            source = f"def __userfunc({', '.join(argnames)}):\n"
+            source += textwrap.indent(self.code, "    ")
+            namespace = dict(self.namespace)
+            exec(compile(source, self.filename, "exec"), namespace)
+            func = self._functions[argnames] = namespace["__userfunc"]
+        return func
+
+    def __call__(self, print: Callable[..., None], variables: Dict[str, Any]) -> Any:
+        code = self.function(("print", *variables.keys())).__code__
+        func = types.FunctionType(code, dict(self.namespace))
+        return func(print, *variables.values())
@@ -1,7 +1,24 @@
 import os
-from fnmatch import fnmatch
+import re
+from concurrent.futures import Future, ThreadPoolExecutor
+from fnmatch import fnmatch, translate
+from functools import cached_property
+from itertools import islice
 from pathlib import Path
-from typing import Iterable, Iterator, List, Literal, NamedTuple, Optional, Set
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Literal,
+    MutableSet,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
 
 from natsort import os_sorted
 from pydantic import Field
@@ -12,18 +29,121 @@ def pattern_match(name: str, patterns: Iterable[str]) -> bool:
     return any(fnmatch(name, pat) for pat in patterns)
 
 
+def _is_glob(pattern: str) -> bool:
+    return any(char in pattern for char in "*?[")
+
+
+class PatternMatcher:
+    """
+    Matches names against a collection of glob patterns like `pattern_match`.
+
+    The patterns are compiled once: patterns without wildcards are looked up in a set,
+    all other patterns are combined into a single regular expression.
+    """
+
+    __slots__ = ("_literals", "_regex")
+
+    def __init__(self, patterns: Iterable[str]):
+        self._literals: Set[str] = set()
+        globs: List[str] = []
+        for pattern in patterns:
+            pattern = os.path.normcase(pattern)
+            if _is_glob(pattern):
+                globs.append(translate(pattern))
+            else:
+                self._literals.add(pattern)
+        self._regex = re.compile("|".join(globs)).match if globs else None
+
+    def __call__(self, name: str) -> bool:
+        name = os.path.normcase(name)
+        return name in self._literals or (
+            self._regex is not None and self._regex(name) is not None
+        )
+
+
+class SkipIndex(MutableSet[Path]):
+    """
+    The paths created by the actions of a rule, which the rest of the walk skips.
+
+    Besides the exact paths, `skips` also covers everything inside of them, so the
+    contents of a moved or copied folder are skipped and the walker does not need to
+    walk into it.
+    """
+
+    __slots__ = ("_paths", "_min_len")
+
+    def __init__(self, paths: Iterable[Path] = ()) -> None:
+        self._paths: Dict[str, Path] = {}
+        # the length of the shortest path, there are no shorter ancestors to check
+        self._min_len = 0
+        self.update(paths)
+
+    @staticmethod
+    def _key(path: Union[str, Path]) -> str:
+        return os.path.normcase(os.fspath(path))
+
+    def add(self, value: Path) -> None:
+        key = self._key(value)
+        if not self._paths or len(key) < self._min_len:
+            self._min_len = len(key)
+        self._paths[key] = value
+
+    def discard(self, value: Path) -> None:
+        self._paths.pop(self._key(value), None)
+
+    def update(self, paths: Iterable[Path]) -> None:
+        for path in paths:
+            self.add(path)
+
+    def __contains__(self, value: object) -> bool:
+        if not isinstance(value, (str, Path)):
+            return False
+        return self._key(value) in self._paths
+
+    def __iter__(self) -> Iterator[Path]:
+        return iter(self._paths.values())
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+    def skips(self, path: Union[str, Path, None]) -> bool:
+        """
+        Whether `path` or one of its parent folders is in the index.
+        """
+        if not self._paths or path is None:
+            return False
+        key = self._key(path)
+        while len(key) >= self._min_len:
+            if key in self._paths:
+                return True
+            parent = os.path.dirname(key)
+            if parent == key:
+                break
+            key = parent
+        return False
+
+
+SortMode = Literal["natural", "name", "none"]
+
+# with multiple workers this many folders per worker are read ahead
+READ_AHEAD_FACTOR = 4
+
+
 class ScandirResult(NamedTuple):
     dirs: List[os.DirEntry]
     nondirs: List[os.DirEntry]
 
 
-def scandir(top: str, collectfiles: bool = True) -> ScandirResult:
-    result = ScandirResult(dirs=[], nondirs=[])
+def iter_scandir(top: str) -> Iterator[Tuple[os.DirEntry, bool]]:
+    """
+    Yields `(entry, is_dir)` for all entries of the given folder in the order they are
+    read from the filesystem. Symlinks are skipped.
+    """
     try:
         # build iterator if we have the permissions to this folder
         scandir_it = os.scandir(top)
     except OSError:
-        return result
+        return
 
     with scandir_it:
         while True:
@@ -33,7 +153,7 @@ def scandir(top: str, collectfiles: bool = True) -> ScandirResult:
                 except StopIteration:
                     break
             except OSError:
-                return result
+                return
 
             try:
                 is_symlink = entry.is_symlink()
@@ -54,13 +174,31 @@ def scandir(top: str, collectfiles: bool = True) -> ScandirResult:
                 # a directory, same behaviour than os.path.isdir().
                 is_dir = False
 
-            if is_dir:
-                result.dirs.append(entry)
-            elif collectfiles:
-                result.nondirs.append(entry)
+            yield entry, is_dir
+
+
+def _sorted(entries: List[os.DirEntry], sort: SortMode) -> List[os.DirEntry]:
+    if sort == "natural":
+        return os_sorted(entries, key=lambda x: x.name)
+    if sort == "name":
+        return sorted(entries, key=lambda x: x.name)
+    return entries
+
+
+def scandir(
+    top: str,
+    collectfiles: bool = True,
+    sort: SortMode = "natural",
+) -> ScandirResult:
+    result = ScandirResult(dirs=[], nondirs=[])
+    for entry, is_dir in iter_scandir(top):
+        if is_dir:
+            result.dirs.append(entry)
+        elif collectfiles:
+            result.nondirs.append(entry)
     return ScandirResult(
-        dirs=os_sorted(result.dirs, key=lambda x: x.name),
-        nondirs=os_sorted(result.nondirs, key=lambda x: x.name),
+        dirs=_sorted(result.dirs, sort=sort),
+        nondirs=_sorted(result.nondirs, sort=sort),
     )
 
 
@@ -69,76 +207,244 @@ class DirActions(NamedTuple):
     to_walk: List[os.DirEntry]
 
 
+class _Frame:
+    """
+    A folder on the walk stack. `future` holds its listing if it was read ahead.
+    """
+
+    __slots__ = ("path", "lvl", "result", "dir_actions", "future")
+
+    def __init__(self, path: str, lvl: int):
+        self.path = path
+        self.lvl = lvl
+        self.result: Optional[ScandirResult] = None
+        self.dir_actions: Optional[DirActions] = None
+        self.future: Optional[Future] = None
+
+
 @dataclass(frozen=True)
 class Walker:
     min_depth: int = 0
     max_depth: Optional[int] = None
     method: Literal["breadth", "depth"] = "breadth"
+    sort: SortMode = "natural"
+    workers: int = Field(default=1, ge=1)
     filter_dirs: Optional[List[str]] = None
     filter_files: Optional[List[str]] = None
     exclude_dirs: Set[str] = Field(default_factory=set)
     exclude_files: Set[str] = Field(default_factory=set)
 
+    # the patterns are matched against every entry, so they are compiled only once.
+    @cached_property
+    def _exclude_dirs(self) -> PatternMatcher:
+        return PatternMatcher(self.exclude_dirs)
+
+    @cached_property
+    def _exclude_files(self) -> PatternMatcher:
+        return PatternMatcher(self.exclude_files)
+
+    @cached_property
+    def _filter_dirs(self) -> Optional[PatternMatcher]:
+        return None if self.filter_dirs is None else PatternMatcher(self.filter_dirs)
+
+    @cached_property
+    def _filter_files(self) -> Optional[PatternMatcher]:
+        return None if self.filter_files is None else PatternMatcher(self.filter_files)
+
     def _should_yield_file(self, entry: os.DirEntry, lvl: int) -> bool:
+        return self._includes_file(entry.name, lvl=lvl)
+
+    def _includes_file(self, name: str, lvl: int) -> bool:
         return (
             lvl >= self.min_depth
-            and not pattern_match(entry.name, self.exclude_files)
-            and (
-                self.filter_files is None
-                or pattern_match(entry.name, self.filter_files)
-            )
+            and not self._exclude_files(name)
+            and (self._filter_files is None or self._filter_files(name))
+        )
+
+    def _includes_dir(self, name: str) -> bool:
+        return not self._exclude_dirs(name) and (
+            self._filter_dirs is None or self._filter_dirs(name)
         )
 
     def _dir_actions(self, entries: Iterable[os.DirEntry], lvl: int) -> DirActions:
         result = DirActions(to_yield=[], to_walk=[])
         for entry in entries:
-            if not pattern_match(entry.name, self.exclude_dirs) and (
-                self.filter_dirs is None or pattern_match(entry.name, self.filter_dirs)
-            ):
+            if self._includes_dir(entry.name):
                 if self.max_depth is None or lvl < self.max_depth:
                     result.to_walk.append(entry)
                 if lvl >= self.min_depth:
                     result.to_yield.append(entry)
         return result
 
+    def includes(self, top: str, path: str, is_dir: bool = False) -> bool:
+        """
+        Whether walking `top` would yield `path` given the depth limits and patterns
+        of this walker. The filesystem is not accessed.
+        """
+        try:
+            parts = Path(path).relative_to(top).parts
+        except ValueError:
+            return False
+        if not parts:
+            return False
+        *folders, name = parts
+        for lvl, folder in enumerate(folders):
+            if not self._includes_dir(folder):
+                return False
+            if self.max_depth is not None and lvl >= self.max_depth:
+                return False
+        lvl = len(folders)
+        if is_dir:
+            return lvl >= self.min_depth and self._includes_dir(name)
+        return self._includes_file(name, lvl=lvl)
+
     def walk(
         self,
         top: str,
         files: bool = True,
         dirs: bool = True,
         lvl: int = 0,
+        skip: Optional[Callable[[str], bool]] = None,
     ) -> Iterator[os.DirEntry]:
+        """
+        Yields the entries below `top`.
+
+        `skip` is called with the path of each subfolder before walking into it. The
+        folder is left out if it returns `True`.
+        """
         if not files and not dirs:
             return
 
-        # list all dirs and nondirs of the folder
-        result = scandir(top, collectfiles=files)
-
         if self.method == "breadth":
-            # Return entries
-            for entry in result.nondirs:
-                if files and self._should_yield_file(entry=entry, lvl=lvl):
-                    yield entry
-            dir_actions = self._dir_actions(result.dirs, lvl=lvl)
+            walk_func = self._walk_breadth
+        elif self.method == "depth":
+            walk_func = self._walk_depth
+        else:
+            raise ValueError(f'Unknown method "{self.method}"')
+
+        if self.workers == 1:
+            yield from walk_func(
+                top, files=files, dirs=dirs, lvl=lvl, skip=skip, executor=None
+            )
+            return
+
+        executor = ThreadPoolExecutor(
+            max_workers=self.workers,
+            thread_name_prefix="organize-walker",
+        )
+        try:
+            yield from walk_func(
+                top, files=files, dirs=dirs, lvl=lvl, skip=skip, executor=executor
+            )
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _scandir(self, frame: _Frame, files: bool) -> ScandirResult:
+        if frame.future is not None:
+            return frame.future.result()
+        return scandir(frame.path, collectfiles=files, sort=self.sort)
+
+    def _read_ahead(
+        self,
+        stack: List[_Frame],
+        files: bool,
+        executor: Optional[ThreadPoolExecutor],
+    ) -> None:
+        """
+        Starts reading the folders on top of the stack (the ones walked next) in the
+        background. The entries are still yielded in the same order.
+        """
+        if executor is None:
+            return
+        for frame in islice(reversed(stack), self.workers * READ_AHEAD_FACTOR):
+            if frame.result is None and frame.future is None:
+                frame.future = executor.submit(
+                    scandir, frame.path, collectfiles=files, sort=self.sort
+                )
+
+    def _walk_breadth(
+        self,
+        top: str,
+        files: bool,
+        dirs: bool,
+        lvl: int,
+        skip: Optional[Callable[[str], bool]],
+        executor: Optional[ThreadPoolExecutor],
+    ) -> Iterator[os.DirEntry]:
+        """
+        Yields the entries of each folder before walking its subfolders.
+        """
+        # the stack holds the folders still to walk with the next one on top
+        stack: List[_Frame] = [_Frame(path=top, lvl=lvl)]
+        while stack:
+            frame = stack.pop()
+            if skip is not None and frame.path != top and skip(frame.path):
+                continue
+            lvl = frame.lvl
+            if self.sort == "none" and frame.future is None:
+                # stream the files while the folder is read
+                subdirs: List[os.DirEntry] = []
+                for entry, is_dir in iter_scandir(frame.path):
+                    if is_dir:
+                        subdirs.append(entry)
+                    elif files and self._should_yield_file(entry=entry, lvl=lvl):
+                        yield entry
+            else:
+                result = self._scandir(frame, files=files)
+                # Return entries
+                for entry in result.nondirs:
+                    if self._should_yield_file(entry=entry, lvl=lvl):
+                        yield entry
+                subdirs = result.dirs
+            dir_actions = self._dir_actions(subdirs, lvl=lvl)
             if dirs:
                 yield from dir_actions.to_yield
-            # Recurse into sub-directories
-            for entry in dir_actions.to_walk:
-                yield from self.walk(entry.path, files=files, dirs=dirs, lvl=lvl + 1)
+            # Walk into sub-directories (in order)
+            stack.extend(
+                _Frame(path=entry.path, lvl=lvl + 1)
+                for entry in reversed(dir_actions.to_walk)
+            )
+            self._read_ahead(stack, files=files, executor=executor)
 
-        elif self.method == "depth":
-            dir_actions = self._dir_actions(result.dirs, lvl=lvl)
-            # Recurse into sub-directories
-            for entry in dir_actions.to_walk:
-                yield from self.walk(entry.path, files=files, dirs=dirs, lvl=lvl + 1)
+    def _walk_depth(
+        self,
+        top: str,
+        files: bool,
+        dirs: bool,
+        lvl: int,
+        skip: Optional[Callable[[str], bool]],
+        executor: Optional[ThreadPoolExecutor],
+    ) -> Iterator[os.DirEntry]:
+        """
+        Walks the subfolders of each folder before yielding its entries.
+        """
+        # Each frame is a folder with its scandir result and actions which is popped
+        # as soon as all of its subfolders are done.
+        stack: List[_Frame] = [_Frame(path=top, lvl=lvl)]
+        while stack:
+            frame = stack[-1]
+            if frame.result is None:
+                if skip is not None and frame.path != top and skip(frame.path):
+                    stack.pop()
+                    continue
+                frame.result = self._scandir(frame, files=files)
+                frame.future = None
+                frame.dir_actions = self._dir_actions(frame.result.dirs, lvl=frame.lvl)
+                # Walk into sub-directories (in order)
+                stack.extend(
+                    _Frame(path=entry.path, lvl=frame.lvl + 1)
+                    for entry in reversed(frame.dir_actions.to_walk)
+                )
+                self._read_ahead(stack, files=files, executor=executor)
+                continue
+
+            stack.pop()
             # Return entries
-            for entry in result.nondirs:
-                if files and self._should_yield_file(entry=entry, lvl=lvl):
+            for entry in frame.result.nondirs:
+                if self._should_yield_file(entry=entry, lvl=frame.lvl):
                     yield entry
-            if dirs:
-                yield from dir_actions.to_yield
-        else:
-            raise ValueError(f'Unknown method "{self.method}"')
+            if dirs and frame.dir_actions is not None:
+                yield from frame.dir_actions.to_yield
 
     def files(self, path: str) -> Iterator[Path]:
         # if path is a single file we emit just the path itself
@@ -0,0 +1,487 @@
+"""
+Watches the locations of the rules for new and changed files (`organize watch`).
+
+The file system events are read from one of these backends:
+
+- `inotify`: The Linux kernel API, used directly via ctypes.
+- `watchdog`: The `watchdog` package (if installed) which supports macOS and Windows.
+- `polling`: Compares snapshots of the locations in an interval. Works everywhere.
+
+Events of a path are collected until there were no new events for `debounce`
+seconds, so files are handled once they are completely written. The collected paths
+are then handed to the rules in config order, like a walk of the locations which
+only yields these paths.
+"""
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import errno
+import importlib
+import importlib.util
+import os
+import queue
+import select
+import struct
+import sys
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import (
+    Any,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Protocol,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+from natsort import os_sorted
+
+from organize.logger import logger
+from organize.output import Output
+from organize.resource import Resource
+from organize.rule import Rule, basedir_for
+from organize.utils import ReportSummary
+from organize.walker import SkipIndex, Walker, iter_scandir
+
+Backend = Literal["auto", "inotify", "watchdog", "polling"]
+
+# seconds without new events before a path is handled
+DEBOUNCE = 0.5
+
+# seconds between two snapshots of the polling backend
+POLL_INTERVAL = 1.0
+
+# Events of the paths created by the actions are ignored for this many seconds, as
+# they are already handled by the later rules.
+IGNORE_CREATED = 5.0
+
+# seconds to wait for events when nothing is pending
+IDLE_TIMEOUT = 1.0
+
+
+class EventSource(Protocol):
+    def add(self, path: str, recursive: bool) -> None:
+        """
+        Starts watching the folder `path` (and all of its subfolders if `recursive`).
+        """
+        ...  # pragma: no cover
+
+    def read(self, timeout: float) -> List[str]:
+        """
+        Waits up to `timeout` seconds for events and returns the paths of the written
+        files and of the created or moved in folders.
+        """
+        ...  # pragma: no cover
+
+    def close(self) -> None: ...  # pragma: no cover
+
+
+class InotifySource:
+    """
+    Reads the events of the Linux inotify API.
+    """
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ISDIR = 0x40000000
+    IN_NONBLOCK = os.O_NONBLOCK
+    IN_CLOEXEC = 0o2000000
+
+    # files are reported when they are closed after writing, not when created
+    MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+    EVENT = struct.Struct("iIII")
+
+    def __init__(self) -> None:
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        fd = self._libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if fd < 0:
+            self._raise("inotify_init1")
+        self._fd = fd
+        # watch descriptor -> (path, recursive)
+        self._watches: Dict[int, Tuple[str, bool]] = {}
+        self._roots: Dict[str, bool] = {}
+
+    @classmethod
+    def is_supported(cls) -> bool:
+        if not sys.platform.startswith("linux"):
+            return False
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6")
+            return hasattr(libc, "inotify_init1")
+        except OSError:
+            return False
+
+    def _raise(self, func: str, path: str = "") -> None:
+        err = ctypes.get_errno()
+        if err == errno.ENOSPC:
+            raise OSError(
+                err,
+                "The inotify watch limit is reached. Increase "
+                "fs.inotify.max_user_watches or use the polling backend.",
+                path,
+            )
+        raise OSError(err, f"{func}: {os.strerror(err)}", path)
+
+    def _add_watch(self, path: str, recursive: bool) -> None:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), self.MASK)
+        if wd < 0:
+            self._raise("inotify_add_watch", path)
+        # the same folder may be watched by multiple locations
+        prev_recursive = self._watches.get(wd, (path, False))[1]
+        self._watches[wd] = (path, recursive or prev_recursive)
+
+    def _add_tree(self, path: str, recursive: bool) -> None:
+        stack = [path]
+        while stack:
+            folder = stack.pop()
+            try:
+                self._add_watch(folder, recursive)
+            except FileNotFoundError:
+                continue
+            if recursive:
+                stack.extend(
+                    entry.path for entry, is_dir in iter_scandir(folder) if is_dir
+                )
+
+    def add(self, path: str, recursive: bool) -> None:
+        self._roots[path] = recursive or self._roots.get(path, False)
+        self._add_tree(path, recursive)
+
+    def read(self, timeout: float) -> List[str]:
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        result: List[str] = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = self.EVENT.unpack_from(data, offset)
+            offset += self.EVENT.size
+            name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+            offset += length
+
+            if mask & self.IN_Q_OVERFLOW:
+                logger.warning("inotify queue overflow, rescanning the locations")
+                result.extend(self._roots)
+                continue
+            if mask & self.IN_IGNORED:
+                # the folder was deleted or moved away
+                self._watches.pop(wd, None)
+                continue
+            if wd not in self._watches:
+                continue
+            folder, recursive = self._watches[wd]
+            path = os.path.join(folder, name)
+            if mask & self.IN_ISDIR:
+                if not mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                    continue
+                if recursive:
+                    self._add_tree(path, recursive=True)
+            elif mask & self.IN_CREATE:
+                # reported as soon as the file is closed
+                continue
+            result.append(path)
+        return result
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+class WatchdogSource:
+    """
+    Reads the events of the `watchdog` package.
+    """
+
+    def __init__(self) -> None:
+        try:
+            observers = importlib.import_module("watchdog.observers")
+        except ImportError as e:
+            raise ValueError(
+                'The watchdog backend requires the "watchdog" package '
+                '("pip install watchdog").'
+            ) from e
+        self._queue: queue.Queue[str] = queue.Queue()
+        self._observer = observers.Observer()
+        self._observer.start()
+
+    @classmethod
+    def is_supported(cls) -> bool:
+        return importlib.util.find_spec("watchdog") is not None
+
+    def dispatch(self, event: Any) -> None:
+        # called by the observer thread for each event
+        if event.event_type == "moved":
+            self._queue.put(os.fsdecode(event.dest_path))
+        elif event.event_type == "created" or (
+            event.event_type in ("modified", "closed") and not event.is_directory
+        ):
+            self._queue.put(os.fsdecode(event.src_path))
+
+    def add(self, path: str, recursive: bool) -> None:
+        self._observer.schedule(self, path, recursive=recursive)
+
+    def read(self, timeout: float) -> List[str]:
+        try:
+            result = [self._queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while True:
+            try:
+                result.append(self._queue.get_nowait())
+            except queue.Empty:
+                return result
+
+    def close(self) -> None:
+        self._observer.stop()
+        self._observer.join()
+
+
+class PollingSource:
+    """
+    Compares snapshots of the watched folders in an interval.
+    """
+
+    def __init__(self, interval: float = POLL_INTERVAL) -> None:
+        self.interval = interval
+        self._roots: Dict[str, bool] = {}
+        # path -> (size, mtime) of files, `None` for folders
+        self._snapshot: Dict[str, Optional[Tuple[int, int]]] = {}
+        self._next_poll = time.monotonic() + interval
+
+    def _scan(self, path: str, recursive: bool) -> Dict[str, Optional[Tuple[int, int]]]:
+        result: Dict[str, Optional[Tuple[int, int]]] = {}
+        stack = [path]
+        while stack:
+            for entry, is_dir in iter_scandir(stack.pop()):
+                if is_dir:
+                    result[entry.path] = None
+                    if recursive:
+                        stack.append(entry.path)
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                result[entry.path] = (stat.st_size, stat.st_mtime_ns)
+        return result
+
+    def add(self, path: str, recursive: bool) -> None:
+        self._roots[path] = recursive or self._roots.get(path, False)
+        self._snapshot.update(self._scan(path, recursive))
+
+    def read(self, timeout: float) -> List[str]:
+        wait = self._next_poll - time.monotonic()
+        if wait > timeout:
+            time.sleep(timeout)
+            return []
+        time.sleep(max(wait, 0))
+        self._next_poll = time.monotonic() + self.interval
+
+        snapshot: Dict[str, Optional[Tuple[int, int]]] = {}
+        for path, recursive in self._roots.items():
+            snapshot.update(self._scan(path, recursive))
+        result = [
+            path
+            for path, signature in snapshot.items()
+            if path not in self._snapshot or self._snapshot[path] != signature
+        ]
+        self._snapshot = snapshot
+        return result
+
+    def close(self) -> None:
+        pass
+
+
+def open_source(backend: Backend) -> EventSource:
+    if backend == "auto":
+        if InotifySource.is_supported():
+            return InotifySource()
+        if WatchdogSource.is_supported():
+            return WatchdogSource()
+        return PollingSource()
+    if backend == "inotify":
+        if not InotifySource.is_supported():
+            raise ValueError("The inotify backend is only available on Linux.")
+        return InotifySource()
+    if backend == "watchdog":
+        return WatchdogSource()
+    if backend == "polling":
+        return PollingSource()
+    raise ValueError(f'Unknown watch backend "{backend}"')
+
+
+def _walk_tree(path: str) -> Iterator[str]:
+    stack = [path]
+    while stack:
+        for entry, is_dir in iter_scandir(stack.pop()):
+            yield entry.path
+            if is_dir:
+                stack.append(entry.path)
+
+
+class Watcher:
+    """
+    Hands the paths reported by an `EventSource` to the rules.
+
+    The results are the same as if the locations were walked and only the reported
+    paths were found: Paths created by a rule (e.g. the destination of a move) are
+    skipped by the rule itself and handed to the later rules.
+    """
+
+    def __init__(
+        self,
+        rules: Sequence[Tuple[int, Rule]],
+        *,
+        simulate: bool,
+        output: Output,
+    ) -> None:
+        # standalone rules have nothing to watch
+        self.rules = [
+            (rule_nr, rule, rule.walk_plan())
+            for rule_nr, rule in rules
+            if rule.enabled and rule.locations
+        ]
+        self.simulate = simulate
+        self.output = output
+        self.summary = ReportSummary()
+        # (expiry time, created paths)
+        self._created: Deque[Tuple[float, SkipIndex]] = deque()
+
+    def roots(self) -> Dict[str, bool]:
+        """
+        Returns the folders to watch and whether to watch their subfolders.
+        """
+        result: Dict[str, bool] = {}
+        for _, _, plan in self.rules:
+            for walker, paths in plan:
+                for path in paths:
+                    if os.path.isfile(path):
+                        # a single file location
+                        folder, recursive = os.path.dirname(path), False
+                    elif os.path.isdir(path):
+                        folder, recursive = path, walker.max_depth != 0
+                    else:
+                        logger.warning('Location "%s" does not exist', path)
+                        continue
+                    result[folder] = result.get(folder, False) or recursive
+        return result
+
+    def _is_created(self, path: str) -> bool:
+        now = time.monotonic()
+        while self._created and self._created[0][0] < now:
+            self._created.popleft()
+        return any(created.skips(path) for _, created in self._created)
+
+    def _resource(
+        self,
+        rule_nr: int,
+        rule: Rule,
+        plan: List[Tuple[Walker, List[str]]],
+        path: Path,
+    ) -> Optional[Resource]:
+        is_dir = rule.targets == "dirs"
+        if path.is_symlink() or not (path.is_dir() if is_dir else path.is_file()):
+            return None
+        basedir = basedir_for(plan, path, is_dir=is_dir)
+        if basedir is None and not is_dir:
+            # single file locations
+            for _, paths in plan:
+                if str(path) in paths:
+                    basedir = path
+        if basedir is None:
+            return None
+        return Resource(path=path, basedir=basedir, rule=rule, rule_nr=rule_nr)
+
+    def handle(self, paths: Iterable[str]) -> ReportSummary:
+        """
+        Hands the given paths (and the contents of given folders) to the rules.
+        """
+        found: Set[str] = set()
+        for reported in paths:
+            if reported in found or self._is_created(reported):
+                continue
+            found.add(reported)
+            if os.path.isdir(reported) and not os.path.islink(reported):
+                found.update(
+                    path for path in _walk_tree(reported) if not self._is_created(path)
+                )
+        todo = [Path(path) for path in os_sorted(found)]
+
+        summary = ReportSummary()
+        created = SkipIndex()
+        for rule_nr, rule, plan in self.rules:
+            skip_pathes = SkipIndex()
+            created_by_rule: List[Path] = []
+            for path in todo:
+                if skip_pathes.skips(path):
+                    continue
+                res = self._resource(rule_nr, rule, plan, path)
+                if res is None:
+                    continue
+                result = rule.handle(res, simulate=self.simulate, output=self.output)
+                summary += result
+                if result.success:
+                    skip_pathes.update(res.walker_skip_pathes)
+                if result.success or result.errors:
+                    created_by_rule.extend(res.walker_skip_pathes)
+            created.update(created_by_rule)
+            # the later rules handle the created paths as well
+            for path in created_by_rule:
+                if str(path) not in found:
+                    found.add(str(path))
+                    todo.append(path)
+
+        if created:
+            self._created.append((time.monotonic() + IGNORE_CREATED, created))
+        self.summary += summary
+        return summary
+
+    def run(
+        self,
+        source: EventSource,
+        *,
+        debounce: float = DEBOUNCE,
+        stop: Optional[threading.Event] = None,
+    ) -> None:
+        """
+        Handles the events of `source` until `stop` is set or the user interrupts.
+        """
+        # path -> time of the last event
+        pending: Dict[str, float] = {}
+        try:
+            while stop is None or not stop.is_set():
+                now = time.monotonic()
+                if pending:
+                    timeout = max(min(pending.values()) + debounce - now, 0)
+                else:
+                    timeout = IDLE_TIMEOUT
+                events = source.read(timeout)
+                now = time.monotonic()
+                for path in events:
+                    pending[path] = now
+                ready = [path for path, t in pending.items() if now - t >= debounce]
+                for path in ready:
+                    del pending[path]
+                if ready:
+                    self.handle(ready)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,173 @@
+import os
+
+import pytest
+from rich.console import Console
+
+from organize.cache import (
+    ExtractionCache,
+    FileKey,
+    HashCache,
+    _reconnect_caches_after_fork,
+    hash_cache_from_setting,
+)
+from organize.cli import cli
+from organize.state import StateStore
+
+
+def test_lookup_computes_once(tmp_path):
+    cache = HashCache(tmp_path / "cache.sqlite")
+    path = tmp_path / "file.txt"
+    path.write_text("Hello world")
+
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return "digest"
+
+    assert cache.lookup(path, algo="md5", kind="full", compute=compute) == "digest"
+    assert cache.lookup(path, algo="md5", kind="full", compute=compute) == "digest"
+    assert len(calls) == 1
+
+    # different algorithms and kinds are cached separately
+    cache.lookup(path, algo="sha1", kind="full", compute=compute)
+    cache.lookup(path, algo="md5", kind="first_chunk", compute=compute)
+    assert len(calls) == 3
+
+
+def test_changed_file_is_rehashed(tmp_path):
+    cache = HashCache(tmp_path / "cache.sqlite")
+    path = tmp_path / "file.txt"
+    path.write_text("Hello world")
+    cache.lookup(path, algo="md5", kind="full", compute=lambda: "old")
+
+    path.write_text("Hello world, again")
+    assert cache.lookup(path, algo="md5", kind="full", compute=lambda: "new") == "new"
+
+
+def test_survives_reopen(tmp_path):
+    path = tmp_path / "file.txt"
+    path.write_text("Hello world")
+    HashCache(tmp_path / "cache.sqlite").lookup(
+        path, algo="md5", kind="full", compute=lambda: "digest"
+    )
+    key = FileKey.from_stat(os.stat(path))
+    assert HashCache(tmp_path / "cache.sqlite").get(key, "md5", "full") == "digest"
+
+
+def test_prune(tmp_path):
+    cache = HashCache(tmp_path / "cache.sqlite")
+    keep = tmp_path / "keep.txt"
+    keep.write_text("keep")
+    gone = tmp_path / "gone.txt"
+    gone.write_text("gone")
+    cache.lookup(keep, algo="md5", kind="full", compute=lambda: "a")
+    cache.lookup(gone, algo="md5", kind="full", compute=lambda: "b")
+    gone.unlink()
+
+    assert cache.prune() == 1
+    assert cache.get(FileKey.from_stat(os.stat(keep)), "md5", "full") == "a"
+
+
+def test_setting(tmp_path):
+    assert hash_cache_from_setting(False) is None
+    path = str(tmp_path / "cache.sqlite")
+    assert hash_cache_from_setting(path) is hash_cache_from_setting(path)
+
+
+def test_reconnect_after_fork(tmp_path):
+    cache = HashCache(tmp_path / "cache.sqlite")
+    key = FileKey(dev=1, ino=2, size=3, mtime_ns=4)
+    cache.set(key, path=tmp_path / "x", algo="md5", kind="full", digest="abc")
+    conn = cache._conn
+    _reconnect_caches_after_fork()
+    assert cache._conn is not conn
+    assert cache.get(key, algo="md5", kind="full") == "abc"
+
+
+def test_extraction_cache(tmp_path):
+    cache = ExtractionCache(tmp_path / "cache.sqlite")
+    path = tmp_path / "file.txt"
+    path.write_text("Hello world")
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return "text"
+
+    assert cache.lookup(path, kind="text", compute=compute) == "text"
+    assert cache.lookup(path, kind="text", compute=compute) == "text"
+    assert len(calls) == 1
+    assert cache.entries() == 1
+
+    path.write_text("Hello world, again")
+    assert cache.lookup(path, kind="text", compute=lambda: "new") == "new"
+
+    cache.clear()
+    assert cache.entries() == 0
+
+
+def test_extraction_cache_evicts_least_recently_used(tmp_path):
+    cache = ExtractionCache(tmp_path / "cache.sqlite", max_size=100)
+    keys = [FileKey(dev=1, ino=i, size=3, mtime_ns=4) for i in range(4)]
+    for key in keys:
+        cache.set(key, path=tmp_path / str(key.ino), kind="text", value="x" * 30)
+    assert cache.total_size() == 120
+
+    # the access of entries is only tracked with a resolution of an hour
+    cache._conn.execute("UPDATE extracted SET accessed = 0 WHERE ino = 0")
+    cache._conn.execute("UPDATE extracted SET accessed = 1 WHERE ino > 0")
+    assert cache.get(keys[0], kind="text") is not None
+
+    # evicts down to 90% of the maximum size
+    assert cache.evict() == 1
+    assert cache.total_size() == 90
+    assert cache.get(keys[0], kind="text") is not None
+    assert cache.get(keys[1], kind="text") is None
+
+
+def test_extraction_cache_size_in_bytes(tmp_path):
+    cache = ExtractionCache(tmp_path / "cache.sqlite")
+    key = FileKey(dev=1, ino=2, size=3, mtime_ns=4)
+    cache.set(key, path=tmp_path / "x", kind="text", value="ä" * 10)
+    assert cache.total_size() == 20
+
+
+def test_cli_cache_paths(tmp_path, capsys, monkeypatch):
+    monkeypatch.setattr("organize.cli.console", Console(width=200))
+    hashes = HashCache(tmp_path / "hashes.sqlite")
+    key = FileKey(dev=1, ino=2, size=3, mtime_ns=4)
+    hashes.set(key, path=tmp_path / "x", algo="md5", kind="full", digest="abc")
+    hashes.close()
+    store = StateStore(tmp_path / "state.sqlite")
+    store.set("rule", tmp_path / "x", key=key, outcome="handled")
+    store.close()
+
+    cli(["cache", str(tmp_path / "hashes.sqlite"), str(tmp_path / "state.sqlite")])
+    output = capsys.readouterr().out
+    assert "hashes" in output and "incremental state" in output
+    assert "extracted data" not in output
+
+    cli(["cache", "--clear", str(tmp_path / "state.sqlite")])
+    assert StateStore(tmp_path / "state.sqlite").entries() == 0
+    assert HashCache(tmp_path / "hashes.sqlite").entries() == 1
+
+    (tmp_path / "other.txt").write_text("no cache")
+    with pytest.raises(SystemExit):
+        cli(["cache", "--clear", str(tmp_path / "other.txt")])
+
+
+def test_extraction_cache_hits_do_not_write(tmp_path):
+    cache = ExtractionCache(tmp_path / "cache.sqlite")
+    key = FileKey(dev=1, ino=2, size=3, mtime_ns=4)
+    cache.set(key, path=tmp_path / "x", kind="text", value="text")
+    statements = []
+    cache._conn.set_trace_callback(statements.append)
+    assert cache.get(key, kind="text") == "text"
+    assert not any(x.startswith("UPDATE") for x in statements)
+
+    # the access is updated once it is older than the resolution
+    cache._conn.execute("UPDATE extracted SET accessed = 0")
+    statements.clear()
+    assert cache.get(key, kind="text") == "text"
+    assert any(x.startswith("UPDATE") for x in statements)
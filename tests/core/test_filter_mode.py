@@ -50,3 +50,71 @@ def test_filter_mode_not(fs, testoutput, filter_mode, expected_msgs):
     """
     Config.from_string(config).execute(simulate=False, output=testoutput)
     assert testoutput.messages == expected_msgs
+
+
+@pytest.mark.parametrize(
+    "filter_order, expected_msgs",
+    (
+        ("config", ["foo", "x"]),
+        ("cost", ["foo", "x"]),
+    ),
+)
+def test_filter_order(fs, testoutput, filter_order, expected_msgs):
+    make_files({"foo.txt": "foo", "baz.bar": "baz", "x.txt": "foo"}, "test")
+    config = f"""
+    rules:
+      - locations: /test
+        filter_order: {filter_order}
+        filters:
+          - filecontent: "(?P<word>fo+)"
+          - extension: txt
+        actions:
+          - echo: "{{path.stem}}"
+    """
+    Config.from_string(config).execute(simulate=False, output=testoutput)
+    assert testoutput.messages == expected_msgs
+
+
+def test_filter_order_skips_expensive_filters(fs, testoutput):
+    make_files(["a.txt", "b.pdf", "c.txt"], "test")
+    config = """
+    rules:
+      - locations: /test
+        filter_order: cost
+        filters:
+          - hash: unknown-algorithm
+          - extension: pdf
+        actions:
+          - echo: "{path.name}"
+    """
+    Config.from_string(config).execute(simulate=False, output=testoutput)
+    # the failing hash filter is only evaluated for the pdf
+    errors = [x for x in testoutput.msg_msg if x.level == "error"]
+    assert len(errors) == 1
+
+
+def test_sort_filters_by_cost():
+    rule = Config.from_string(
+        """
+        rules:
+          - locations: /test
+            filter_order: cost
+            filters:
+              - filecontent
+              - size
+              - name
+              - duplicate
+              - exif
+              - extension
+            actions:
+              - echo: "{path}"
+        """
+    ).rules[0]
+    assert [f.filter_config.name for f in rule.pipeline_filters] == [
+        "name",
+        "size",
+        "filecontent",
+        "duplicate",
+        "extension",
+        "exif",
+    ]
@@ -0,0 +1,111 @@
+import multiprocessing
+
+import pytest
+from conftest import make_files
+
+from organize import Config
+from organize.processes import filter_in_processes, supports_processes
+from organize.walker import SkipIndex
+
+pytestmark = pytest.mark.skipif(
+    not supports_processes(), reason="forking is not safe on this platform"
+)
+
+FILES = {
+    "a.txt": "a",
+    "b.pdf": "b",
+    "c.txt": "c",
+    "sub": {"d.txt": "d", "e.txt": "e"},
+}
+
+
+def run(tmp_path, testoutput, processes: int):
+    config = f"""
+        rules:
+          - locations: "{tmp_path}"
+            subfolders: true
+            filter_processes: {processes}
+            filters:
+              - extension: txt
+              - python: |
+                  if path.stem == "c":
+                      raise ValueError("failed")
+                  return {{"upper": path.stem.upper()}}
+            actions:
+              - echo: "{{python.upper}} {{extension}}"
+        """
+    Config.from_string(config).execute(simulate=False, output=testoutput)
+    return [(msg.level, msg.msg) for msg in testoutput.msg_msg]
+
+
+def test_same_result_as_in_process(tmp_path, testoutput):
+    make_files(FILES, tmp_path)
+    in_process = run(tmp_path, testoutput, processes=1)
+    assert ("info", "A txt") in in_process
+    assert ("error", "failed") in in_process
+    assert run(tmp_path, testoutput, processes=3) == in_process
+
+
+def test_actions_run_in_main_process(tmp_path, testoutput):
+    make_files(FILES, tmp_path)
+    config = f"""
+        rules:
+          - locations: "{tmp_path}"
+            subfolders: true
+            filter_processes: 2
+            filters:
+              - name: d
+            actions:
+              - move: "{tmp_path}/sub/moved/"
+        """
+    Config.from_string(config).execute(simulate=False, output=testoutput)
+    assert (tmp_path / "sub" / "moved" / "d.txt").exists()
+    assert testoutput.msg_report.success_count == 1
+
+
+def test_stateful_filters_are_refused():
+    with pytest.raises(ValueError):
+        Config.from_string(
+            """
+            rules:
+              - locations: /test
+                filter_processes: 2
+                filters:
+                  - not duplicate
+                actions:
+                  - echo: "{path}"
+            """
+        )
+
+
+def test_workers_are_forked_before_the_walk(tmp_path, testoutput):
+    make_files(FILES, tmp_path)
+    rule = Config.from_string(
+        f"""
+        rules:
+          - locations: "{tmp_path}"
+            filter_processes: 2
+            actions:
+              - echo: "{{path.name}}"
+        """
+    ).rules[0]
+    workers_at_walk_start = []
+
+    def resources():
+        workers_at_walk_start.append(len(multiprocessing.active_children()))
+        yield from rule.walk()
+
+    results = filter_in_processes(
+        rule,
+        resources(),
+        output=testoutput,
+        skip_pathes=SkipIndex(),
+        processes=2,
+    )
+    assert len(list(results)) == 3
+    assert workers_at_walk_start == [2]
+
+
+def test_only_supported_on_linux(monkeypatch):
+    monkeypatch.setattr("sys.platform", "darwin")
+    assert not supports_processes()
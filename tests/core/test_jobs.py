@@ -0,0 +1,101 @@
+import shutil
+import time
+from pathlib import Path
+
+import pytest
+from conftest import make_files, read_files
+
+from organize import Config
+from organize.actions import Copy
+from organize.jobs import lock_paths, supports_jobs
+from organize.resource import Resource
+
+FILES = {
+    "a": {"file.txt": "a", "other.txt": "a2"},
+    "b": {"file.txt": "b", "other.txt": "b2"},
+    "c": {"file.txt": "c", "other.pdf": "c2"},
+    "file.txt": "root",
+}
+
+
+def run(config: str, jobs: int, testoutput):
+    for folder in ("/test", "/out"):
+        shutil.rmtree(folder, ignore_errors=True)
+    make_files(FILES, "/test")
+    Config.from_string(config).execute(simulate=False, output=testoutput, jobs=jobs)
+    return testoutput.messages, read_files("/test"), read_files("/out")
+
+
+@pytest.mark.parametrize(
+    "actions",
+    (
+        ['copy: "/out/"'],
+        ['move: "/out/{path.suffix[1:]}/"', 'echo: "{path}"'],
+        ['write: {text: "{path.name}", outfile: "/out/log.txt"}'],
+        ['rename: "{path.stem}-renamed{path.suffix}"', 'copy: "/out/"'],
+        ['python: "print(path)"', "delete"],
+    ),
+)
+def test_same_result_as_sequential(fs, testoutput, actions):
+    config = """
+        rules:
+          - locations: /test
+            subfolders: true
+            actions:
+        """ + "".join(f"\n              - {action}" for action in actions)
+    sequential = run(config, jobs=1, testoutput=testoutput)
+    concurrent = run(config, jobs=4, testoutput=testoutput)
+    assert concurrent == sequential
+
+
+def test_waits_for_actions_creating_walked_paths(fs, testoutput, monkeypatch):
+    original = Copy.pipeline
+
+    def slow_pipeline(self, res, output, simulate):
+        time.sleep(0.2)
+        original(self, res=res, output=output, simulate=simulate)
+
+    monkeypatch.setattr(Copy, "pipeline", slow_pipeline)
+    config = """
+        rules:
+          - locations: /test
+            subfolders: true
+            actions:
+              - copy:
+                  dest: "/test/zz/"
+                  on_conflict: overwrite
+        """
+    # zz/file.txt is overwritten by the first copy, so the walk skips it
+    make_files({"file.txt": "new", "zz": {"file.txt": "old"}}, "/test")
+    Config.from_string(config).execute(simulate=False, output=testoutput, jobs=2)
+    assert testoutput.messages[-1] == "Copy to /test/zz/file.txt"
+    assert len(testoutput.messages) == 3
+    assert read_files("/test") == {"file.txt": "new", "zz": {"file.txt": "new"}}
+
+
+def test_lock_paths(fs):
+    fs.create_dir("/out")
+    res = Resource(path=Path("/test/file.txt"))
+
+    def rule_actions(*actions):
+        config = Config.from_string(
+            """
+            rules:
+              - locations: /test
+                actions:
+            """
+            + "".join(f"\n                  - {action}" for action in actions)
+        )
+        return config.rules[0].actions
+
+    assert lock_paths(rule_actions('echo: "{path}"'), res) == set()
+    assert lock_paths(rule_actions('move: "/out/"', 'echo: "x"'), res) == {Path("/out")}
+    assert lock_paths(rule_actions('copy: "/out/{path.stem}.bak"'), res) == {
+        Path("/out")
+    }
+    assert lock_paths(rule_actions("delete"), res) == {Path("/test")}
+    # destination of the second action is not known beforehand
+    assert lock_paths(rule_actions('copy: "/out/"', 'move: "/out/x/"'), res) is None
+    # arbitrary code
+    assert lock_paths(rule_actions('shell: "ls"'), res) is None
+    assert not supports_jobs(rule_actions('confirm: "Really?"', "delete"))
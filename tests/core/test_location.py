@@ -104,3 +104,24 @@ def test_at_sign_in_path(fs):
 
     assert (Path(test_path) / "foo.txt").exists()
     assert (Path(test_path) / "bar.txt").exists()
+
+
+def test_search_depth(fs, testoutput):
+    make_files({"a.txt": "", "sub": {"b.txt": ""}}, "/test")
+    config = """
+        rules:
+          - locations:
+              - path: /test
+                search: {search}
+            subfolders: true
+            actions:
+              - echo: '{{path.name}}'
+        """
+    Config.from_string(config.format(search="breadth")).execute(
+        simulate=False, output=testoutput
+    )
+    assert testoutput.messages == ["a.txt", "b.txt"]
+    Config.from_string(config.format(search="depth")).execute(
+        simulate=False, output=testoutput
+    )
+    assert testoutput.messages == ["b.txt", "a.txt"]
@@ -0,0 +1,87 @@
+from pathlib import Path
+from typing import ClassVar, List, Optional, Sequence
+
+from organize.actions import Echo
+from organize.filter import FilterConfig, Not
+from organize.filters import Extension
+from organize.output import SavingOutput
+from organize.resource import Resource
+from organize.rule import Rule, prefetch_pipeline
+
+
+class Prefetcher:
+    filter_config: ClassVar[FilterConfig] = FilterConfig(
+        name="prefetcher", files=True, dirs=False
+    )
+
+    def __init__(self, size: Optional[int]):
+        self.size = size
+        self.batches: List[List[Path]] = []
+
+    def prefetch_size(self) -> Optional[int]:
+        return self.size
+
+    def prefetch(self, paths: Sequence[Path]) -> None:
+        self.batches.append(list(paths))
+
+    def pipeline(self, res, output) -> bool:
+        return True
+
+
+def resources(n: int, extension: str = "txt"):
+    for i in range(n):
+        yield Resource(path=Path(f"{i}.{extension}"))
+
+
+def prefetched(resources, filters, filter_mode="all"):
+    rule = Rule(
+        locations=["/"],
+        filters=filters,
+        filter_mode=filter_mode,
+        filter_order="config",
+        actions=[Echo("test")],
+    )
+    return list(prefetch_pipeline(resources, [rule], output=SavingOutput()))
+
+
+def test_batches():
+    a = Prefetcher(size=2)
+    b = Prefetcher(size=3)
+    result = prefetched(resources(5), filters=[a, Not(b)])
+    assert [res.path for res in result] == [Path(f"{i}.txt") for i in range(5)]
+    assert (
+        a.batches
+        == b.batches
+        == [
+            [Path("0.txt"), Path("1.txt")],
+            [Path("2.txt"), Path("3.txt")],
+            [Path("4.txt")],
+        ]
+    )
+
+
+def test_whole_walk_and_disabled():
+    a = Prefetcher(size=0)
+    b = Prefetcher(size=None)
+    prefetched(resources(3), filters=[a, b])
+    assert a.batches == [[Path("0.txt"), Path("1.txt"), Path("2.txt")]]
+    assert b.batches == []
+
+
+def test_prefetches_resources_passing_the_filters_before():
+    a = Prefetcher(size=5)
+    b = Prefetcher(size=5)
+    jpgs = list(resources(2, extension="jpg"))
+    result = prefetched([*resources(2), *jpgs], filters=[Extension("jpg"), a, b])
+    assert len(result) == 4
+    assert a.batches == b.batches == [[Path("0.jpg"), Path("1.jpg")]]
+
+    # in "none" mode the pipeline ends with the first matching filter
+    c = Prefetcher(size=5)
+    prefetched(jpgs, filters=[Extension("jpg"), c], filter_mode="none")
+    assert c.batches == [[]]
+
+    # in "any" mode all filters are evaluated
+    d = Prefetcher(size=5)
+    prefetched(resources(1), filters=[Extension("jpg"), d], filter_mode="any")
+    assert d.batches == [[Path("0.txt")]]
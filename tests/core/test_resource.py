@@ -0,0 +1,79 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from organize.resource import Resource
+
+
+def test_from_direntry(fs):
+    fs.create_file("/test/file.txt", contents="hello")
+    fs.create_dir("/test/folder")
+    entries = {entry.name: entry for entry in os.scandir("/test")}
+
+    res = Resource.from_direntry(entries["file.txt"], basedir=Path("/test"))
+    assert res.path == Path("/test/file.txt")
+    assert res.relative_path() == Path("file.txt")
+    assert res.is_file() and not res.is_dir()
+    assert res.stat().st_size == 5
+    assert res.lstat() is res.stat()
+
+    res = Resource.from_direntry(entries["folder"])
+    assert res.is_dir() and not res.is_file()
+
+
+def test_stat_cache(fs, monkeypatch):
+    fs.create_file("/test/file.txt", contents="hello")
+    res = Resource(path=Path("/test/file.txt"))
+    assert res.stat().st_size == 5
+
+    calls = []
+    monkeypatch.setattr(Path, "stat", lambda *args, **kwargs: calls.append(args))
+    assert res.is_file()
+    assert res.stat().st_size == 5
+    assert calls == []
+
+
+def test_stat_cache_invalidated_on_path_change(fs):
+    fs.create_file("/test/file.txt", contents="hello")
+    fs.create_file("/test/other.txt", contents="hello world")
+    entry = next(e for e in os.scandir("/test") if e.name == "file.txt")
+    res = Resource.from_direntry(entry)
+    assert res.stat().st_size == 5
+
+    res.path = Path("/test/other.txt")
+    assert res.entry is None
+    assert res.stat().st_size == 11
+
+
+def test_missing_file(fs):
+    res = Resource(path=Path("/test/missing.txt"))
+    assert not res.is_file()
+    assert not res.is_dir()
+
+
+def test_dict_is_a_live_view():
+    res = Resource(path=Path("/test/sub/file.txt"), basedir=Path("/test"))
+    variables = res.dict()
+    assert variables["relative_path"] == Path("sub/file.txt")
+    assert variables["location"] == Path("/test")
+
+    res.vars["extension"] = "txt"
+    assert variables["extension"] == "txt"
+    assert list(variables) == [
+        "path",
+        "basedir",
+        "location",
+        "relative_path",
+        "rule",
+        "rule_nr",
+        "extension",
+    ]
+
+    # the cached relative path is updated with the path
+    res.path = Path("/test/other.txt")
+    assert variables["relative_path"] == Path("other.txt")
+    res.basedir = Path("/elsewhere")
+    assert variables["relative_path"] is None
+    with pytest.raises(KeyError):
+        variables["missing"]
@@ -0,0 +1,171 @@
+import shutil
+from collections import Counter
+
+import pytest
+from conftest import make_files, read_files
+
+from organize import Config
+from organize.config import shared_walk_groups
+
+FILES = {
+    "a.pdf": "a",
+    "b.txt": "b",
+    "c.pdf": "c",
+    "sub": {"d.txt": "d", "e.pdf": "e"},
+}
+
+
+def run(config: str, shared_walk: bool, testoutput):
+    shutil.rmtree("/test", ignore_errors=True)
+    make_files(FILES, "/test")
+    Config.from_string(config).execute(
+        simulate=False,
+        output=testoutput,
+        shared_walk=shared_walk,
+    )
+    return Counter(testoutput.messages), read_files("/test")
+
+
+def test_groups():
+    config = Config.from_string(
+        """
+        rules:
+          - locations: /test
+            actions:
+              - echo: "1"
+          - locations: /test
+            actions:
+              - echo: "2"
+          - locations: /test
+            subfolders: true
+            actions:
+              - echo: "3"
+          - locations: /test
+            enabled: false
+            actions:
+              - echo: "4"
+          - locations: /test
+            subfolders: true
+            actions:
+              - echo: "5"
+          - actions:
+              - echo: "6"
+        """
+    )
+    groups = shared_walk_groups(list(enumerate(config.rules)))
+    assert [[nr for nr, _ in group] for group in groups] == [[0, 1], [2, 4], [5]]
+
+
+def test_dispatch_in_rule_order(fs, testoutput):
+    config = """
+        rules:
+          - locations: /test
+            filters:
+              - extension: pdf
+            actions:
+              - echo: "pdf {path.name}"
+          - locations: /test
+            actions:
+              - echo: "all {path.name}"
+        """
+    make_files(FILES, "/test")
+    Config.from_string(config).execute(
+        simulate=False, output=testoutput, shared_walk=True
+    )
+    assert testoutput.messages == [
+        "pdf a.pdf",
+        "all a.pdf",
+        "all b.txt",
+        "pdf c.pdf",
+        "all c.pdf",
+    ]
+
+
+def test_warns_about_ignored_options(fs, testoutput, caplog):
+    config = """
+        rules:
+          - locations: /test
+            filter_processes: 2
+            actions:
+              - echo: "first {path.name}"
+          - locations: /test
+            actions:
+              - echo: "second {path.name}"
+        """
+    make_files({"a.txt": ""}, "/test")
+    Config.from_string(config).execute(
+        simulate=False, output=testoutput, shared_walk=True
+    )
+    assert testoutput.messages == ["first a.txt", "second a.txt"]
+    assert "Rules 0, 1 share a walk" in caplog.text
+
+
+@pytest.mark.parametrize(
+    "action",
+    (
+        # moved into a folder the walk has already seen
+        'move: "/test/{path.stem}.moved"',
+        # moved into a folder the walk has not seen yet
+        'move: "/test/sub/zz/"',
+        # moved out of the location
+        'move: "/other/"',
+        "delete",
+        'copy: "/test/sub/zz/"',
+        'rename: "{path.stem}.renamed"',
+    ),
+)
+def test_same_result_as_sequential(fs, testoutput, action):
+    config = f"""
+        rules:
+          - locations: /test
+            subfolders: true
+            filters:
+              - extension: pdf
+            actions:
+              - {action}
+          - locations: /test
+            subfolders: true
+            actions:
+              - echo: "{{path}}"
+        """
+    sequential = run(config, shared_walk=False, testoutput=testoutput)
+    shutil.rmtree("/other", ignore_errors=True)
+    shared = run(config, shared_walk=True, testoutput=testoutput)
+    assert shared == sequential
+
+
+def test_conflicts_can_resolve_differently(fs, testoutput):
+    # documented limitation: rule 2 renames a.pdf before rule 0 moved xa.pdf away
+    config = """
+        rules:
+          - locations: /test
+            filters:
+              - name:
+                  startswith: x
+            actions:
+              - move: "/test/sub/"
+          - locations: /test
+            filters:
+              - name:
+                  contains: a
+            actions:
+              - move: "/test/"
+          - locations: /test
+            filters:
+              - extension: pdf
+            actions:
+              - rename:
+                  new_name: "x{path.name}"
+                  on_conflict: skip
+        """
+    results = []
+    for shared_walk in (False, True):
+        shutil.rmtree("/test", ignore_errors=True)
+        make_files({"a.pdf": "a", "c.pdf": "c", "xa.pdf": "xa"}, "/test")
+        Config.from_string(config).execute(
+            simulate=False, output=testoutput, shared_walk=shared_walk
+        )
+        results.append(read_files("/test"))
+    sequential, shared = results
+    assert sequential["xa.pdf"] == "a"
+    assert shared != sequential
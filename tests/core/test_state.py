@@ -0,0 +1,131 @@
+import pytest
+from conftest import make_files
+
+from organize import Config
+from organize.cache import FileKey
+from organize.state import StateStore, rule_key
+
+
+@pytest.fixture
+def state_path(tmp_path, monkeypatch):
+    path = tmp_path / "state.sqlite"
+    monkeypatch.setattr("organize.state.DEFAULT_STATE_PATH", path)
+    return path
+
+
+def echoed(config: str, testoutput, simulate=False, **kwargs):
+    Config.from_string(config).execute(
+        simulate=simulate, output=testoutput, incremental=True, **kwargs
+    )
+    return sorted(msg for msg in testoutput.messages if msg.startswith("echo "))
+
+
+def config_for(location, filters="- extension: txt"):
+    return f"""
+        rules:
+          - locations: "{location}"
+            filters:
+              {filters}
+            actions:
+              - echo: "echo {{path.name}}"
+        """
+
+
+@pytest.mark.parametrize("jobs", (1, 4))
+def test_skips_unchanged_files(tmp_path, state_path, testoutput, jobs):
+    make_files({"a.txt": "a", "b.txt": "b", "c.pdf": "c"}, tmp_path / "test")
+    config = config_for(tmp_path / "test")
+    assert echoed(config, testoutput, jobs=jobs) == ["echo a.txt", "echo b.txt"]
+    assert echoed(config, testoutput, jobs=jobs) == []
+
+    (tmp_path / "test" / "a.txt").write_text("changed")
+    (tmp_path / "test" / "new.txt").write_text("new")
+    assert echoed(config, testoutput, jobs=jobs) == ["echo a.txt", "echo new.txt"]
+
+
+def test_changed_rule_evaluates_all_files(tmp_path, state_path, testoutput):
+    make_files({"a.txt": "a", "b.pdf": "b"}, tmp_path / "test")
+    assert echoed(config_for(tmp_path / "test"), testoutput) == ["echo a.txt"]
+    # the unmatched file is evaluated again by the changed rule
+    changed = config_for(tmp_path / "test", filters="- extension: [txt, pdf]")
+    assert echoed(changed, testoutput) == ["echo a.txt", "echo b.pdf"]
+
+
+def test_not_incremental_filters(tmp_path, state_path, testoutput):
+    make_files({"a.txt": "a"}, tmp_path / "test")
+    config = config_for(tmp_path / "test", filters="- lastmodified")
+    assert echoed(config, testoutput) == ["echo a.txt"]
+    assert echoed(config, testoutput) == ["echo a.txt"]
+    rule = Config.from_string(config).rules[0]
+    assert rule_key(rule, rule_nr=0) is None
+
+
+def test_simulation_does_not_record(tmp_path, state_path, testoutput):
+    make_files({"a.txt": "a"}, tmp_path / "test")
+    config = config_for(tmp_path / "test")
+    assert echoed(config, testoutput, simulate=True) == ["echo a.txt"]
+    assert echoed(config, testoutput, simulate=True) == ["echo a.txt"]
+
+
+def test_failed_files_are_handled_again(tmp_path, state_path, testoutput):
+    make_files({"a.txt": "a"}, tmp_path / "test")
+    config = f"""
+        rules:
+          - locations: "{tmp_path / "test"}"
+            actions:
+              - echo: "echo {{path.name}}"
+              - copy: "{tmp_path / "missing" / "file.txt" / "x"}"
+        """
+    (tmp_path / "missing").mkdir()
+    (tmp_path / "missing" / "file.txt").write_text("blocks the copy destination")
+    assert echoed(config, testoutput) == ["echo a.txt"]
+    assert echoed(config, testoutput) == ["echo a.txt"]
+
+
+def test_definition_is_stable():
+    config = """
+        rules:
+          - locations: /test
+            tags: [a, b, c, d]
+            actions:
+              - echo: "test"
+        """
+    first = Config.from_string(config).rules[0]
+    second = Config.from_string(config).rules[0]
+    assert first.definition is not None
+    assert rule_key(first, rule_nr=0) == rule_key(second, rule_nr=0)
+    assert rule_key(first, rule_nr=0) != rule_key(first, rule_nr=1)
+
+
+def test_store_prunes_old_entries(tmp_path, monkeypatch):
+    store = StateStore(tmp_path / "state.sqlite")
+    make_files({"a.txt": "a"}, tmp_path / "test")
+    path = tmp_path / "test" / "a.txt"
+    key = FileKey.from_stat(path.stat())
+    store.set("rule", path, key=key, outcome="handled")
+    store.close()
+
+    store = StateStore(tmp_path / "state.sqlite")
+    assert store.get("rule", path) == (key, "handled")
+    store.close()
+
+    monkeypatch.setattr("organize.state.STATE_MAX_AGE", -1)
+    store = StateStore(tmp_path / "state.sqlite")
+    assert store.get("rule", path) is None
+    store.close()
+
+
+def test_jobs_record_handled_files(tmp_path, state_path, testoutput):
+    make_files(
+        {"a.txt": "a", "b.txt": "b", "c.txt": "c", "d.txt": "d"}, tmp_path / "test"
+    )
+    config = f"""
+        rules:
+          - locations: "{tmp_path / "test"}"
+            actions:
+              - echo: "echo {{path.name}}"
+              - copy: "{tmp_path / "out"}/"
+        """
+    assert len(echoed(config, testoutput, jobs=2)) == 4
+    assert echoed(config, testoutput, jobs=2) == []
+    assert len(list((tmp_path / "out").iterdir())) == 4
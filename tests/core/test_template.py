@@ -0,0 +1,39 @@
+import pytest
+
+from organize.template import Template, constant_text, render
+
+
+@pytest.mark.parametrize(
+    "source",
+    (
+        "text",
+        "text\n",
+        "text\n\n",
+        "\n",
+        "",
+        "a}b",
+        "line\r\nbreak",
+        "{x}",
+        "{% if 1 %}a{% endif %}",
+    ),
+)
+def test_constant_text(source):
+    rendered = Template.from_string(source).render(x="x")
+    text = constant_text(source)
+    assert text is None or text == rendered
+
+
+def test_from_string_is_cached():
+    assert Template.from_string("{path}") is Template.from_string("{path}")
+    assert Template.from_string("/some/folder").constant == "/some/folder"
+    assert Template.from_string("{path}").constant is None
+
+
+def test_render(monkeypatch):
+    monkeypatch.setenv("ORGANIZE_TEST", "value")
+    monkeypatch.setenv("HOME", "/home/user")
+    assert render("~/$ORGANIZE_TEST/{x}", {"x": "y"}) == "/home/user/value/y"
+    assert render("~/const/$ORGANIZE_TEST") == "/home/user/const/value"
+    assert render("{env.ORGANIZE_TEST}") == "value"
+    with pytest.raises(ValueError):
+        render("{missing}")
@@ -5,7 +5,7 @@ import pytest
 from conftest import equal_items, make_files
 from pyfakefs.fake_filesystem import FakeFilesystem
 
-from organize.walker import Walker
+from organize.walker import PatternMatcher, SkipIndex, Walker, pattern_match
 
 
 def counter(items):
@@ -172,3 +172,108 @@ def test_order(fs):
         Path("/test/2024/003"),
         Path("/test/2024/004"),
     ]
+
+
+@pytest.mark.parametrize(
+    "sort, expected",
+    (
+        ("natural", ["file2.txt", "file10.txt", "sub", "sub/a.txt"]),
+        ("name", ["file10.txt", "file2.txt", "sub", "sub/a.txt"]),
+    ),
+)
+def test_sort(fs, sort, expected):
+    make_files({"file10.txt": "", "file2.txt": "", "sub": {"a.txt": ""}}, "/test")
+    walker = Walker(sort=sort)
+    assert [
+        str(Path(entry.path).relative_to("/test")) for entry in walker.walk("/test")
+    ] == expected
+
+
+@pytest.mark.parametrize("method", ("depth", "breadth"))
+def test_sort_none(fs, method):
+    make_files({"file10.txt": "", "file2.txt": "", "sub": {"a.txt": ""}}, "/test")
+    walker = Walker(sort="none", method=method, exclude_files={"file2.txt"})
+    assert counter(e.path for e in walker.walk("/test")) == counter(
+        ["/test/file10.txt", "/test/sub", "/test/sub/a.txt"]
+    )
+    assert counter(walker.files("/test")) == counter(
+        ["/test/file10.txt", "/test/sub/a.txt"]
+    )
+    assert counter(walker.dirs("/test")) == counter(["/test/sub"])
+
+
+@pytest.mark.parametrize("sort", ("natural", "none"))
+@pytest.mark.parametrize("method", ("depth", "breadth"))
+def test_workers(fs, method, sort):
+    for i in range(5):
+        for j in range(5):
+            fs.create_file(f"/test/dir{i}/sub{j}/file.txt")
+        fs.create_file(f"/test/dir{i}/file.txt")
+    serial = Walker(method=method, sort=sort)
+    parallel = Walker(method=method, sort=sort, workers=4)
+    assert [e.path for e in parallel.walk("/test")] == [
+        e.path for e in serial.walk("/test")
+    ]
+    assert list(parallel.files("/test")) == list(serial.files("/test"))
+    assert list(parallel.dirs("/test")) == list(serial.dirs("/test"))
+
+
+@pytest.mark.parametrize(
+    "name",
+    ("thumbs.db", "~$doc.docx", ".DS_Store", "a.txt", "a.txt.bak", "b[1].txt", "x"),
+)
+def test_pattern_matcher(name):
+    patterns = {"thumbs.db", "~$*", ".DS_Store", "*.txt", "?", "b[[]1].*"}
+    assert PatternMatcher(patterns)(name) == pattern_match(name, patterns)
+    assert not PatternMatcher([])(name)
+
+
+def test_exclude_files_and_filter(fs):
+    make_files(["a.txt", "b.pdf", "c.txt", "~$c.txt", "thumbs.db"], "/test")
+    walker = Walker(exclude_files={"thumbs.db", "~$*"}, filter_files=["*.txt"])
+    assert counter(walker.files("/test")) == counter(["/test/a.txt", "/test/c.txt"])
+
+
+def test_skip_index():
+    index = SkipIndex([Path("/test/moved/folder")])
+    index.add(Path("/test/file.txt"))
+    assert Path("/test/file.txt") in index
+    assert Path("/test/moved/folder/sub/file.txt") not in index
+    assert index.skips(Path("/test/moved/folder/sub/file.txt"))
+    assert index.skips("/test/moved/folder")
+    assert not index.skips(Path("/test/moved"))
+    assert not index.skips(Path("/test/moved/folder2"))
+    assert not index.skips(None)
+    assert set(index) == {Path("/test/moved/folder"), Path("/test/file.txt")}
+    index.discard(Path("/test/file.txt"))
+    assert len(index) == 1
+
+
+@pytest.mark.parametrize("method", ("depth", "breadth"))
+def test_skip(fs, method):
+    make_files({"a": {"x.txt": ""}, "b": {"sub": {"y.txt": ""}}, "c.txt": ""}, "/test")
+    index = SkipIndex([Path("/test/b")])
+    walked = Walker(method=method).walk("/test", skip=index.skips)
+    assert counter(e.path for e in walked) == counter(
+        ["/test/a", "/test/a/x.txt", "/test/b", "/test/c.txt"]
+    )
+
+
+@pytest.mark.parametrize("method", ("depth", "breadth"))
+def test_deep_tree(tmp_path, method):
+    # deeper than the recursion limit
+    deep = tmp_path
+    for _ in range(1200):
+        deep = deep / "d"
+        deep.mkdir()
+    (deep / "file.txt").touch()
+    try:
+        walker = Walker(method=method)
+        assert list(walker.files(tmp_path)) == [deep / "file.txt"]
+        assert len(list(walker.dirs(tmp_path))) == 1200
+    finally:
+        # shutil.rmtree is recursive, so we clean up ourselves
+        (deep / "file.txt").unlink()
+        while deep != tmp_path:
+            deep.rmdir()
+            deep = deep.parent
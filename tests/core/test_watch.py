@@ -0,0 +1,145 @@
+import threading
+import time
+from pathlib import Path
+
+import pytest
+from conftest import make_files
+
+from organize import Config
+from organize.watch import InotifySource, PollingSource, Watcher
+
+
+def wait_for(condition, timeout=10.0):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_handle(fs, testoutput):
+    config = Config.from_string(
+        """
+        rules:
+          - locations: /test
+            subfolders: true
+            filters:
+              - extension: pdf
+            actions:
+              - move: "/test/pdfs/"
+          - locations: /test
+            actions:
+              - echo: "{path.name}"
+          - actions:
+              - echo: "standalone"
+        """
+    )
+    make_files({"a.pdf": "", "b.txt": "", "sub": {"c.pdf": "", "d.txt": ""}}, "/test")
+    watcher = Watcher(list(enumerate(config.rules)), simulate=False, output=testoutput)
+    assert watcher.roots() == {"/test": True}
+
+    watcher.handle(["/test/b.txt", "/test/a.pdf", "/test/sub"])
+    # the second rule does not walk into subfolders
+    assert testoutput.messages == [
+        "Move to /test/pdfs/a.pdf",
+        "Move to /test/pdfs/c.pdf",
+        "b.txt",
+    ]
+    assert watcher.summary.success == 3
+
+    # events of the created files are ignored
+    testoutput.queue.clear()
+    watcher.handle(["/test/pdfs", "/test/pdfs/a.pdf"])
+    assert testoutput.messages == []
+
+
+def test_handle_created_and_reported(fs, testoutput):
+    config = Config.from_string(
+        """
+        rules:
+          - locations: /test
+            filters:
+              - name: a
+            actions:
+              - copy:
+                  dest: /test/b.txt
+                  on_conflict: overwrite
+          - locations: /test
+            actions:
+              - echo: "{path.name}"
+        """
+    )
+    make_files({"a.txt": "a", "b.txt": "b"}, "/test")
+    watcher = Watcher(list(enumerate(config.rules)), simulate=False, output=testoutput)
+    watcher.handle(["/test/a.txt", "/test/b.txt"])
+    assert sorted(msg for msg in testoutput.messages if msg.endswith(".txt")) == [
+        "Copy to /test/b.txt",
+        "a.txt",
+        "b.txt",
+    ]
+
+
+def test_polling_source(tmp_path):
+    source = PollingSource(interval=0)
+    make_files({"old.txt": "", "sub": {"old.txt": ""}}, tmp_path)
+    source.add(str(tmp_path), recursive=True)
+    assert source.read(timeout=0) == []
+    make_files({"new.txt": "", "sub": {"new.txt": ""}}, tmp_path)
+    (tmp_path / "old.txt").write_text("changed")
+    assert sorted(source.read(timeout=0)) == sorted(
+        str(tmp_path / name) for name in ("new.txt", "old.txt", "sub/new.txt")
+    )
+
+
+@pytest.mark.skipif(not InotifySource.is_supported(), reason="requires inotify")
+def test_inotify_source(tmp_path):
+    source = InotifySource()
+    try:
+        source.add(str(tmp_path), recursive=True)
+        (tmp_path / "file.txt").write_text("content")
+        (tmp_path / "new").mkdir()
+        assert source.read(timeout=1) == [
+            str(tmp_path / "file.txt"),
+            str(tmp_path / "new"),
+        ]
+        # the new folder is watched as well
+        (tmp_path / "new" / "file.txt").write_text("content")
+        assert source.read(timeout=1) == [str(tmp_path / "new" / "file.txt")]
+    finally:
+        source.close()
+
+
+@pytest.mark.parametrize("backend", ("inotify", "polling"))
+def test_watch(tmp_path, testoutput, backend):
+    if backend == "inotify" and not InotifySource.is_supported():
+        pytest.skip("requires inotify")
+    (tmp_path / "in").mkdir()
+    config = Config.from_string(
+        f"""
+        rules:
+          - locations: "{tmp_path / 'in'}"
+            actions:
+              - move: "{tmp_path / 'out'}/"
+        """
+    )
+    stop = threading.Event()
+    thread = threading.Thread(
+        target=config.watch,
+        kwargs=dict(
+            output=testoutput,
+            backend=backend,
+            debounce=0.1,
+            stop=stop,
+        ),
+    )
+    thread.start()
+    try:
+        # wait for the watches to be set up
+        time.sleep(0.5)
+        (tmp_path / "in" / "file.txt").write_text("content")
+        assert wait_for(lambda: Path(tmp_path / "out" / "file.txt").exists())
+    finally:
+        stop.set()
+        thread.join()
+    assert testoutput.msg_report.success_count == 1
@@ -1,6 +1,10 @@
+import os
+
+import pytest
 from conftest import make_files, read_files
 
 from organize import Config
+from organize.filters import Duplicate
 
 CONTENT_SMALL = "COPY CONTENT"
 CONTENT_LARGE = "XYZ" * 300000
@@ -12,12 +16,30 @@ rules:
     filters:
       - duplicate:
           detect_original_by: name
+          workers: {workers}
     actions:
       - delete
 """
 
 
-def test_duplicate_smallfiles(fs):
+@pytest.fixture
+def hashed(monkeypatch):
+    """
+    Records the (file name, stage kind) of each computed hash.
+    """
+    result = []
+    original = Duplicate._hash
+
+    def _hash(self, path, stage):
+        result.append((path.name, stage.kind))
+        return original(self, path, stage=stage)
+
+    monkeypatch.setattr(Duplicate, "_hash", _hash)
+    return result
+
+
+@pytest.mark.parametrize("workers", (1, 4))
+def test_duplicate_smallfiles(fs, workers):
     files = {
         "unique.txt": "I'm unique.",
         "unique_too.txt": "I'm unique: too.",
@@ -32,7 +54,9 @@ def test_duplicate_smallfiles(fs):
     }
 
     make_files(files, "test")
-    Config.from_string(CONFIG_DEEP_DUP_DELETE).execute(simulate=False)
+    Config.from_string(CONFIG_DEEP_DUP_DELETE.format(workers=workers)).execute(
+        simulate=False
+    )
     result = read_files("test")
     assert result == {
         "unique.txt": "I'm unique.",
@@ -44,7 +68,8 @@ def test_duplicate_smallfiles(fs):
     }
 
 
-def test_duplicate_largefiles(fs):
+@pytest.mark.parametrize("workers", (1, 4))
+def test_duplicate_largefiles(fs, workers):
     files = {
         "unique.txt": CONTENT_LARGE + "1",
         "unique_too.txt": CONTENT_LARGE + "2",
@@ -58,7 +83,9 @@ def test_duplicate_largefiles(fs):
     }
 
     make_files(files, "test")
-    Config.from_string(CONFIG_DEEP_DUP_DELETE).execute(simulate=False)
+    Config.from_string(CONFIG_DEEP_DUP_DELETE.format(workers=workers)).execute(
+        simulate=False
+    )
     result = read_files("test")
     assert result == {
         "unique.txt": CONTENT_LARGE + "1",
@@ -71,3 +98,141 @@ def test_duplicate_largefiles(fs):
 # TODO detect_original_by: first_seen
 # TODO detect_original_by: created
 # TODO detect_original_by: lastmodified
+
+
+def test_duplicate_cache(tmp_path):
+    files = {
+        "a.txt": CONTENT_SMALL,
+        "copy.txt": CONTENT_SMALL,
+        "unique.txt": "I'm unique.",
+    }
+    config = f"""
+    rules:
+      - locations: "{tmp_path / 'test'}"
+        filters:
+          - duplicate:
+              detect_original_by: name
+              cache: "{tmp_path / 'cache.sqlite'}"
+        actions:
+          - delete
+    """
+    make_files(files, tmp_path / "test")
+    Config.from_string(config).execute(simulate=False)
+    assert read_files(tmp_path / "test") == {
+        "a.txt": CONTENT_SMALL,
+        "unique.txt": "I'm unique.",
+    }
+
+    # second run with cached hashes
+    make_files(files, tmp_path / "test")
+    Config.from_string(config).execute(simulate=False)
+    assert read_files(tmp_path / "test") == {
+        "a.txt": CONTENT_SMALL,
+        "unique.txt": "I'm unique.",
+    }
+
+
+@pytest.mark.parametrize("workers", (1, 4))
+def test_duplicate_same_chunk_different_content(fs, workers):
+    # all files share the first chunk, b and c are duplicates
+    files = {
+        "a.txt": CONTENT_LARGE + "a",
+        "b.txt": CONTENT_LARGE + "b",
+        "c.txt": CONTENT_LARGE + "b",
+    }
+    make_files(files, "test")
+    Config.from_string(CONFIG_DEEP_DUP_DELETE.format(workers=workers)).execute(
+        simulate=False
+    )
+    assert read_files("test") == {
+        "a.txt": CONTENT_LARGE + "a",
+        "b.txt": CONTENT_LARGE + "b",
+    }
+
+
+CONFIG_HARDLINKS = """
+rules:
+  - locations: "test"
+    filters:
+      - duplicate:
+          detect_original_by: name
+          hardlinks: {hardlinks}
+    actions:
+      - echo: "{{path.name}} {{duplicate.original.name}} {{duplicate.hardlink}}"
+"""
+
+
+def test_duplicate_hardlinks(fs, testoutput):
+    make_files({"a.txt": CONTENT_SMALL, "c.txt": CONTENT_SMALL}, "test")
+    os.link("test/a.txt", "test/b.txt")
+    Config.from_string(CONFIG_HARDLINKS.format(hardlinks="duplicate")).execute(
+        simulate=True, output=testoutput
+    )
+    assert testoutput.messages == [
+        "b.txt a.txt True",
+        "c.txt a.txt False",
+    ]
+
+
+def test_duplicate_hardlinks_ignore(fs, testoutput):
+    make_files({"a.txt": CONTENT_SMALL, "c.txt": CONTENT_SMALL}, "test")
+    os.link("test/a.txt", "test/b.txt")
+    os.link("test/c.txt", "test/d.txt")
+    Config.from_string(CONFIG_HARDLINKS.format(hardlinks="ignore")).execute(
+        simulate=True, output=testoutput
+    )
+    # d.txt is a link to the duplicate c.txt, so it's a duplicate of a.txt as well
+    assert testoutput.messages == [
+        "c.txt a.txt False",
+        "d.txt a.txt False",
+    ]
+
+
+@pytest.mark.parametrize("workers", (1, 4))
+def test_duplicate_samples(fs, workers, testoutput, hashed):
+    header = "H" * 2048
+    files = {
+        "a.bin": header + "A" * 10000 + header,
+        "b.bin": header + "A" * 10000 + header,
+        "c.bin": header + "A" * 5000 + "B" + "A" * 4999 + header,
+    }
+    make_files(files, "test")
+    Config.from_string(
+        f"""
+        rules:
+          - locations: "test"
+            filters:
+              - duplicate:
+                  samples: 3
+                  chunk_size: 256
+                  workers: {workers}
+            actions:
+              - echo: "{{path.name}} {{duplicate.original.name}}"
+        """
+    ).execute(simulate=True, output=testoutput)
+    assert testoutput.messages == ["b.bin a.bin"]
+    # c.bin differs in the samples, so it is never read completely
+    assert ("c.bin", "samples:3:256") in hashed
+    assert sorted(name for name, kind in hashed if kind == "full") == [
+        "a.bin",
+        "b.bin",
+    ]
+
+
+@pytest.mark.parametrize("workers", (1, 4))
+def test_duplicate_hashes_filtered_files(fs, workers, hashed, testoutput):
+    make_files({"a.jpg": "A", "b.jpg": "A", "a.txt": "T", "b.txt": "T"}, "test")
+    Config.from_string(
+        f"""
+        rules:
+          - locations: "test"
+            filters:
+              - extension: jpg
+              - duplicate:
+                  workers: {workers}
+            actions:
+              - echo: "{{path.name}}"
+        """
+    ).execute(simulate=True, output=testoutput)
+    assert testoutput.messages == ["b.jpg"]
+    assert {name for name, _ in hashed} == {"a.jpg", "b.jpg"}
@@ -1,11 +1,19 @@
+import sys
+from datetime import datetime, timedelta
 from pathlib import Path
 
 import pytest
-from conftest import ORGANIZE_DIR
+from conftest import ORGANIZE_DIR, make_files
 from pyfakefs.fake_filesystem import FakeFilesystem
 
 from organize import Config
-from organize.filters.exif import matches_tags
+from organize.filters.exif import (
+    ExifData,
+    ExifTool,
+    exifread_read,
+    exiftool_available,
+    matches_tags,
+)
 
 
 @pytest.fixture
@@ -124,3 +132,174 @@ def test_exif_filter_by_multiple_keys(images_folder):
     Config.from_string(config).execute(simulate=False)
     chosen = set(str(x.name) for x in Path("/chosen").glob("*"))
     assert chosen == set(["3.jpg", "4.jpg"])
+
+
+FAKE_EXIFTOOL = """\
+import json, os, sys
+
+log = open(os.path.join(os.path.dirname(sys.argv[0]), "log.txt"), "a")
+if sys.argv[1:] == ["-ver"]:
+    print("12.00")
+    sys.exit(0)
+log.write("start\\n")
+log.flush()
+args = []
+for line in sys.stdin:
+    arg = line.rstrip("\\n")
+    if arg.startswith("-execute"):
+        paths = [x for x in args if not x.startswith("-")]
+        log.write(f"read {len(paths)}\\n")
+        if any("crash" in path for path in paths):
+            sys.exit(1)
+        data = [
+            {
+                "SourceFile": path,
+                "ExifTool": {},
+                "File": {},
+                "EXIF": {"Model": os.path.basename(path), "DateTimeOriginal": "2024:01:02"},
+            }
+            for path in paths
+            if "empty" not in path
+        ]
+        if data:
+            print(json.dumps(data))
+        print("{ready" + arg[len("-execute"):] + "}", flush=True)
+        args = []
+    elif args[-1:] == ["-stay_open"] and arg == "False":
+        log.write("stop\\n")
+        break
+    else:
+        args.append(arg)
+"""
+
+
+@pytest.fixture
+def fake_exiftool(tmp_path, monkeypatch):
+    script = tmp_path / "bin" / "exiftool"
+    script.parent.mkdir()
+    script.write_text(f"#!{sys.executable}\n{FAKE_EXIFTOOL}")
+    script.chmod(0o755)
+    monkeypatch.setattr("organize.filters.exif.ORGANIZE_EXIFTOOL_PATH", str(script))
+    exiftool_available.cache_clear()
+    yield tmp_path / "bin" / "log.txt"
+    exiftool_available.cache_clear()
+
+
+def test_exiftool_stays_open(tmp_path, fake_exiftool, testoutput):
+    make_files(["1.jpg", "2.jpg", "3.jpg"], tmp_path / "images")
+    config = f"""
+      rules:
+        - locations: "{tmp_path / "images"}"
+          filters:
+            - exif:
+                exif.model: "[13].jpg"
+          actions:
+            - echo: "{{exif.exif.model}} {{exif.exif.datetimeoriginal.year}}"
+    """
+    Config.from_string(config).execute(simulate=False, output=testoutput)
+    assert testoutput.messages == ["1.jpg 2024", "3.jpg 2024"]
+    # a single process reads all files at once and is stopped at the end
+    assert fake_exiftool.read_text().splitlines() == ["start", "read 3", "stop"]
+
+
+def test_exiftool_read_many(tmp_path, fake_exiftool):
+    make_files(["a.jpg", "b-empty.jpg"], tmp_path)
+    exiftool = ExifTool(str(tmp_path / "bin" / "exiftool"))
+    result = exiftool.read_many([tmp_path / "a.jpg", tmp_path / "b-empty.jpg"])
+    exiftool.close()
+    assert result[tmp_path / "a.jpg"]["EXIF"]["Model"] == "a.jpg"
+    assert result[tmp_path / "b-empty.jpg"] == {}
+
+
+def test_exiftool_restarts_after_crash(tmp_path, fake_exiftool):
+    make_files(["a.jpg", "b-crash.jpg", "c.jpg"], tmp_path)
+    exiftool = ExifTool(str(tmp_path / "bin" / "exiftool"))
+    assert exiftool.read(tmp_path / "a.jpg")["EXIF"]["Model"] == "a.jpg"
+    # crashes again after the restart
+    assert exiftool.read(tmp_path / "b-crash.jpg") == {}
+    assert exiftool.read(tmp_path / "c.jpg")["EXIF"]["Model"] == "c.jpg"
+    exiftool.close()
+    assert fake_exiftool.read_text().splitlines() == [
+        "start",
+        "read 1",
+        "read 1",
+        "start",
+        "read 1",
+        "start",
+        "read 1",
+        "stop",
+    ]
+
+
+@pytest.mark.parametrize("header_size", (0, 100, 65536))
+def test_exifread_header_size(tmp_path, header_size):
+    image = ORGANIZE_DIR / "tests" / "resources" / "images-with-exif" / "3.jpg"
+    path = tmp_path / "large.jpg"
+    path.write_bytes(image.read_bytes() + bytes(1024 * 1024))
+    expected = exifread_read(image)
+    assert expected["Image"]["Model"] == "iPhone 6s"
+    # EXIF data beyond the header is read from the whole file
+    assert exifread_read(path, header_size=header_size) == expected
+
+
+def test_exif_data_is_converted_on_access():
+    raw = {
+        "Image": {"Model": "iPhone 6s", "DateTime": "2017:08:12 10:11:12"},
+        "EXIF": {"OffsetTime": "+02:00", "DateTimeOriginal": "invalid"},
+    }
+    data = ExifData(raw, lowercase=True, convert=True)
+    assert data["image"]["model"] == "iPhone 6s"
+    assert data["image"]["datetime"] == datetime(2017, 8, 12, 10, 11, 12)
+    assert data["exif"]["offsettime"] == timedelta(hours=2)
+    assert "Image" not in data
+    assert data == {
+        "image": {"model": "iPhone 6s", "datetime": datetime(2017, 8, 12, 10, 11, 12)},
+        "exif": {"offsettime": timedelta(hours=2), "datetimeoriginal": "invalid"},
+    }
+    plain = data.to_dict()
+    assert type(plain) is dict and type(plain["image"]) is dict
+    assert plain == data
+    # the raw data is left untouched
+    assert raw["Image"]["DateTime"] == "2017:08:12 10:11:12"
+
+    unconverted = ExifData(raw, lowercase=False, convert=False)
+    assert unconverted["Image"]["DateTime"] == "2017:08:12 10:11:12"
+    assert matches_tags({"Image.Model": "iphone*"}, unconverted)
+
+
+def test_exif_cache(tmp_path, fake_exiftool, testoutput):
+    make_files(["1.jpg", "2.jpg"], tmp_path / "images")
+    config = Config.from_string(
+        f"""
+      rules:
+        - locations: "{tmp_path / "images"}"
+          filters:
+            - exif:
+                cache: "{tmp_path / "cache.sqlite"}"
+          actions:
+            - echo: "{{exif.exif.model}} {{exif.exif.datetimeoriginal.year}}"
+    """
+    )
+    config.execute(simulate=False, output=testoutput)
+    config.execute(simulate=False, output=testoutput)
+    assert testoutput.messages == ["1.jpg 2024", "2.jpg 2024"]
+    # the second run reads the data from the cache
+    assert fake_exiftool.read_text().splitlines() == ["start", "read 2", "stop"]
+
+
+def test_exiftool_reads_filtered_files(tmp_path, fake_exiftool, testoutput):
+    make_files(["1.jpg", "2.jpg", "video.mp4", "disk.iso"], tmp_path / "images")
+    config = f"""
+      rules:
+        - locations: "{tmp_path / "images"}"
+          filter_order: config
+          filters:
+            - extension: jpg
+            - exif
+          actions:
+            - echo: "{{exif.exif.model}}"
+    """
+    Config.from_string(config).execute(simulate=False, output=testoutput)
+    assert testoutput.messages == ["1.jpg", "2.jpg"]
+    # the files excluded by the filters before are not read
+    assert fake_exiftool.read_text().splitlines() == ["start", "read 2", "stop"]
@@ -31,3 +31,30 @@ def test_filecontent(fs):
         "MegaCorp_Invoice_12345.txt": "Lorem MegaCorp Ltd. ipsum\nInvoice 12345\nMore text\nID: 98765",
         "Test2.txt": "Tests",
     }
+
+
+def test_filecontent_cache(tmp_path, monkeypatch, testoutput):
+    make_files({"a.txt": "Invoice 123", "b.txt": "Homework"}, tmp_path / "test")
+    extracted = []
+
+    def textract(path):
+        extracted.append(path.name)
+        return path.read_text()
+
+    monkeypatch.setattr("organize.filters.filecontent.textract", textract)
+    config = Config.from_string(
+        rf"""
+        rules:
+        - locations: "{tmp_path / "test"}"
+          filters:
+            - filecontent:
+                expr: 'Invoice (?P<number>\d+)'
+                cache: "{tmp_path / "cache.sqlite"}"
+          actions:
+            - echo: "{{filecontent.number}}"
+        """
+    )
+    config.execute(simulate=False, output=testoutput)
+    config.execute(simulate=False, output=testoutput)
+    assert testoutput.messages == ["123"]
+    assert sorted(extracted) == ["a.txt", "b.txt"]
@@ -1,9 +1,19 @@
+import sys
 from pathlib import Path
 
+import pytest
 from conftest import make_files
 
 from organize import Config
-from organize.filters.hash import hash, hash_first_chunk
+from organize.cache import FileKey, hash_cache_from_setting
+from organize.filters.hash import (
+    hash,
+    hash_first_chunk,
+    hash_last_chunk,
+    hash_samples,
+    hasher_factory,
+    sample_offsets,
+)
 
 
 def test_full_hash(fs):
@@ -61,3 +71,90 @@ def test_hash(fs, testoutput):
         """
     ).execute(simulate=False, output=testoutput)
     assert testoutput.messages == ["File hash: 3e25960a79dbc69b674cd4ec67a72c62"]
+
+
+def test_hash_cache(tmp_path, testoutput):
+    make_files({"hello.txt": "Hello world"}, tmp_path / "test")
+    config = Config.from_string(
+        f"""
+        rules:
+          - locations: "{tmp_path / 'test'}"
+            filters:
+              - hash:
+                  cache: "{tmp_path / 'cache.sqlite'}"
+            actions:
+              - echo: "File hash: {{hash}}"
+        """
+    )
+    config.execute(simulate=False, output=testoutput)
+    config.execute(simulate=False, output=testoutput)
+    assert testoutput.messages == ["File hash: 3e25960a79dbc69b674cd4ec67a72c62"]
+
+    cache = hash_cache_from_setting(str(tmp_path / "cache.sqlite"))
+    assert cache is not None
+    key = FileKey.from_stat((tmp_path / "test" / "hello.txt").stat())
+    assert cache.get(key, algo="md5", kind="full") == "3e25960a79dbc69b674cd4ec67a72c62"
+
+
+def test_last_chunk_and_samples(fs):
+    a = Path("a.txt")
+    a.write_text("head" + "x" * 5000 + "tail")
+    b = Path("b.txt")
+    b.write_text("head" + "x" * 2500 + "y" + "x" * 2499 + "tail")
+    tail = Path("tail.txt")
+    tail.write_text("tail")
+    assert hash_last_chunk(a, algo="md5", chunksize=4) == hash(tail, algo="md5")
+    assert hash_last_chunk(a, algo="md5") == hash_last_chunk(b, algo="md5")
+    assert hash_samples(a, algo="md5", samples=5, chunksize=16) != hash_samples(
+        b, algo="md5", samples=5, chunksize=16
+    )
+
+
+def test_sample_offsets():
+    assert sample_offsets(size=10000, samples=3, chunksize=1000) == [2750, 4500, 6250]
+    # no room between the first and last chunk
+    assert sample_offsets(size=2000, samples=3, chunksize=1000) == []
+    assert sample_offsets(size=10000, samples=0, chunksize=1000) == []
+
+
+@pytest.mark.parametrize("block_size", (1, 7, 2**18))
+def test_mmap_reader(tmp_path, block_size):
+    path = tmp_path / "file.bin"
+    path.write_bytes(bytes(range(256)) * 100)
+    assert hash(path, algo="sha1", reader="mmap", block_size=block_size) == hash(
+        path, algo="sha1"
+    )
+    empty = tmp_path / "empty.bin"
+    empty.touch()
+    assert hash(empty, algo="md5", reader="mmap") == hash(empty, algo="md5")
+
+
+def test_xxhash(fs):
+    xxhash = pytest.importorskip("xxhash")
+    hello = Path("hello.txt")
+    hello.write_text("Hello world")
+    assert hash(hello, algo="xxh64") == xxhash.xxh64(b"Hello world").hexdigest()
+    assert hash_first_chunk(hello, algo="xxh3_128") == (
+        xxhash.xxh3_128(b"Hello world").hexdigest()
+    )
+
+
+def test_missing_optional_algorithm(monkeypatch):
+    monkeypatch.setitem(sys.modules, "blake3", None)
+    with pytest.raises(ValueError, match='requires the "blake3" package'):
+        hasher_factory("blake3")
+
+
+def test_duplicate_unknown_algorithm():
+    with pytest.raises(ValueError):
+        Config.from_string(
+            """
+            rules:
+              - locations: "."
+                filters:
+                  - duplicate:
+                      hash_algorithm: nonexisting
+                actions:
+                  - echo: "{path}"
+            """
+        )
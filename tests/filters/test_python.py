@@ -1,3 +1,4 @@
+import pytest
 from conftest import make_files, read_files
 
 from organize import Config
@@ -191,3 +192,60 @@ def test_folder_instructions(fs):
             },
         },
     }
+
+
+def test_compiled_once(fs, testoutput):
+    make_files(["a.txt", "b.txt", "c.pdf"], "test")
+    config = Config.from_string(
+        """
+        rules:
+        - locations: /test
+          filters:
+            - extension
+            - python: |
+                return extension == "txt"
+          actions:
+            - echo: "{path}"
+        """
+    )
+    config.execute(simulate=False, output=testoutput)
+    usercode = config.rules[0].filters[1]._usercode
+    # the syntax check and the function for the variables of the extension filter
+    assert len(usercode._functions) == 2
+
+
+def test_syntax_error():
+    with pytest.raises(ValueError, match="Invalid python code"):
+        Config.from_string(
+            """
+            rules:
+            - locations: /test
+              filters:
+                - python: |
+                    return (
+              actions:
+                - echo: "{path}"
+            """
+        )
+
+
+def test_namespace_per_call(fs, testoutput):
+    make_files(["a.txt", "b.txt"], "test")
+    Config.from_string(
+        """
+        rules:
+        - locations: /test
+          filters:
+            - python: |
+                global counter
+                try:
+                    counter += 1
+                except NameError:
+                    counter = 1
+                return {"text": textwrap.indent(str(counter), "> ")}
+          actions:
+            - echo: "{python.text}"
+        """
+    ).execute(simulate=False, output=testoutput)
+    # no state is carried from one file to the next
+    assert testoutput.messages == ["> 1", "> 1"]